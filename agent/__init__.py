@@ -1,3 +1,4 @@
 from agent.agent import run_agent
+from agent.async_agent import run_agent_async, stream_agent_async
 from agent.tools import tools
 from agent.tool_executor import execute_tool
\ No newline at end of file
@@ -1,50 +1,49 @@
+import functools
 import json
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai.types.chat import ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
 
+from agent.llm_client import get_client
+from agent.hedging import hedger
 from agent.tools import tools
-from agent.tool_executor import execute_tool
+from agent.parallel_executor import execute_tool_calls
+from agent.usage import usage_tracker
+from agent.model_router import model_router
+from agent.intent_router import intent_router
+from agent.tool_selector import tool_selector, tools_for, MORE_TOOLS_NAME
+from agent.response_cache import response_cache, cache_key, schema_hash
+from agent.tool_executor import get_current_user
+from agent.tracing import tracer
+from agent.reference_data import reference_data, REFERENCE_HEADER
+from agent.planner import PLAN_MODE, PLAN_MAX_REPLANS, PlanSession, execute_plan, plan_request_tools
+from models.base import data_version
 
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client (pointed at OpenRouter)
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY")
-)
+# Shared OpenAI client (pointed at OpenRouter, tuned connection pool, retries, timeouts)
+client = get_client()
 
+# Large model (escalation target); the model per call is chosen by agent.model_router
+MODEL = model_router.large_model
 
-def run_agent(user_message: str, conversation_history: list = None, verbose: bool = False, max_rounds: int = 10):
+# Mark system prompt and tool schema for provider prompt caching (Anthropic via OpenRouter: cache_control)
+PROMPT_CACHING = os.getenv("AGENT_PROMPT_CACHING", "0") == "1"
+
+
+@functools.lru_cache(maxsize=1)
+def get_system_prompt() -> str:
     """
-    Run the agent with multi-round tool calling support.
-    
-    This allows the agent to:
-    1. First round: Call helper tools (get_all_industries, get_all_companies, etc.)
-    2. Second round: Use the results to call action tools (filter_use_cases, create_use_case, etc.)
-    
-    Args:
-        user_message (str): The user's question/command
-        conversation_history (list) : previous messages and chat history
-        verbose (bool): If True, prints detailed execution info (default: True)
-        max_rounds (int): Maximum number of tool-calling rounds (default: 2)
-    
+    System prompt with tool usage instructions. Static for the whole process, so it is rendered once
+    and forms a byte-identical prefix of every request (required for provider prompt caching).
+
     Returns:
-        str: The agent's final response
+        str: system prompt
     """
-    # Start with history or empty
-    if conversation_history:
-        messages = conversation_history.copy()
-    else:
-        messages = []
-
-    # Add system message with tool usage instructions (only if starting new conversation)
-    if not conversation_history:
-        system_message = {
-            "role": "system",
-            "content": f"""You are a helpful assistant managing a use case database for AI/ML projects.
+    return f"""You are a helpful assistant managing a use case database for AI/ML projects.
 
 You have access to tools that interact with the database. Your job is to help users query, create, update, and delete use cases, companies, industries, and persons.
 
@@ -63,6 +62,7 @@ DATABASE OPERATIONS - ALWAYS USE TOOLS:
 - To update data → use update tools  
 - To delete data → use delete tools
 - To link persons to use cases → use add_persons_to_use_case
+- To run many operations at once (e.g. change the status of several use cases) → use execute_batch
 
 PERMISSION SYSTEM:
 - Some operations require specific permissions (maintainer or admin)
@@ -77,21 +77,223 @@ RESPONSE STYLE:
 - When operations fail, explain why clearly
 - Ask clarifying questions if the request is ambiguous
 
-Available tools and their purposes:
-{chr(10).join(f"- {tool['function']['name']}: {tool['function']['description'][:100]}..." for tool in tools)}
+AVAILABLE TOOLS:
+- Each request offers the tools relevant to it (see the tool definitions), not always all of them
+- If a tool you need is missing, call request_more_tools
 
 Remember: ALWAYS call the appropriate tool - never assume results!"""
-        }
-        messages.insert(0, system_message)
+
+
+def _system_message() -> dict:
+    """System message, with a cache breakpoint when prompt caching is enabled."""
+    if not PROMPT_CACHING:
+        return {"role": "system", "content": get_system_prompt()}
+    return {
+        "role": "system",
+        "content": [{"type": "text", "text": get_system_prompt(), "cache_control": {"type": "ephemeral"}}]
+    }
+
+
+@functools.lru_cache(maxsize=128)
+def _request_tools(names: tuple = None, prompt_caching: bool = False, minified: bool = False) -> list:
+    """
+    Tool schema sent with a request (built once per selection). With prompt caching, the last tool carries a cache
+    breakpoint so the provider can reuse the whole schema.
+
+    Args:
+        names (tuple): selected tool names (see tool_selector), None for all tools
+        prompt_caching (bool): add the cache breakpoint
+        minified (bool): minified tool definitions
+    """
+    selected = tools_for(names, minified)
+    if not prompt_caching:
+        return selected
+    marked = [dict(tool) for tool in selected]
+    marked[-1]["cache_control"] = {"type": "ephemeral"}
+    return marked
+
+
+@functools.lru_cache(maxsize=1)
+def _tools_hash() -> str:
+    """Hash of the tool schema (part of the response cache key)."""
+    return schema_hash(tools)
+
+
+def _cache_key(messages: list) -> str:
+    """Response cache key of a request for the current user."""
+    return cache_key(messages, model_router.signature(), _tools_hash(), get_current_user())
+
+
+def _build_messages(user_message: str, conversation_history: list = None) -> list:
+    """
+    Build the message list for the LLM: static system prompt first, then the reference data (id <-> name map,
+    see agent.reference_data), history and the new user message.
+    The static part always comes first and never changes, dynamic parts (e.g. a history summary) follow it.
+
+    Args:
+        user_message (str): The user's question/command
+        conversation_history (list) : previous messages and chat history
+
+    Returns:
+        list: messages for the chat completion
+    """
+    messages = [_system_message()]
+
+    # ids of industries/companies/persons, so the model needs no lookup round (None if over the size budget)
+    reference = reference_data.message(get_current_user())
+    if reference is not None:
+        messages.append(reference)
+
+    # history of callers that already contains the system prompt or an older reference map - don't send it twice
+    for message in conversation_history or []:
+        if isinstance(message, dict) and message.get("role") == "system" and (
+                message.get("content") == get_system_prompt() or str(message.get("content")).startswith(REFERENCE_HEADER)):
+            continue
+        messages.append(message)
 
     # Add new user message
     messages.append({"role": "user", "content": user_message})
+
+    return messages
+
+
+def _create_completion(messages: list, use_tools: bool = True, stage: str = "agent", verbose: bool = False, tool_names: tuple = None,
+                       route: dict = None):
+    """
+    One (non-streamed) LLM call of the agent, on the model of the stage (see model_router), hedged and with fallback
+    models (see agent.hedging). Records cached vs uncached input tokens. A low-confidence answer of the small model is
+    repeated with the large model.
+
+    Args:
+        messages (list): messages for the chat completion
+        use_tools (bool): offer the tools to the model (False for the forced final answer)
+        stage (str): name of the call for usage reporting and model routing
+        verbose (bool): print token usage
+        tool_names (tuple): selected tools (see tool_selector), None for all tools
+        route (dict): routing state of the request {"escalated": bool}, set to escalated here if needed
+
+    Returns:
+        ChatCompletion: response of the provider
+    """
+    route = route if route is not None else {"escalated": False}
+    request = {"model": model_router.model(stage, route["escalated"]), "messages": messages, "max_tokens": 2000}
+    if use_tools:
+        request["tools"] = _request_tools(tool_names, PROMPT_CACHING, tool_selector.minified)
+        tool_selector.record(tool_names, tool_selector.minified)
+
+    with tracer.span("llm", stage, model=request["model"], messages=len(messages), tools=len(request.get("tools", []))):
+        response, request["model"] = _complete(request)
+        usage = usage_tracker.record(getattr(response, "usage", None), stage, request["model"])
+    if verbose and usage:
+        print(f"   Tokens: {usage['prompt_tokens']} in ({usage['cached_tokens']} cached, "
+              f"{usage['uncached_tokens']} uncached), {usage['completion_tokens']} out ({request['model']})")
+
+    choice = response.choices[0]
+    reason = model_router.low_confidence(request["model"], choice.message.content, choice.message.tool_calls,
+                                         choice.finish_reason)
+    if reason is not None:
+        model_router.record_escalation(reason)
+        route["escalated"] = True
+        if verbose:
+            print(f"   Escalating to {model_router.large_model} ({reason})")
+        return _create_completion(messages, use_tools, stage, verbose, tool_names, route)
+    return response
+
+
+def _complete(request: dict) -> tuple:
+    """Non-streamed completion through the hedger: (response, model that answered)."""
+    return hedger.call(request["model"], lambda model: client.chat.completions.create(**{**request, "model": model}))
+
+
+def _open_stream(request: dict, model: str) -> tuple:
+    """Start a streamed completion on model and wait for its first chunk: (stream, first chunk or None)."""
+    stream = client.chat.completions.create(**{**request, "model": model})
+    try:
+        return stream, next(stream, None)
+    except Exception:
+        stream.close()
+        raise
+
+
+def _escalate_on_tool_errors(route: dict, errors: list) -> None:
+    """Switch the rest of the request to the large model after failed tool calls (if the routing policy says so)."""
+    if errors and not route["escalated"] and model_router.escalate_on_tool_error():
+        model_router.record_escalation("tool_error")
+        route["escalated"] = True
+
+
+def run_agent(user_message: str, conversation_history: list = None, verbose: bool = False, max_rounds: int = 10, stream: bool = False,
+              use_cache: bool = True, plan: bool = None):
+    """
+    Run the agent with multi-round tool calling support.
     
-    if verbose:
-        print(f"\n{'='*60}")
-        print(f"USER: {user_message}")
-        print(f"{'='*60}")
+    This allows the agent to:
+    1. First round: Call helper tools (get_all_industries, get_all_companies, etc.)
+    2. Second round: Use the results to call action tools (filter_use_cases, create_use_case, etc.)
     
+    Args:
+        user_message (str): The user's question/command
+        conversation_history (list) : previous messages and chat history
+        verbose (bool): If True, prints detailed execution info (default: True)
+        max_rounds (int): Maximum number of tool-calling rounds (default: 2)
+        stream (bool): If True, returns a generator of events instead of the final response (see _run_agent_stream)
+        use_cache (bool): answer identical read-only requests from the response cache (default: True)
+        plan (bool): plan-and-execute mode - one planning call, steps executed locally (see agent.planner);
+                     default AGENT_PLAN_MODE
+    
+    Returns:
+        str: The agent's final response (generator of event dicts if stream=True)
+    """
+    plan = PLAN_MODE if plan is None else plan
+
+    # Stream tokens and tool events instead of returning the final answer
+    if stream:
+        return _run_agent_stream(user_message, conversation_history, verbose=verbose, max_rounds=max_rounds, use_cache=use_cache,
+                                 plan=plan)
+
+    with tracer.trace("agent", message=user_message[:200]) as span:
+        # Simple commands ("show use case 5", "approve use case 3") are answered without the LLM
+        fast_answer = intent_router.route(user_message)
+        if fast_answer is not None:
+            span["fast_path"] = True
+            if verbose:
+                print(f"\nUSER: {user_message}\nFAST PATH (no LLM):\n{fast_answer}\n")
+            return fast_answer
+
+        messages = _build_messages(user_message, conversation_history)
+        
+        if verbose:
+            print(f"\n{'='*60}")
+            print(f"USER: {user_message}")
+            print(f"{'='*60}")
+
+        run = (lambda: _run_plan(messages, verbose)) if plan else (lambda: _run_rounds(messages, verbose, max_rounds))
+        if not use_cache:
+            return run()
+
+        # identical read-only request answered before (and no write since) -> cached answer,
+        # identical request running right now -> wait for its answer
+        return response_cache.get_or_run(_cache_key(messages), run)
+
+
+def _run_rounds(messages: list, verbose: bool = False, max_rounds: int = 10) -> str:
+    """
+    Multi-round tool calling loop of run_agent.
+
+    Args:
+        messages (list): messages of the request (system prompt, history, user message), extended in place
+        verbose (bool): If True, prints detailed execution info
+        max_rounds (int): Maximum number of tool-calling rounds
+
+    Returns:
+        str: The agent's final response
+    """
+    # only the tools relevant for this request (None = all), widened if the model asks for more
+    tool_names = tool_selector.select(messages)
+    if verbose and tool_names:
+        print(f"Tools: {', '.join(tool_names)}")
+    route = {"escalated": False}
+
     # Multi-round loop
     for round_num in range(1, max_rounds + 1):
         if verbose and round_num > 1:
@@ -100,12 +302,7 @@ Remember: ALWAYS call the appropriate tool - never assume results!"""
             print(f"{'─'*60}")
         
         # Call LLM
-        response = client.chat.completions.create(
-            model="anthropic/claude-3.5-sonnet",
-            messages=messages,
-            tools=tools,
-            max_tokens=2000
-        )
+        response = _create_completion(messages, verbose=verbose, tool_names=tool_names, route=route)
         
         assistant_message = response.choices[0].message
         
@@ -130,27 +327,21 @@ Remember: ALWAYS call the appropriate tool - never assume results!"""
         # Add assistant's message to history
         messages.append(assistant_message)
         
-        # Execute each tool call
-        for tool_call in assistant_message.tool_calls:
-            function_name = tool_call.function.name
-            arguments_str = tool_call.function.arguments
-            
-            # Parse arguments
-            if arguments_str and arguments_str.strip():
-                arguments = json.loads(arguments_str)
-            else:
-                arguments = {}
-            
+        # Execute the tool calls (independent reads in parallel, writes in order)
+        errors = []
+        for tool_call, function_name, arguments, result in execute_tool_calls(assistant_message.tool_calls):
+            if function_name == MORE_TOOLS_NAME:
+                tool_names = None  # all tools from the next round on
+            if isinstance(result, dict) and "error" in result:
+                errors.append(function_name)
+
             if verbose:
-                print(f"\n   Calling: {function_name}")
+                print(f"\n   Called: {function_name}")
                 if arguments:
                     print(f"      Arguments: {arguments}")
                 else:
                     print(f"      Arguments: (none)")
             
-            # Execute the tool
-            result = execute_tool(function_name, arguments)
-            
             # Display result
             if verbose:
                 if isinstance(result, list):
@@ -168,12 +359,15 @@ Remember: ALWAYS call the appropriate tool - never assume results!"""
                 else:
                     print(f"   Result: {result}")
             
-            # Add tool result to messages
+            # Add tool result to messages (original tool_call order)
             messages.append({
                 "role": "tool",
                 "tool_call_id": tool_call.id,
                 "content": json.dumps(result)
             })
+
+        # failed tool calls: the large model takes over for the rest of the request
+        _escalate_on_tool_errors(route, errors)
     
     # If we exit the loop, we hit max_rounds - make final call without tools
     if verbose:
@@ -181,11 +375,7 @@ Remember: ALWAYS call the appropriate tool - never assume results!"""
         print(f"Generating final response (max rounds reached)...")
         print(f"{'─'*60}")
     
-    final_response = client.chat.completions.create(
-        model="anthropic/claude-3.5-sonnet",
-        messages=messages,
-        max_tokens=2000
-    )
+    final_response = _create_completion(messages, use_tools=False, stage="final", verbose=verbose, route=route)
     
     final_answer = final_response.choices[0].message.content
     
@@ -194,4 +384,314 @@ Remember: ALWAYS call the appropriate tool - never assume results!"""
         print(f"{final_answer}")
         print(f"{'='*60}\n")
     
-    return final_answer
\ No newline at end of file
+    return final_answer
+
+
+def _plan_request(messages: list, tool_names: tuple = None, escalated: bool = False) -> dict:
+    """Arguments of a planning request: selected tools plus the forced submit_plan call (tool selection is counted here)."""
+    request_tools, tool_choice = plan_request_tools(_request_tools(tool_names, PROMPT_CACHING, tool_selector.minified))
+    tool_selector.record(tool_names, tool_selector.minified)
+    return {"model": model_router.model("plan", escalated), "messages": messages, "max_tokens": 2000,
+            "tools": request_tools, "tool_choice": tool_choice}
+
+
+def _plan_events(messages: list, verbose: bool = False, stream: bool = False):
+    """
+    Plan-and-execute mode (see agent.planner): one planning call, the plan executed locally, a new plan only after a
+    failed step. Yields the events of _run_agent_stream plus {"type": "plan", "steps": int} per accepted plan.
+
+    Args:
+        messages (list): messages of the request (system prompt, history, user message)
+        verbose (bool): If True, prints the plan and the executed steps
+        stream (bool): stream the tokens of the answer call
+
+    Yields:
+        dict: events, the last one is {"type": "done", "content": str}
+    """
+    session = PlanSession(messages, tool_selector.select(messages))
+    route = {"escalated": False}
+
+    for attempt in range(PLAN_MAX_REPLANS + 1):
+        if attempt:
+            yield {"type": "round", "round": attempt + 1}
+            if verbose:
+                print(f"\nREPLAN ({session.error})")
+
+        request = _plan_request(session.planning, session.tool_names, route["escalated"])
+        with tracer.span("llm", "plan", model=request["model"], messages=len(session.planning), tools=len(request["tools"])):
+            response, request["model"] = _complete(request)
+            usage_tracker.record(getattr(response, "usage", None), "plan", request["model"])
+
+        plan = session.accept(response.choices[0].message)
+        if plan is None:
+            continue
+        yield {"type": "plan", "steps": len(plan["steps"])}
+        for step in plan["steps"]:
+            yield {"type": "tool_call", "name": step["tool"], "arguments": json.dumps(step.get("arguments", {}))}
+
+        executed = []
+        for item in execute_plan(plan, session.results):
+            executed.append(item)
+            if verbose:
+                print(f"   {item['step']}: {item['tool']} {item['arguments'] or ''} -> "
+                      f"{'Error: ' + item['error'] if item['error'] else 'ok'}")
+            yield {"type": "tool_result", "name": item["tool"], "error": item["error"]}
+        session.finish(executed)
+        _escalate_on_tool_errors(route, [item["tool"] for item in executed if item["error"] is not None])
+        if session.done:
+            break
+
+    answer = session.answer
+    if answer is not None:
+        yield {"type": "token", "content": answer}
+    elif stream:
+        yield {"type": "round", "round": attempt + 2}
+        answer, _ = yield from _stream_completion(session.answer_messages(), use_tools=False, stage="plan_answer",
+                                                  route=route)
+    else:
+        response = _create_completion(session.answer_messages(), use_tools=False, stage="plan_answer", verbose=verbose,
+                                      route=route)
+        answer = response.choices[0].message.content
+
+    if verbose:
+        print(f"\nAGENT RESPONSE:\n{answer}\n{'='*60}\n")
+    yield {"type": "done", "content": answer}
+
+
+def _run_plan(messages: list, verbose: bool = False) -> str:
+    """Plan-and-execute variant of _run_rounds (returns the final answer)."""
+    answer = None
+    for event in _plan_events(messages, verbose):
+        if event["type"] == "done":
+            answer = event["content"]
+    return answer
+
+
+class _StreamAccumulator:
+    """
+    Collects the chunks of one streamed completion: text, tool call deltas (arriving in pieces per index)
+    and usage. Shared by the sync and the async agent.
+    """
+
+    def __init__(self, stage: str = "agent", model: str = None):
+        self.stage = stage
+        self.model = model
+        self.finish_reason = None
+        self.content_parts = []
+        self.calls = {}  # index -> {"id", "name", "arguments"}
+
+    def add(self, chunk) -> list:
+        """
+        Add one chunk.
+
+        Returns:
+            list: events for the chunk ({"type": "token"} / {"type": "tool_call_started"})
+        """
+        events = []
+        if getattr(chunk, "usage", None) is not None:  # usage arrives in a last chunk without choices
+            usage_tracker.record(chunk.usage, self.stage, self.model)
+        if not chunk.choices:
+            return events
+        delta = chunk.choices[0].delta
+        self.finish_reason = chunk.choices[0].finish_reason or self.finish_reason
+
+        if delta.content:
+            self.content_parts.append(delta.content)
+            events.append({"type": "token", "content": delta.content})
+
+        for call_delta in delta.tool_calls or []:
+            call = self.calls.setdefault(call_delta.index, {"id": None, "name": "", "arguments": ""})
+            if call_delta.id:
+                call["id"] = call_delta.id
+            if call_delta.function and call_delta.function.name:
+                call["name"] += call_delta.function.name
+                events.append({"type": "tool_call_started", "name": call["name"]})
+            if call_delta.function and call_delta.function.arguments:
+                call["arguments"] += call_delta.function.arguments
+        return events
+
+    def result(self) -> tuple:
+        """(text content, list of ChatCompletionMessageToolCall)"""
+        tool_calls = [
+            ChatCompletionMessageToolCall(
+                id=call["id"], type="function", function=Function(name=call["name"], arguments=call["arguments"])
+            )
+            for _, call in sorted(self.calls.items())
+        ]
+        return "".join(self.content_parts), tool_calls
+
+
+def _stream_request(messages: list, use_tools: bool = True, tool_names: tuple = None, model: str = MODEL) -> dict:
+    """Arguments of a streamed completion request (tool selection is counted here)."""
+    request = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": 2000,
+        "stream": True,
+        "stream_options": {"include_usage": True}
+    }
+    if use_tools:
+        request["tools"] = _request_tools(tool_names, PROMPT_CACHING, tool_selector.minified)
+        tool_selector.record(tool_names, tool_selector.minified)
+    return request
+
+
+def _stream_completion(messages: list, use_tools: bool = True, stage: str = "agent", tool_names: tuple = None,
+                       route: dict = None):
+    """
+    One streamed LLM call on the model of the stage (see model_router), hedged on the first chunk and with fallback
+    models (see agent.hedging). Yields token and tool_call_started events while the response arrives. A low-confidence answer of the small model is followed by a retry event and repeated
+    with the large model (the UI replaces the streamed text).
+
+    Args:
+        messages (list): messages for the chat completion
+        use_tools (bool): offer the tools to the model (False for the forced final answer)
+        stage (str): name of the call for usage reporting and model routing
+        tool_names (tuple): selected tools (see tool_selector), None for all tools
+        route (dict): routing state of the request {"escalated": bool}, set to escalated here if needed
+
+    Yields:
+        dict: {"type": "token", "content": str}, {"type": "tool_call_started", "name": str} or
+              {"type": "retry", "reason": str}
+
+    Returns:
+        tuple: (text content, list of ChatCompletionMessageToolCall) via StopIteration.value
+    """
+    route = route if route is not None else {"escalated": False}
+    request = _stream_request(messages, use_tools, tool_names, model_router.model(stage, route["escalated"]))
+    with tracer.span("llm", stage, model=request["model"], messages=len(messages), tools=len(request.get("tools", [])),
+                     stream=True):
+        (stream, first), request["model"] = hedger.call(request["model"], functools.partial(_open_stream, request),
+                                                        streamed=True, discard=lambda opened: opened[0].close())
+        accumulator = _StreamAccumulator(stage, request["model"])
+        if first is not None:
+            yield from accumulator.add(first)
+        for chunk in stream:
+            yield from accumulator.add(chunk)
+
+    content, tool_calls = accumulator.result()
+    reason = model_router.low_confidence(request["model"], content, tool_calls, accumulator.finish_reason)
+    if reason is not None:
+        model_router.record_escalation(reason)
+        route["escalated"] = True
+        yield {"type": "retry", "reason": reason}
+        return (yield from _stream_completion(messages, use_tools, stage, tool_names, route))
+    return content, tool_calls
+
+
+def _run_agent_stream(user_message: str, conversation_history: list = None, verbose: bool = False, max_rounds: int = 10,
+                      use_cache: bool = True, plan: bool = False):
+    """
+    Streaming variant of run_agent (run_agent(..., stream=True)).
+    Same multi-round tool calling, but yields events as soon as they arrive:
+
+        {"type": "token", "content": str}                         text token of the answer
+        {"type": "tool_call_started", "name": str}                model started a tool call
+        {"type": "tool_call", "name": str, "arguments": dict}     tool call about to be executed
+        {"type": "tool_result", "name": str, "error": str|None}   tool call finished
+        {"type": "round", "round": int}                           new LLM round starts (after tool results)
+        {"type": "plan", "steps": int}                            plan accepted (plan mode)
+        {"type": "retry", "reason": str}                          streamed text discarded, repeated with the large model
+        {"type": "done", "content": str}                          final answer (last event)
+
+    A cached answer is sent as one token event (no single-flight for streamed runs: tokens can't be shared).
+
+    Tokens of rounds that end in tool calls are streamed too (the model often says what it is going to do).
+
+    Args:
+        user_message (str): The user's question/command
+        conversation_history (list) : previous messages and chat history
+        verbose (bool): If True, prints tool calls
+        max_rounds (int): Maximum number of tool-calling rounds
+        use_cache (bool): answer from / store into the response cache
+        plan (bool): plan-and-execute mode (see agent.planner)
+
+    Yields:
+        dict: events as described above
+    """
+    with tracer.trace("agent", message=user_message[:200], stream=True) as span:
+        # Simple commands are answered without the LLM
+        fast_answer = intent_router.route(user_message)
+        if fast_answer is not None:
+            span["fast_path"] = True
+            yield {"type": "token", "content": fast_answer}
+            yield {"type": "done", "content": fast_answer, "fast_path": True}
+            return
+
+        yield from _stream_events(user_message, conversation_history, verbose, max_rounds, use_cache, plan)
+
+
+def _stream_events(user_message: str, conversation_history: list = None, verbose: bool = False, max_rounds: int = 10,
+                   use_cache: bool = True, plan: bool = False):
+    """Events of _run_agent_stream after the fast path (cache, multi-round tool calling or plan mode)."""
+    messages = _build_messages(user_message, conversation_history)
+
+    if use_cache:
+        key = _cache_key(messages)
+        version = data_version()
+        cached = response_cache.get(key)
+        if cached is not None:
+            tracer.annotate(cached=True)
+            yield {"type": "token", "content": cached}
+            yield {"type": "done", "content": cached, "cached": True}
+            return
+
+    if plan:
+        for event in _plan_events(messages, verbose, stream=True):
+            if event["type"] == "done" and use_cache:
+                response_cache.put(key, event["content"], version)
+            yield event
+        return
+
+    tool_names = tool_selector.select(messages)
+    route = {"escalated": False}
+
+    for round_num in range(1, max_rounds + 1):
+        if round_num > 1:
+            yield {"type": "round", "round": round_num}
+
+        content, tool_calls = yield from _stream_completion(messages, tool_names=tool_names, route=route)
+
+        # No more tools to call - streamed content is the final answer
+        if not tool_calls:
+            if use_cache:
+                response_cache.put(key, content, version)
+            yield {"type": "done", "content": content}
+            return
+
+        messages.append({
+            "role": "assistant",
+            "content": content or None,
+            "tool_calls": [call.model_dump() for call in tool_calls]
+        })
+
+        for tool_call in tool_calls:
+            yield {"type": "tool_call", "name": tool_call.function.name, "arguments": tool_call.function.arguments}
+
+        # Execute the tool calls (independent reads in parallel, writes in order)
+        errors = []
+        for tool_call, function_name, arguments, result in execute_tool_calls(tool_calls):
+            if function_name == MORE_TOOLS_NAME:
+                tool_names = None  # all tools from the next round on
+
+            error = result.get("error") if isinstance(result, dict) else None
+            if error is not None:
+                errors.append(function_name)
+            if verbose:
+                print(f"   Called: {function_name} {arguments or ''} -> {'Error: ' + error if error else 'ok'}")
+            yield {"type": "tool_result", "name": function_name, "error": error}
+
+            messages.append({
+                "role": "tool",
+                "tool_call_id": tool_call.id,
+                "content": json.dumps(result)
+            })
+
+        _escalate_on_tool_errors(route, errors)
+
+    # max_rounds reached - final answer without tools
+    yield {"type": "round", "round": max_rounds + 1}
+    content, _ = yield from _stream_completion(messages, use_tools=False, stage="final", route=route)
+    if use_cache:
+        response_cache.put(key, content, version)
+    yield {"type": "done", "content": content}
@@ -0,0 +1,349 @@
+"""
+Async agent on AsyncOpenAI, for the NiceGUI handlers.
+Same behaviour as run_agent (fast path, response cache, tool selection, multi-round tool calling, streaming),
+but the LLM calls don't pin a thread: a chat waiting for the model is just a suspended coroutine.
+
+- Cancellation: cancelling the task (e.g. when the browser disconnects) stops the run at the next await;
+  the open LLM stream is closed. Tool calls already running in a worker thread finish, nothing after them runs.
+- Timeouts: every LLM call is limited to LLM_CALL_TIMEOUT_SECONDS (TimeoutError).
+- Concurrency: at most AGENT_MAX_CONCURRENT_LLM_CALLS LLM calls run at the same time in the process.
+"""
+
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import time
+from typing import AsyncIterator, Optional
+
+from agent.agent import (
+    _build_messages, _cache_key, _escalate_on_tool_errors, _plan_request, _stream_request, _StreamAccumulator
+)
+from agent.hedging import hedger
+from agent.intent_router import intent_router
+from agent.llm_client import get_async_client
+from agent.model_router import model_router
+from agent.parallel_executor import execute_tool_calls
+from agent.planner import PLAN_MODE, PLAN_MAX_REPLANS, PlanSession, execute_plan
+from agent.response_cache import response_cache
+from agent.tool_selector import tool_selector, MORE_TOOLS_NAME
+from agent.tracing import tracer
+from agent.usage import usage_tracker
+from models.base import data_version
+
+# maximum seconds per LLM call (whole streamed response)
+LLM_CALL_TIMEOUT_SECONDS = float(os.getenv("AGENT_LLM_CALL_TIMEOUT", "60"))
+
+# maximum LLM calls in flight at the same time (all chats of the process)
+AGENT_MAX_CONCURRENT_LLM_CALLS = int(os.getenv("AGENT_MAX_CONCURRENT_LLM_CALLS", "8"))
+
+_semaphores = {}  # event loop -> semaphore (asyncio primitives belong to one loop)
+
+
+def _llm_semaphore() -> asyncio.Semaphore:
+    """Semaphore limiting concurrent LLM calls on the running event loop."""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(AGENT_MAX_CONCURRENT_LLM_CALLS)
+    return semaphore
+
+
+@contextlib.asynccontextmanager
+async def llm_call_slot(timeout: float = LLM_CALL_TIMEOUT_SECONDS):
+    """
+    Wait for a free LLM call slot (global concurrency limit), then limit the call to timeout seconds.
+
+    Usage:
+        async with llm_call_slot():
+            response = await get_async_client().chat.completions.create(...)
+    """
+    async with _llm_semaphore():
+        async with asyncio.timeout(timeout):
+            yield
+
+
+async def _complete_async(request: dict) -> tuple:
+    """Non-streamed completion through the hedger: (response, model that answered)."""
+    return await hedger.call_async(
+        request["model"], lambda model: get_async_client().chat.completions.create(**{**request, "model": model})
+    )
+
+
+async def _open_stream_async(request: dict, model: str) -> tuple:
+    """Start a streamed completion on model and wait for its first chunk: (stream, first chunk or None)."""
+    stream = await get_async_client().chat.completions.create(**{**request, "model": model})
+    try:
+        return stream, await stream.__anext__()
+    except StopAsyncIteration:
+        return stream, None
+    except BaseException:
+        await stream.close()  # failed or cancelled (the hedge won)
+        raise
+
+
+async def _close_stream(opened: tuple) -> None:
+    await opened[0].close()
+
+
+async def _stream_completion_async(messages: list, result: dict, use_tools: bool = True, stage: str = "agent",
+                                   tool_names: tuple = None, route: dict = None) -> AsyncIterator[dict]:
+    """
+    One streamed LLM call on the model of the stage (see model_router), within the concurrency limit and the
+    per-call timeout, hedged on the first chunk and with fallback models (see agent.hedging). A low-confidence answer of the small model is repeated with the large model.
+
+    Args:
+        messages (list): messages for the chat completion
+        result (dict): receives "content" and "tool_calls" when the call is complete
+        use_tools (bool): offer the tools to the model (False for the forced final answer)
+        stage (str): name of the call for usage reporting and model routing
+        tool_names (tuple): selected tools (see tool_selector), None for all tools
+        route (dict): routing state of the request {"escalated": bool}, set to escalated here if needed
+
+    Yields:
+        dict: token, tool_call_started and retry events
+    """
+    route = route if route is not None else {"escalated": False}
+    request = _stream_request(messages, use_tools, tool_names, model_router.model(stage, route["escalated"]))
+    with tracer.span("llm", stage, model=request["model"], messages=len(messages), tools=len(request.get("tools", [])),
+                     stream=True) as span:
+        waiting_since = time.perf_counter()
+        async with llm_call_slot():
+            span["queued_ms"] = round((time.perf_counter() - waiting_since) * 1000, 2)  # waited for a free slot
+            (stream, first), request["model"] = await hedger.call_async(
+                request["model"], functools.partial(_open_stream_async, request), streamed=True, discard=_close_stream
+            )
+            accumulator = _StreamAccumulator(stage, request["model"])
+            try:
+                if first is not None:
+                    for event in accumulator.add(first):
+                        yield event
+                async for chunk in stream:
+                    for event in accumulator.add(chunk):
+                        yield event
+            finally:
+                await stream.close()  # also on cancellation: don't keep reading from the provider
+
+    result["content"], result["tool_calls"] = accumulator.result()
+    reason = model_router.low_confidence(request["model"], result["content"], result["tool_calls"],
+                                         accumulator.finish_reason)
+    if reason is not None:
+        model_router.record_escalation(reason)
+        route["escalated"] = True
+        yield {"type": "retry", "reason": reason}
+        async for event in _stream_completion_async(messages, result, use_tools, stage, tool_names, route):
+            yield event
+
+
+async def _run_rounds_async(messages: list, verbose: bool = False, max_rounds: int = 10) -> AsyncIterator[dict]:
+    """Multi-round tool calling of stream_agent_async (without fast path and cache)."""
+    tool_names = tool_selector.select(messages)
+    result = {}
+    route = {"escalated": False}
+
+    for round_num in range(1, max_rounds + 1):
+        if round_num > 1:
+            yield {"type": "round", "round": round_num}
+
+        async for event in _stream_completion_async(messages, result, tool_names=tool_names, route=route):
+            yield event
+        content, tool_calls = result["content"], result["tool_calls"]
+
+        # No more tools to call - streamed content is the final answer
+        if not tool_calls:
+            yield {"type": "done", "content": content}
+            return
+
+        messages.append({
+            "role": "assistant",
+            "content": content or None,
+            "tool_calls": [call.model_dump() for call in tool_calls]
+        })
+
+        for tool_call in tool_calls:
+            yield {"type": "tool_call", "name": tool_call.function.name, "arguments": tool_call.function.arguments}
+
+        # database work stays synchronous - run the round's tool calls in a worker thread
+        executed = await asyncio.to_thread(execute_tool_calls, tool_calls)
+
+        errors = []
+        for tool_call, function_name, arguments, tool_result in executed:
+            if function_name == MORE_TOOLS_NAME:
+                tool_names = None  # all tools from the next round on
+
+            error = tool_result.get("error") if isinstance(tool_result, dict) else None
+            if error is not None:
+                errors.append(function_name)
+            if verbose:
+                print(f"   Called: {function_name} {arguments or ''} -> {'Error: ' + error if error else 'ok'}")
+            yield {"type": "tool_result", "name": function_name, "error": error}
+
+            messages.append({
+                "role": "tool",
+                "tool_call_id": tool_call.id,
+                "content": json.dumps(tool_result)
+            })
+
+        _escalate_on_tool_errors(route, errors)
+
+    # max_rounds reached - final answer without tools
+    yield {"type": "round", "round": max_rounds + 1}
+    async for event in _stream_completion_async(messages, result, use_tools=False, stage="final", route=route):
+        yield event
+    yield {"type": "done", "content": result["content"]}
+
+
+async def _plan_events_async(messages: list, verbose: bool = False) -> AsyncIterator[dict]:
+    """Plan-and-execute mode of stream_agent_async (see agent.agent._plan_events)."""
+    session = PlanSession(messages, tool_selector.select(messages))
+    route = {"escalated": False}
+
+    for attempt in range(PLAN_MAX_REPLANS + 1):
+        if attempt:
+            yield {"type": "round", "round": attempt + 1}
+
+        request = _plan_request(session.planning, session.tool_names, route["escalated"])
+        with tracer.span("llm", "plan", model=request["model"], messages=len(session.planning), tools=len(request["tools"])):
+            async with llm_call_slot():
+                response, request["model"] = await _complete_async(request)
+            usage_tracker.record(getattr(response, "usage", None), "plan", request["model"])
+
+        plan = session.accept(response.choices[0].message)
+        if plan is None:
+            continue
+        yield {"type": "plan", "steps": len(plan["steps"])}
+        for step in plan["steps"]:
+            yield {"type": "tool_call", "name": step["tool"], "arguments": json.dumps(step.get("arguments", {}))}
+
+        # database work stays synchronous - run the plan in a worker thread
+        executed = await asyncio.to_thread(lambda: list(execute_plan(plan, session.results)))
+        for item in executed:
+            if verbose:
+                print(f"   {item['step']}: {item['tool']} {item['arguments'] or ''} -> "
+                      f"{'Error: ' + item['error'] if item['error'] else 'ok'}")
+            yield {"type": "tool_result", "name": item["tool"], "error": item["error"]}
+        session.finish(executed)
+        _escalate_on_tool_errors(route, [item["tool"] for item in executed if item["error"] is not None])
+        if session.done:
+            break
+
+    if session.answer is not None:
+        yield {"type": "token", "content": session.answer}
+        yield {"type": "done", "content": session.answer}
+        return
+
+    yield {"type": "round", "round": attempt + 2}
+    result = {}
+    async for event in _stream_completion_async(session.answer_messages(), result, use_tools=False, stage="plan_answer",
+                                                route=route):
+        yield event
+    yield {"type": "done", "content": result["content"]}
+
+
+async def stream_agent_async(user_message: str, conversation_history: list = None, verbose: bool = False,
+                             max_rounds: int = 10, use_cache: bool = True, plan: bool = None) -> AsyncIterator[dict]:
+    """
+    Async variant of run_agent(..., stream=True): yields the same events
+    (token, tool_call_started, tool_call, tool_result, round, plan, retry, done).
+
+    Identical concurrent read-only requests are coalesced: followers wait for the leader's answer and get it
+    as one token event.
+
+    Args:
+        user_message (str): The user's question/command
+        conversation_history (list) : previous messages and chat history
+        verbose (bool): If True, prints tool calls
+        max_rounds (int): Maximum number of tool-calling rounds
+        use_cache (bool): answer from / store into the response cache
+        plan (bool): plan-and-execute mode (see agent.planner), default AGENT_PLAN_MODE
+
+    Yields:
+        dict: events
+    """
+    plan = PLAN_MODE if plan is None else plan
+    with tracer.trace("agent", message=user_message[:200], stream=True):
+        async for event in _stream_agent_events(user_message, conversation_history, verbose, max_rounds, use_cache, plan):
+            yield event
+
+
+async def _stream_agent_events(user_message: str, conversation_history: list = None, verbose: bool = False,
+                               max_rounds: int = 10, use_cache: bool = True, plan: bool = False) -> AsyncIterator[dict]:
+    """Events of stream_agent_async (fast path, cache, single-flight, multi-round tool calling or plan mode)."""
+    # Simple commands are answered without the LLM (database access in a worker thread)
+    fast_answer = await asyncio.to_thread(intent_router.route, user_message)
+    if fast_answer is not None:
+        tracer.annotate(fast_path=True)
+        yield {"type": "token", "content": fast_answer}
+        yield {"type": "done", "content": fast_answer, "fast_path": True}
+        return
+
+    messages = _build_messages(user_message, conversation_history)
+
+    def run():
+        return _plan_events_async(messages, verbose) if plan else _run_rounds_async(messages, verbose, max_rounds)
+
+    if not use_cache:
+        async for event in run():
+            yield event
+        return
+
+    key = _cache_key(messages)
+    cached = response_cache.get(key, count_miss=False)
+    if cached is not None:
+        tracer.annotate(cached=True)
+        yield {"type": "token", "content": cached}
+        yield {"type": "done", "content": cached, "cached": True}
+        return
+
+    flight, leader = response_cache.join_async(key)
+    if not leader:
+        shared = await asyncio.shield(flight)
+        response_cache.note_follower(shared is not None)
+        tracer.annotate(coalesced=shared is not None)
+        if shared is not None:
+            yield {"type": "token", "content": shared}
+            yield {"type": "done", "content": shared, "cached": True}
+            return
+        # the leader wrote data or failed - run on our own
+        async for event in run():
+            yield event
+        return
+
+    version = data_version()
+    shareable = None
+    try:
+        async for event in run():
+            if event["type"] == "done" and response_cache.put(key, event["content"], version):
+                shareable = event["content"]
+            yield event
+    finally:
+        response_cache.finish_async(key, shareable)
+
+
+async def run_agent_async(user_message: str, conversation_history: list = None, verbose: bool = False,
+                          max_rounds: int = 10, use_cache: bool = True, plan: bool = None) -> Optional[str]:
+    """
+    Async variant of run_agent.
+
+    Args:
+        user_message (str): The user's question/command
+        conversation_history (list) : previous messages and chat history
+        verbose (bool): If True, prints tool calls
+        max_rounds (int): Maximum number of tool-calling rounds
+        use_cache (bool): answer from / store into the response cache
+        plan (bool): plan-and-execute mode (see agent.planner), default AGENT_PLAN_MODE
+
+    Returns:
+        str: The agent's final response
+
+    Raises:
+        TimeoutError: If an LLM call takes longer than LLM_CALL_TIMEOUT_SECONDS
+        asyncio.CancelledError: If the task is cancelled
+    """
+    answer = None
+    async for event in stream_agent_async(user_message, conversation_history, verbose=verbose,
+                                          max_rounds=max_rounds, use_cache=use_cache, plan=plan):
+        if event["type"] == "done":
+            answer = event["content"]
+    return answer
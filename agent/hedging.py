@@ -0,0 +1,400 @@
+"""
+Hedged LLM requests, a fallback model chain and a circuit breaker per model, against the latency tail of the
+provider (a few very slow completions dominate p99 of the chat).
+
+- Hedging: if a call has not answered by its deadline, a second request is sent and the first response wins.
+  The deadline is the AGENT_HEDGE_PERCENTILE percentile of the recent latencies of the model (clamped to
+  AGENT_HEDGE_MIN_DELAY .. AGENT_HEDGE_MAX_DELAY; AGENT_HEDGE_DELAY until AGENT_HEDGE_MIN_SAMPLES calls were seen).
+  The hedge goes to the same model, or to the fallback model with AGENT_HEDGE_TO_FALLBACK=1. For streamed calls
+  "answered" means the first chunk arrived. The slower request is abandoned: cancelled (async) or closed as soon
+  as it finishes (sync, its worker thread can't be interrupted).
+- Fallback chain (AGENT_MODEL_FALLBACKS, JSON model -> fallback model; default large <-> small model of
+  agent.model_router): a call that fails after the transport retries (timeout, connection error, 429, 5xx) is
+  repeated with the next model of the chain. Client errors (400 context length, 401, 422 invalid tool schema, ...)
+  would fail on every model: they are raised right away and don't count for the circuit breaker.
+- Circuit breaker: a model with an error rate of at least AGENT_BREAKER_ERROR_RATE over its calls of the last
+  AGENT_BREAKER_WINDOW seconds (at least AGENT_BREAKER_MIN_CALLS calls) is skipped for AGENT_BREAKER_COOLDOWN
+  seconds - calls go straight to its fallback. After the cooldown one trial call decides whether it closes again.
+
+AGENT_HEDGING=0 switches hedging off (fallbacks and the circuit breaker stay active).
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import openai
+
+from agent.model_router import MODELS
+from agent.tracing import tracer
+
+# hedging on/off, deadline percentile and bounds (seconds), calls per model before the percentile is used
+HEDGING_ENABLED = os.getenv("AGENT_HEDGING", "1") == "1"
+HEDGE_PERCENTILE = float(os.getenv("AGENT_HEDGE_PERCENTILE", "95"))
+HEDGE_DELAY = float(os.getenv("AGENT_HEDGE_DELAY", "10"))
+HEDGE_MIN_DELAY = float(os.getenv("AGENT_HEDGE_MIN_DELAY", "1"))
+HEDGE_MAX_DELAY = float(os.getenv("AGENT_HEDGE_MAX_DELAY", "30"))
+HEDGE_MIN_SAMPLES = int(os.getenv("AGENT_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_TO_FALLBACK = os.getenv("AGENT_HEDGE_TO_FALLBACK", "0") == "1"
+
+# worker threads of the sync client (primary and hedge request of every call in flight)
+HEDGE_WORKERS = int(os.getenv("AGENT_HEDGE_WORKERS", "16"))
+
+# model -> fallback model
+FALLBACKS = json.loads(os.getenv("AGENT_MODEL_FALLBACKS", "") or "null") or {
+    MODELS["large"]: MODELS["small"],
+    MODELS["small"]: MODELS["large"]
+}
+
+# circuit breaker: error rate, window (seconds), minimum calls in the window, seconds a tripped model is skipped
+BREAKER_ERROR_RATE = float(os.getenv("AGENT_BREAKER_ERROR_RATE", "0.5"))
+BREAKER_WINDOW = float(os.getenv("AGENT_BREAKER_WINDOW", "60"))
+BREAKER_MIN_CALLS = int(os.getenv("AGENT_BREAKER_MIN_CALLS", "5"))
+BREAKER_COOLDOWN = float(os.getenv("AGENT_BREAKER_COOLDOWN", "30"))
+
+_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+
+
+def is_model_failure(error: BaseException) -> bool:
+    """
+    Whether an error means the model (provider) failed: timeouts, connection errors, 429 and 5xx responses.
+    Other errors are the request's fault and would fail the same way on every model.
+
+    Args:
+        error (BaseException) : error of a call
+
+    Returns:
+        bool : True if the call may be repeated with the fallback model and counts for the circuit breaker
+    """
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (openai.APIConnectionError, httpx.TransportError, TimeoutError, ConnectionError))
+
+
+class CircuitBreaker:
+    """
+    Error rate per model over a sliding time window; a model over the threshold is open (skipped) until the
+    cooldown is over, then half open (one trial call closes or reopens it).
+    """
+
+    def __init__(self, error_rate: float = BREAKER_ERROR_RATE, window: float = BREAKER_WINDOW,
+                 min_calls: int = BREAKER_MIN_CALLS, cooldown: float = BREAKER_COOLDOWN):
+        self.error_rate = error_rate
+        self.window = window
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self._calls = {}  # model -> deque of (time, ok)
+        self._open_until = {}  # model -> time.monotonic() when the cooldown ends
+        self._trials = set()  # half open models with a trial call in flight
+        self._stats = {"opened": 0, "closed": 0, "skipped": 0}
+        self._lock = threading.Lock()
+
+    def allow(self, model: str) -> bool:
+        """Whether a call may go to model (counts a skip if not; takes the trial slot of a half open model)."""
+        with self._lock:
+            until = self._open_until.get(model)
+            if until is None:
+                return True
+            if time.monotonic() >= until and model not in self._trials:
+                self._trials.add(model)
+                return True
+            self._stats["skipped"] += 1
+            return False
+
+    def record(self, model: str, ok: bool) -> None:
+        """Outcome of a call to model."""
+        now = time.monotonic()
+        with self._lock:
+            if model in self._trials or (model in self._open_until and now >= self._open_until[model]):
+                self._trials.discard(model)
+                if ok:
+                    del self._open_until[model]
+                    self._calls.pop(model, None)
+                    self._stats["closed"] += 1
+                else:
+                    self._open_until[model] = now + self.cooldown
+                return
+            if model in self._open_until:
+                return  # late result of a call started before the circuit opened
+
+            calls = self._calls.setdefault(model, deque())
+            calls.append((now, ok))
+            while calls and calls[0][0] < now - self.window:
+                calls.popleft()
+            errors = sum(1 for _, succeeded in calls if not succeeded)
+            if len(calls) >= self.min_calls and errors / len(calls) >= self.error_rate:
+                self._open_until[model] = now + self.cooldown
+                calls.clear()
+                self._stats["opened"] += 1
+
+    def release(self, model: str) -> None:
+        """A call to model ended without an outcome for the breaker (client error): frees a taken trial slot."""
+        with self._lock:
+            self._trials.discard(model)
+
+    def state(self, model: str) -> str:
+        """'closed', 'open' or 'half_open'."""
+        with self._lock:
+            until = self._open_until.get(model)
+        if until is None:
+            return "closed"
+        return "open" if time.monotonic() < until else "half_open"
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            models = set(self._calls) | set(self._open_until)
+        stats["models"] = {model: self.state(model) for model in sorted(models)}
+        return stats
+
+
+class Hedger:
+    """
+    Runs LLM calls with the fallback chain, hedging and the circuit breaker; keeps the recent latencies per model.
+    """
+
+    def __init__(self, enabled: bool = HEDGING_ENABLED, fallbacks: Dict[str, str] = None,
+                 breaker: CircuitBreaker = None, max_samples: int = 200):
+        self.enabled = enabled
+        self.fallbacks = dict(FALLBACKS if fallbacks is None else fallbacks)
+        self.breaker = breaker or CircuitBreaker()
+        self.max_samples = max_samples
+        self._latencies = {}  # (model, streamed) -> deque of seconds
+        self._stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "fallbacks": 0, "errors": 0, "client_errors": 0}
+        self._lock = threading.Lock()
+
+    def deadline(self, model: str, streamed: bool = False) -> float:
+        """Seconds after which a call to model gets a hedge request."""
+        with self._lock:
+            samples = sorted(self._latencies.get((model, streamed), ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DELAY
+        index = max(math.ceil(HEDGE_PERCENTILE / 100 * len(samples)) - 1, 0)
+        return min(max(samples[index], HEDGE_MIN_DELAY), HEDGE_MAX_DELAY)
+
+    def chain(self, model: str) -> List[str]:
+        """model and its fallbacks in order."""
+        chain = [model]
+        while self.fallbacks.get(chain[-1]) and self.fallbacks[chain[-1]] not in chain:
+            chain.append(self.fallbacks[chain[-1]])
+        return chain
+
+    def _candidates(self, model: str) -> Iterator[str]:
+        """Models of the chain whose circuit lets the call through (checked lazily; the last one if none does)."""
+        chain = self.chain(model)
+        tried = False
+        for position, candidate in enumerate(chain):
+            if self.breaker.allow(candidate) or (not tried and position + 1 == len(chain)):
+                tried = True
+                yield candidate
+
+    def _hedge_model(self, model: str) -> str:
+        """Model of the hedge request: the fallback (if configured and its circuit is closed) or model itself."""
+        fallback = self.fallbacks.get(model)
+        if HEDGE_TO_FALLBACK and fallback and self.breaker.state(fallback) == "closed":
+            return fallback
+        return model
+
+    def call(self, model: str, send: Callable[[str], Any], streamed: bool = False,
+             discard: Callable[[Any], None] = None) -> Tuple[Any, str]:
+        """
+        Run send(model) with hedging, falling back along the chain on model failures (see is_model_failure);
+        client errors are raised right away.
+
+        Args:
+            model (str) : model chosen for the call (see model_router)
+            send (Callable[[str], Any]) : sends the request to the given model and returns the response
+                                          (streamed: once the first chunk arrived)
+            streamed (bool) : streamed call (own latency statistics: time to first chunk)
+            discard (Callable[[Any], None]) : releases the response of an abandoned request (e.g. closes a stream)
+
+        Returns:
+            Tuple[Any, str] : response and the model that produced it
+        """
+        self._count("calls")
+        error, failed = None, None
+        for candidate in self._candidates(model):
+            if error is not None:
+                self._fell_back(failed, candidate)
+            try:
+                return self._race(candidate, send, streamed, discard)
+            except Exception as call_error:
+                if not is_model_failure(call_error):
+                    self._count("client_errors")
+                    raise
+                self._count("errors")
+                error, failed = call_error, candidate
+        raise error
+
+    async def call_async(self, model: str, send: Callable[[str], Any], streamed: bool = False,
+                         discard: Callable[[Any], Any] = None) -> Tuple[Any, str]:
+        """Async variant of call (send and discard are coroutine functions; the slower request is cancelled)."""
+        self._count("calls")
+        error, failed = None, None
+        for candidate in self._candidates(model):
+            if error is not None:
+                self._fell_back(failed, candidate)
+            try:
+                return await self._race_async(candidate, send, streamed, discard)
+            except Exception as call_error:
+                if not is_model_failure(call_error):
+                    self._count("client_errors")
+                    raise
+                self._count("errors")
+                error, failed = call_error, candidate
+        raise error
+
+    def _race(self, model: str, send, streamed: bool, discard) -> Tuple[Any, str]:
+        if not self.enabled:
+            return self._attempt(send, model, streamed), model
+        first = _executor.submit(contextvars.copy_context().run, self._attempt, send, model, streamed)
+        if wait([first], timeout=self.deadline(model, streamed)).done:
+            return first.result(), model
+
+        hedge_model = self._hedge_model(model)
+        self._hedged(model, hedge_model, streamed)
+        second = _executor.submit(contextvars.copy_context().run, self._attempt, send, hedge_model, streamed)
+        pending = {first: model, second: hedge_model}
+        error = None
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                winner = pending.pop(future)
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                for loser in pending:
+                    loser.add_done_callback(lambda abandoned: _discard(abandoned, discard))
+                if future is second:
+                    self._count("hedge_wins")
+                tracer.annotate(model=winner)
+                return future.result(), winner
+        raise error
+
+    async def _race_async(self, model: str, send, streamed: bool, discard) -> Tuple[Any, str]:
+        if not self.enabled:
+            return await self._attempt_async(send, model, streamed), model
+        first = asyncio.ensure_future(self._attempt_async(send, model, streamed))
+        pending = {first: model}
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self.deadline(model, streamed))
+            if done:
+                pending.clear()
+                return first.result(), model
+
+            hedge_model = self._hedge_model(model)
+            self._hedged(model, hedge_model, streamed)
+            second = asyncio.ensure_future(self._attempt_async(send, hedge_model, streamed))
+            pending[second] = hedge_model
+            error = None
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=FIRST_COMPLETED)
+                for task in done:
+                    winner = pending.pop(task)
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    if task is second:
+                        self._count("hedge_wins")
+                    tracer.annotate(model=winner)
+                    return task.result(), winner
+            raise error
+        finally:
+            for task in pending:  # the slower request (or all of them when the caller was cancelled)
+                task.cancel()
+                task.add_done_callback(lambda abandoned: _discard_async(abandoned, discard))
+
+    def _attempt(self, send, model: str, streamed: bool):
+        start = time.perf_counter()
+        try:
+            response = send(model)
+        except Exception as error:
+            self._failed(model, error)
+            raise
+        self._succeeded(model, streamed, time.perf_counter() - start)
+        return response
+
+    async def _attempt_async(self, send, model: str, streamed: bool):
+        start = time.perf_counter()
+        try:
+            response = await send(model)
+        except asyncio.CancelledError:
+            self._sample(model, streamed, time.perf_counter() - start)  # lost the race: at least this slow
+            raise
+        except Exception as error:
+            self._failed(model, error)
+            raise
+        self._succeeded(model, streamed, time.perf_counter() - start)
+        return response
+
+    def _failed(self, model: str, error: Exception) -> None:
+        if is_model_failure(error):
+            self.breaker.record(model, False)
+        else:
+            self.breaker.release(model)  # the model answered, the request was wrong
+
+    def _succeeded(self, model: str, streamed: bool, seconds: float) -> None:
+        self.breaker.record(model, True)
+        self._sample(model, streamed, seconds)
+
+    def _sample(self, model: str, streamed: bool, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault((model, streamed), deque(maxlen=self.max_samples)).append(seconds)
+
+    def _hedged(self, model: str, hedge_model: str, streamed: bool) -> None:
+        self._count("hedged")
+        tracer.annotate(hedged=True, hedge_model=hedge_model,
+                        hedge_after_ms=round(self.deadline(model, streamed) * 1000, 1))
+
+    def _fell_back(self, model: str, fallback: str) -> None:
+        self._count("fallbacks")
+        tracer.annotate(failed_model=model, model=fallback)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def reset(self) -> None:
+        """Forget latencies and counters (circuit states stay)."""
+        with self._lock:
+            self._latencies.clear()
+            for key in self._stats:
+                self._stats[key] = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls, hedged calls (and how often the hedge won), fallbacks, current deadlines and circuit states."""
+        with self._lock:
+            stats = dict(self._stats)
+            keys = list(self._latencies)
+        stats["enabled"] = self.enabled
+        stats["hedge_rate"] = round(stats["hedged"] / stats["calls"], 3) if stats["calls"] else 0.0
+        stats["deadlines_ms"] = {f"{model}{' (stream)' if streamed else ''}": round(self.deadline(model, streamed) * 1000)
+                                 for model, streamed in keys}
+        stats["breaker"] = self.breaker.stats()
+        return stats
+
+
+def _discard(future, discard: Optional[Callable[[Any], None]]) -> None:
+    """Release the response of an abandoned sync request."""
+    if discard is not None and future.exception() is None:
+        with contextlib.suppress(Exception):
+            discard(future.result())
+
+
+def _discard_async(task: asyncio.Future, discard: Optional[Callable[[Any], Any]]) -> None:
+    """Release the response of an abandoned async request that finished before its cancellation took effect."""
+    if discard is not None and not task.cancelled() and task.exception() is None:
+        asyncio.ensure_future(discard(task.result()))
+
+
+# one hedger per process
+hedger = Hedger()
@@ -0,0 +1,180 @@
+"""
+Token-budgeted conversation history.
+The chat keeps the full history (for display), but only the last turns are sent verbatim to the model.
+Older turns are compacted into a rolling summary, computed in the background after an answer,
+so every request stays under HISTORY_TOKEN_BUDGET.
+
+The summary state is a plain dict (JSON, stored next to the history in app.storage.user):
+    {"summary": str, "summarized": int}  summarized = number of history messages covered by the summary
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional
+
+from agent.model_router import model_router
+from agent.tracing import tracer
+from agent.usage import usage_tracker
+
+# token budget for the history part of a request (system prompt and new message not included)
+HISTORY_TOKEN_BUDGET = int(os.getenv("AGENT_HISTORY_TOKEN_BUDGET", "3000"))
+
+# number of most recent turns (user message + answer) always kept verbatim
+HISTORY_KEEP_TURNS = int(os.getenv("AGENT_HISTORY_KEEP_TURNS", "3"))
+
+# maximum length of the rolling summary
+SUMMARY_MAX_TOKENS = 400
+
+# rough estimate, good enough for budgeting (no tokenizer for the OpenRouter models available)
+CHARS_PER_TOKEN = 4
+TOKENS_PER_MESSAGE = 4  # role and formatting overhead
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Estimated number of tokens of a text."""
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def estimate_message_tokens(messages: List[dict]) -> int:
+    """Estimated number of tokens of chat messages (content and tool calls)."""
+    total = 0
+    for message in messages:
+        total += TOKENS_PER_MESSAGE + estimate_tokens(message.get("content"))
+        for tool_call in message.get("tool_calls") or []:
+            total += estimate_tokens(str(tool_call))
+    return total
+
+
+def empty_summary() -> Dict:
+    """Summary state of a new conversation."""
+    return {"summary": "", "summarized": 0}
+
+
+class HistoryManager:
+    """
+    Selects the history sent to the model and compacts older turns into a rolling summary.
+    """
+
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET, keep_turns: int = HISTORY_KEEP_TURNS, client=None):
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self._client = client
+        self._compacting = set()  # keys of conversations with a compaction running
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # agent client by default (imported late, agent.agent imports this package)
+        if self._client is None:
+            from agent.agent import client
+            self._client = client
+        return self._client
+
+    def _keep_start(self, history: List[dict]) -> int:
+        """Index of the first message of the last keep_turns turns."""
+        user_indexes = [i for i, message in enumerate(history) if message["role"] == "user"]
+        if len(user_indexes) <= self.keep_turns:
+            return 0
+        return user_indexes[-self.keep_turns]
+
+    def select(self, history: List[dict], summary_state: Optional[Dict] = None) -> List[dict]:
+        """
+        History to send to the model: rolling summary plus the messages it doesn't cover, within the token budget.
+
+        If the summary lags behind (compaction still running) and the verbatim part exceeds the budget,
+        the oldest verbatim messages are dropped - the recent turns always win.
+
+        Args:
+            history (List[dict]) : full conversation history (user/assistant messages)
+            summary_state (Optional[Dict]) : summary state, see module docstring
+
+        Returns:
+            List[dict] : messages to pass as conversation_history to run_agent
+        """
+        summary_state = summary_state or empty_summary()
+        summarized = min(summary_state["summarized"], len(history))
+        verbatim = list(history[summarized:])
+
+        selected = []
+        budget = self.token_budget
+        if summary_state["summary"]:
+            summary_message = {
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{summary_state['summary']}"
+            }
+            selected.append(summary_message)
+            budget -= estimate_message_tokens([summary_message])
+
+        # drop whole turns from the front until the rest fits (keep at least the last turn)
+        while len(verbatim) > 1 and estimate_message_tokens(verbatim) > budget:
+            next_user = next((i for i, message in enumerate(verbatim) if i > 0 and message["role"] == "user"), None)
+            if next_user is None:
+                break
+            verbatim = verbatim[next_user:]
+
+        return selected + verbatim
+
+    def needs_compaction(self, history: List[dict], summary_state: Optional[Dict] = None) -> bool:
+        """Whether there are turns older than the last keep_turns that are not in the summary yet."""
+        summary_state = summary_state or empty_summary()
+        return self._keep_start(history) > summary_state["summarized"]
+
+    def compact(self, history: List[dict], summary_state: Optional[Dict] = None) -> Dict:
+        """
+        Fold all turns older than the last keep_turns into the rolling summary (blocking LLM call).
+
+        Args:
+            history (List[dict]) : full conversation history
+            summary_state (Optional[Dict]) : current summary state
+
+        Returns:
+            Dict : new summary state (the given state if there is nothing to compact)
+        """
+        summary_state = summary_state or empty_summary()
+        keep_start = self._keep_start(history)
+        if keep_start <= summary_state["summarized"]:
+            return summary_state
+
+        new_messages = history[summary_state["summarized"]:keep_start]
+        transcript = "\n".join(f"{message['role']}: {message.get('content') or ''}" for message in new_messages)
+
+        model = model_router.model("summary")
+        with tracer.span("llm", "summary", model=model, messages=len(new_messages)):
+            response = self.client.chat.completions.create(
+                model=model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You maintain a running summary of a conversation between a user and an assistant "
+                                   "that manages a use case database. Merge the new messages into the summary. "
+                                   "Keep ids, names, statuses and open requests; drop small talk. Answer with the summary only."
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Current summary:\n{summary_state['summary'] or '(none)'}\n\nNew messages:\n{transcript}"
+                    }
+                ],
+                max_tokens=SUMMARY_MAX_TOKENS
+            )
+
+            usage_tracker.record(getattr(response, "usage", None), "summary", model)
+        return {"summary": (response.choices[0].message.content or "").strip(), "summarized": keep_start}
+
+    def try_start_compaction(self, key) -> bool:
+        """Mark a compaction for key (e.g. user id) as running. False if one is running already."""
+        with self._lock:
+            if key in self._compacting:
+                return False
+            self._compacting.add(key)
+            return True
+
+    def finish_compaction(self, key) -> None:
+        """Mark the compaction for key as done."""
+        with self._lock:
+            self._compacting.discard(key)
+
+
+# one manager per process
+history_manager = HistoryManager()
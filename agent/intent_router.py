@@ -0,0 +1,213 @@
+"""
+Deterministic fast path for simple chat commands.
+Commands like "show use case 5", "approve use case 3", "setze Use Case 4 auf in Arbeit" or
+"list use cases for Siemens Energy" are matched by rules, executed directly via execute_tool and answered
+with a template - no LLM round trip. Everything that doesn't match exactly (or is ambiguous, e.g. a company
+name without a confident match) returns None and goes to the LLM.
+"""
+
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agent.tool_executor import execute_tool
+from agent.tools import STATUS_WORDS
+
+# fast path on/off
+INTENT_FAST_PATH_ENABLED = os.getenv("AGENT_FAST_PATH", "1") == "1"
+
+# verbs that set a status directly ("approve use case 3", "genehmige Use Case 3")
+STATUS_VERBS = {
+    "approve": ("approved", "en"), "genehmige": ("approved", "de"), "genehmigen": ("approved", "de"),
+    "archive": ("archived", "en"), "archiviere": ("archived", "de"), "archivieren": ("archived", "de"),
+    "complete": ("completed", "en"), "schließe": ("completed", "de"), "abschließen": ("completed", "de")
+}
+
+GERMAN_WORDS = {"zeige", "zeig", "mir", "alle", "setze", "setzen", "auf", "für", "von", "liste", "anwendungsfall",
+                "anwendungsfälle", "genehmige", "genehmigen", "archiviere", "archivieren", "schließe", "abschließen"}
+
+_STATUS_PATTERN = "|".join(sorted((re.escape(word) for word in STATUS_WORDS), key=len, reverse=True))
+_USE_CASE = r"(?:use[ -]?cases?|ucs?|anwendungsf[äa]ll(?:e)?)"
+_SHOW = r"(?:show(?: me)?|display|get|list|zeig(?:e)?(?: mir)?|liste(?: auf)?)"
+_ALL = r"(?:(?:all|alle)(?: the)? )?"
+
+# (intent name, compiled pattern) - patterns match the whole (normalized) message
+_RULES: List[Tuple[str, "re.Pattern"]] = [
+    ("show_use_case", re.compile(rf"{_SHOW} {_USE_CASE} (?:#|nr\.? |no\.? |number |nummer )?(?P<id>\d+)")),
+    ("set_status", re.compile(
+        rf"(?:set|change|setze|ändere) {_USE_CASE} #?(?P<id>\d+) (?:to|auf|status) (?:status )?(?P<status>{_STATUS_PATTERN})"
+    )),
+    ("set_status", re.compile(rf"{_USE_CASE} #?(?P<id>\d+) (?:auf )(?P<status>{_STATUS_PATTERN}) setzen")),
+    ("status_verb", re.compile(rf"(?P<verb>{'|'.join(STATUS_VERBS)}) {_USE_CASE} #?(?P<id>\d+)")),
+    ("status_verb", re.compile(rf"{_USE_CASE} #?(?P<id>\d+) (?P<verb>{'|'.join(STATUS_VERBS)})")),
+    ("list_by_status", re.compile(rf"{_SHOW} {_ALL}(?P<status>{_STATUS_PATTERN}) {_USE_CASE}")),
+    ("list_by_status", re.compile(rf"{_SHOW} {_ALL}{_USE_CASE} (?:with status|mit status|im status) (?P<status>{_STATUS_PATTERN})")),
+    ("list_by_company", re.compile(rf"{_SHOW} {_ALL}{_USE_CASE} (?:for|of|from|at|für|von|bei) (?P<company>.+)")),
+    ("list_all", re.compile(rf"{_SHOW} {_ALL}{_USE_CASE}")),
+]
+
+TEMPLATES = {
+    "en": {
+        "use_case": "**Use case {id}: {title}**\nStatus: {status}\nCompany: {company_name} ({industry_name})\n"
+                    "Description: {description}\nExpected benefit: {expected_benefit}",
+        "not_found": "There is no use case with ID {id}.",
+        "status_set": "Use case {id} ('{title}') now has status '{status}'.",
+        "list": "{count} use case(s){scope}:\n{lines}",
+        "list_empty": "No use cases found{scope}.",
+        "more": "\n(Showing the first {count} - ask for more to see the rest.)",
+        "scope_status": " with status '{status}'",
+        "scope_company": " for {company}",
+        "error": "That didn't work: {error}"
+    },
+    "de": {
+        "use_case": "**Use Case {id}: {title}**\nStatus: {status}\nFirma: {company_name} ({industry_name})\n"
+                    "Beschreibung: {description}\nErwarteter Nutzen: {expected_benefit}",
+        "not_found": "Es gibt keinen Use Case mit der ID {id}.",
+        "status_set": "Use Case {id} ('{title}') hat jetzt den Status '{status}'.",
+        "list": "{count} Use Case(s){scope}:\n{lines}",
+        "list_empty": "Keine Use Cases gefunden{scope}.",
+        "more": "\n(Die ersten {count} werden angezeigt - frag nach weiteren, um den Rest zu sehen.)",
+        "scope_status": " mit Status '{status}'",
+        "scope_company": " für {company}",
+        "error": "Das hat nicht funktioniert: {error}"
+    }
+}
+
+
+def normalize_command(message: str) -> str:
+    """Lower case, single spaces, without trailing punctuation and politeness words."""
+    text = re.sub(r"\s+", " ", message).strip().lower()
+    text = re.sub(r"[.!?]+$", "", text).strip()
+    text = re.sub(r"^(?:please|bitte) |(?: please| bitte)$", "", text)
+    return text.strip()
+
+
+def detect_language(text: str) -> str:
+    """'de' if the command contains German words or umlauts, else 'en'."""
+    if re.search(r"[äöüß]", text) or GERMAN_WORDS & set(text.split()):
+        return "de"
+    return "en"
+
+
+class IntentRouter:
+    """
+    Matches simple commands and answers them without the LLM. Counts requests and hits per intent.
+    """
+
+    def __init__(self, execute: Callable[[str, dict], Any] = execute_tool, enabled: bool = INTENT_FAST_PATH_ENABLED):
+        self.execute = execute
+        self.enabled = enabled
+        self._stats = {"requests": 0, "hits": 0, "fallbacks": 0, "by_intent": {}}
+        self._lock = threading.Lock()
+
+    def match(self, message: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        """
+        Intent and parameters of a command, None if no rule matches the whole message.
+
+        Args:
+            message (str) : chat message
+
+        Returns:
+            Optional[Tuple[str, Dict[str, str]]] : (intent, named groups)
+        """
+        text = normalize_command(message)
+        for intent, pattern in _RULES:
+            found = pattern.fullmatch(text)
+            if found:
+                return intent, {key: value for key, value in found.groupdict().items() if value is not None}
+        return None
+
+    def route(self, message: str) -> Optional[str]:
+        """
+        Answer a simple command directly.
+
+        Args:
+            message (str) : chat message
+
+        Returns:
+            Optional[str] : templated answer, None if the message needs the LLM
+        """
+        if not self.enabled:
+            return None
+
+        matched = self.match(message)
+        answer = None
+        if matched:
+            intent, params = matched
+            language = detect_language(normalize_command(message))
+            answer = getattr(self, f"_handle_{intent}")(params, TEMPLATES[language])
+
+        with self._lock:
+            self._stats["requests"] += 1
+            if answer is None:
+                self._stats["fallbacks"] += 1
+            else:
+                self._stats["hits"] += 1
+                self._stats["by_intent"][matched[0]] = self._stats["by_intent"].get(matched[0], 0) + 1
+        return answer
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests, hits (answered without LLM), fallbacks, hits per intent and hit rate."""
+        with self._lock:
+            stats = {**self._stats, "by_intent": dict(self._stats["by_intent"])}
+        stats["hit_rate"] = round(stats["hits"] / stats["requests"], 3) if stats["requests"] else 0.0
+        stats["enabled"] = self.enabled
+        return stats
+
+    # ---------- handlers (return None to fall back to the LLM) ----------
+
+    def _render_list(self, result: Dict[str, Any], scope: str, templates: Dict[str, str]) -> str:
+        if "error" in result:
+            return templates["error"].format(error=result["error"])
+        items = result["items"]
+        if not items:
+            return templates["list_empty"].format(scope=scope)
+        lines = "\n".join(
+            f"- #{item['id']} {item['title']} ({item['status']}, {item['company_name']})" for item in items
+        )
+        answer = templates["list"].format(count=len(items), scope=scope, lines=lines)
+        if result.get("truncated"):
+            answer += templates["more"].format(count=len(items))
+        return answer
+
+    def _handle_show_use_case(self, params: Dict[str, str], templates: Dict[str, str]) -> str:
+        use_case_id = int(params["id"])
+        result = self.execute("get_use_case_by_id", {"use_case_id": use_case_id})
+        if result is None:
+            return templates["not_found"].format(id=use_case_id)
+        if "error" in result:
+            return templates["error"].format(error=result["error"])
+        return templates["use_case"].format(**{key: value if value is not None else "-" for key, value in result.items()})
+
+    def _set_status(self, use_case_id: int, status: str, templates: Dict[str, str]) -> str:
+        result = self.execute("update_use_case_status", {"use_case_id": use_case_id, "status": status})
+        if "error" in result:
+            return templates["error"].format(error=result["error"])
+        return templates["status_set"].format(id=result["id"], title=result["title"], status=result["status"])
+
+    def _handle_set_status(self, params: Dict[str, str], templates: Dict[str, str]) -> str:
+        return self._set_status(int(params["id"]), STATUS_WORDS[params["status"]], templates)
+
+    def _handle_status_verb(self, params: Dict[str, str], templates: Dict[str, str]) -> str:
+        return self._set_status(int(params["id"]), STATUS_VERBS[params["verb"]][0], templates)
+
+    def _handle_list_by_status(self, params: Dict[str, str], templates: Dict[str, str]) -> str:
+        status = STATUS_WORDS[params["status"]]
+        result = self.execute("filter_use_cases", {"status": status})
+        return self._render_list(result, templates["scope_status"].format(status=status), templates)
+
+    def _handle_list_by_company(self, params: Dict[str, str], templates: Dict[str, str]) -> Optional[str]:
+        resolved = self.execute("resolve_entity", {"entity_type": "company", "name": params["company"]})
+        if "error" in resolved or not resolved["best_match"]:
+            return None  # unknown or ambiguous company - let the LLM ask or search
+        company = resolved["best_match"]
+        result = self.execute("filter_use_cases", {"company_id": company["id"]})
+        return self._render_list(result, templates["scope_company"].format(company=company["name"]), templates)
+
+    def _handle_list_all(self, params: Dict[str, str], templates: Dict[str, str]) -> str:
+        return self._render_list(self.execute("get_all_use_cases", {}), "", templates)
+
+
+# one router per process
+intent_router = IntentRouter()
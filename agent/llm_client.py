@@ -0,0 +1,251 @@
+"""
+Shared HTTP clients for all OpenRouter calls (agent, async agent, history summary, transcript extraction).
+One sync and one async OpenAI client per process, on a tuned httpx connection pool:
+
+- keep-alive pool (LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE_CONNECTIONS, LLM_KEEPALIVE_EXPIRY)
+- HTTP/2 if the h2 package is installed (pip install "httpx[http2]") and LLM_HTTP2 is not 0
+- connect/read timeouts (LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT)
+- retries with exponential backoff and full jitter on 429/5xx and connection errors (LLM_MAX_RETRIES),
+  Retry-After is respected; the SDK's own retries are switched off so there is exactly one retry policy
+
+LLM_BACKEND=record/replay records or replays all calls via cassettes (see utils.llm_backend).
+
+connection_stats counts requests, new connections and TLS handshakes, so the admin panel can show how
+many requests reused a pooled connection.
+"""
+
+import asyncio
+import functools
+import importlib.util
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, OpenAI
+
+from utils.llm_backend import LLM_BACKEND, wrap_async_transport, wrap_transport
+
+# Load environment variables
+load_dotenv()
+
+# OpenRouter endpoint (can point at a proxy or a local stub server)
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+# timeouts in seconds (read: maximum gap between two received chunks, not the whole response)
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+
+# connection pool
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+
+# HTTP/2 needs the optional h2 package
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "1") == "1" and importlib.util.find_spec("h2") is not None
+
+# retries: attempt n waits a random time in [0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2^n)]
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# errors where the request never reached the server - always safe to retry
+_CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class ConnectionStats:
+    """
+    Counts sent requests, newly opened connections, TLS handshakes and retries (fed by the httpcore trace hook).
+    """
+
+    def __init__(self):
+        self._stats = self._empty()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _empty() -> Dict[str, Any]:
+        return {"requests": 0, "new_connections": 0, "tls_handshakes": 0, "http2_requests": 0,
+                "retries": 0, "retries_by_reason": {}}
+
+    def trace(self, event: str, info: dict) -> None:
+        """httpcore trace callback (request extension "trace")."""
+        with self._lock:
+            if event == "connection.connect_tcp.complete":
+                self._stats["new_connections"] += 1
+            elif event == "connection.start_tls.complete":
+                self._stats["tls_handshakes"] += 1
+            elif event == "http11.send_request_headers.started":
+                self._stats["requests"] += 1
+            elif event == "http2.send_request_headers.started":
+                self._stats["requests"] += 1
+                self._stats["http2_requests"] += 1
+
+    async def atrace(self, event: str, info: dict) -> None:
+        """Async variant of trace (the async transport awaits the callback)."""
+        self.trace(event, info)
+
+    def record_retry(self, reason: str) -> None:
+        """Count a retry (reason: status code or error name)."""
+        with self._lock:
+            self._stats["retries"] += 1
+            self._stats["retries_by_reason"][reason] = self._stats["retries_by_reason"].get(reason, 0) + 1
+
+    def reset(self) -> None:
+        """Start counting from zero."""
+        with self._lock:
+            self._stats = self._empty()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus reused requests and reuse ratio (requests that didn't open a connection)."""
+        with self._lock:
+            stats = {**self._stats, "retries_by_reason": dict(self._stats["retries_by_reason"])}
+        stats["reused"] = max(stats["requests"] - stats["new_connections"], 0)
+        stats["reuse_ratio"] = round(stats["reused"] / stats["requests"], 3) if stats["requests"] else 0.0
+        stats["http2"] = LLM_HTTP2
+        return stats
+
+
+# one counter per process
+connection_stats = ConnectionStats()
+
+
+def retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """
+    Seconds to wait before retry number attempt (0-based): full jitter exponential backoff,
+    at least the server's Retry-After (seconds) if given, never more than LLM_RETRY_MAX_DELAY.
+    """
+    delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+    try:
+        delay = max(delay, float(retry_after)) if retry_after else delay
+    except ValueError:
+        pass  # HTTP date - ignore, use backoff
+    return min(delay, LLM_RETRY_MAX_DELAY)
+
+
+class RetryTransport(httpx.HTTPTransport):
+    """Pooled transport that retries 429/5xx responses and connection errors and feeds connection_stats."""
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions["trace"] = connection_stats.trace
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            last_attempt = attempt == LLM_MAX_RETRIES
+            try:
+                response = super().handle_request(request)
+            except _CONNECT_ERRORS as error:
+                if last_attempt:
+                    raise
+                connection_stats.record_retry(type(error).__name__)
+                time.sleep(retry_delay(attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                return response
+            response.read()  # drain the (small) error body so the connection goes back to the pool
+            response.close()
+            connection_stats.record_retry(str(response.status_code))
+            time.sleep(retry_delay(attempt, response.headers.get("retry-after")))
+
+
+class AsyncRetryTransport(httpx.AsyncHTTPTransport):
+    """Async variant of RetryTransport."""
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions["trace"] = connection_stats.atrace
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            last_attempt = attempt == LLM_MAX_RETRIES
+            try:
+                response = await super().handle_async_request(request)
+            except _CONNECT_ERRORS as error:
+                if last_attempt:
+                    raise
+                connection_stats.record_retry(type(error).__name__)
+                await asyncio.sleep(retry_delay(attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                return response
+            await response.aread()
+            await response.aclose()
+            connection_stats.record_retry(str(response.status_code))
+            await asyncio.sleep(retry_delay(attempt, response.headers.get("retry-after")))
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=LLM_KEEPALIVE_EXPIRY)
+
+
+def _api_key() -> Optional[str]:
+    # replayed runs and a local stub server (utils.llm_stub_server) need no key (CI)
+    offline = LLM_BACKEND == "replay" or httpx.URL(OPENROUTER_BASE_URL).host in ("127.0.0.1", "localhost")
+    return os.getenv("OPENROUTER_API_KEY") or ("offline" if offline else None)
+
+
+@functools.lru_cache(maxsize=1)
+def get_client() -> OpenAI:
+    """
+    Shared sync OpenAI client (pointed at OpenRouter) on the tuned connection pool,
+    recording or replaying if LLM_BACKEND says so (see utils.llm_backend).
+
+    Returns:
+        OpenAI : client
+    """
+    http_client = httpx.Client(
+        transport=wrap_transport(RetryTransport(http2=LLM_HTTP2, limits=_limits())),
+        timeout=_timeout()
+    )
+    return OpenAI(
+        base_url=OPENROUTER_BASE_URL,
+        api_key=_api_key(),
+        http_client=http_client,
+        timeout=_timeout(),
+        max_retries=0  # retries are done by the transport
+    )
+
+
+_async_clients = {}  # event loop -> client (async connections belong to one loop)
+_async_clients_lock = threading.Lock()
+
+
+def get_async_client() -> AsyncOpenAI:
+    """
+    Shared AsyncOpenAI client of the running event loop (pointed at OpenRouter) on the tuned connection pool.
+    The app has one loop (NiceGUI), scripts calling asyncio.run() several times get one client per loop.
+
+    Returns:
+        AsyncOpenAI : client
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    with _async_clients_lock:
+        for closed in [other for other in _async_clients if other is not None and other.is_closed()]:
+            del _async_clients[closed]
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = _new_async_client()
+        return client
+
+
+def _new_async_client() -> AsyncOpenAI:
+    http_client = httpx.AsyncClient(
+        transport=wrap_async_transport(AsyncRetryTransport(http2=LLM_HTTP2, limits=_limits())),
+        timeout=_timeout()
+    )
+    return AsyncOpenAI(
+        base_url=OPENROUTER_BASE_URL,
+        api_key=_api_key(),
+        http_client=http_client,
+        timeout=_timeout(),
+        max_retries=0  # retries are done by the transport
+    )
@@ -0,0 +1,209 @@
+"""
+Model routing: which model answers which stage of a request.
+
+The policy is declarative (ROUTING, overridable with AGENT_MODEL_ROUTING as JSON, e.g. '{"agent": "large"}'):
+
+    stage         what the call does                                    default
+    plan          planning call of plan mode (all tool calls at once)  large
+    agent         tool-calling rounds (tool choice, tool arguments)     small
+    final         forced final answer after max_rounds                  small
+    plan_answer   answer after an executed plan                         small
+    summary       rolling history summary                               small
+    extraction    use case prompts from a workshop transcript           large
+
+Escalation to the large model (ESCALATION):
+- tool_error: after a tool call of the request failed, all further calls of the request use the large model
+- low_confidence: a small-model response that looks unreliable (unknown tool, arguments that are not valid JSON,
+  truncated output, empty answer, hedging phrases) is discarded and the call is repeated with the large model
+
+AGENT_MODEL_ROUTING=off sends every stage to the large model (previous behaviour). Prices (USD per million tokens)
+are used for the cost estimates in usage tracking and the agent benchmark.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from agent.tools import tools
+
+# model tiers (OpenRouter model ids)
+MODELS = {
+    "large": os.getenv("AGENT_MODEL_LARGE", "anthropic/claude-3.5-sonnet"),
+    "small": os.getenv("AGENT_MODEL_SMALL", "anthropic/claude-3.5-haiku")
+}
+
+# stage -> tier (or a model id)
+ROUTING = {
+    "plan": "large",
+    "agent": "small",
+    "final": "small",
+    "plan_answer": "small",
+    "summary": "small",
+    "extraction": "large"
+}
+
+ESCALATION = {
+    "to": "large",
+    "tool_error": True,
+    "low_confidence": True
+}
+
+# USD per million prompt / completion tokens (OpenRouter list prices)
+PRICES = {
+    "anthropic/claude-3.5-sonnet": (3.0, 15.0),
+    "anthropic/claude-3.5-haiku": (0.8, 4.0)
+}
+
+# answers of the small model containing one of these are treated as low confidence
+HEDGING_PHRASES = ("i'm not sure", "i am not sure", "i'm unsure", "i cannot determine", "i can't determine",
+                   "unclear which", "i don't have enough information", "ich bin mir nicht sicher")
+
+_routing_override = os.getenv("AGENT_MODEL_ROUTING", "")
+
+_tool_names = {tool["function"]["name"] for tool in tools} | {"request_more_tools", "submit_plan"}
+
+
+def parse_routing(override: str) -> Dict[str, str]:
+    """
+    Parse a routing override (JSON object stage -> tier or model id).
+
+    Raises:
+        ValueError: If it is not a JSON object of known stages and non-empty strings
+    """
+    try:
+        routing = json.loads(override)
+    except ValueError as e:
+        raise ValueError(f"not valid JSON ({e})")
+    if not isinstance(routing, dict):
+        raise ValueError("expected a JSON object stage -> tier or model")
+    unknown = sorted(stage for stage in routing if stage not in ROUTING)
+    if unknown:
+        raise ValueError(f"unknown stage(s) {', '.join(unknown)} (stages: {', '.join(ROUTING)})")
+    invalid = sorted(stage for stage, value in routing.items() if not isinstance(value, str) or not value.strip())
+    if invalid:
+        raise ValueError(f"stage(s) {', '.join(invalid)} must name a tier ({', '.join(MODELS)}) or a model id")
+    return routing
+
+
+class ModelRouter:
+    """
+    Model per stage, escalation checks and cost estimates; counts routed and escalated calls.
+    """
+
+    def __init__(self, routing: Dict[str, str] = None, models: Dict[str, str] = None, escalation: Dict[str, Any] = None,
+                 enabled: bool = True):
+        self.models = dict(models or MODELS)
+        self.routing = dict(routing or ROUTING)
+        self.escalation = dict(escalation or ESCALATION)
+        self.enabled = enabled
+        self._stats = {"calls": 0, "by_model": {}, "escalations": 0, "escalations_by_reason": {}}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, override: str = _routing_override) -> "ModelRouter":
+        """
+        Router with the defaults, AGENT_MODEL_ROUTING applied ('off' or a JSON object stage -> tier/model).
+        An invalid override is ignored with a warning (the agent still starts, with the default routing).
+        """
+        if override.strip().lower() in ("off", "0", "false"):
+            return cls(enabled=False)
+        routing = dict(ROUTING)
+        if override.strip():
+            try:
+                routing.update(parse_routing(override))
+            except ValueError as e:
+                print(f"Ignoring AGENT_MODEL_ROUTING: {e} - using the default routing")
+        return cls(routing=routing)
+
+    @property
+    def large_model(self) -> str:
+        return self.models[self.escalation["to"]]
+
+    def model(self, stage: str, escalated: bool = False) -> str:
+        """
+        Model for a call.
+
+        Args:
+            stage (str) : stage of the call (see ROUTING, unknown stages use the large model)
+            escalated (bool) : the request was escalated (tool error or low confidence before)
+
+        Returns:
+            str : model id
+        """
+        if not self.enabled or escalated:
+            model = self.large_model
+        else:
+            tier = self.routing.get(stage, self.escalation["to"])
+            model = self.models.get(tier, tier)
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["by_model"][model] = self._stats["by_model"].get(model, 0) + 1
+        return model
+
+    def is_large(self, model: str) -> bool:
+        return model == self.large_model
+
+    def low_confidence(self, model: str, content: Optional[str], tool_calls: list = None,
+                       finish_reason: Optional[str] = None) -> Optional[str]:
+        """
+        Reason to repeat a small-model response with the large model, None if it looks fine
+        (or escalation on low confidence is off, or the response came from the large model).
+
+        Args:
+            model (str) : model that produced the response
+            content (Optional[str]) : text of the response
+            tool_calls (list) : tool calls of the response (ChatCompletionMessageToolCall)
+            finish_reason (Optional[str]) : finish reason ('length' = cut off)
+        """
+        if not self.enabled or not self.escalation.get("low_confidence") or self.is_large(model):
+            return None
+        if finish_reason == "length":
+            return "truncated"
+        for call in tool_calls or []:
+            if call.function.name not in _tool_names:
+                return "unknown_tool"
+            try:
+                if call.function.arguments and not isinstance(json.loads(call.function.arguments), dict):
+                    return "invalid_arguments"
+            except ValueError:
+                return "invalid_arguments"
+        if not tool_calls:
+            text = (content or "").strip().lower()
+            if not text:
+                return "empty_answer"
+            if any(phrase in text for phrase in HEDGING_PHRASES):
+                return "hedging"
+        return None
+
+    def escalate_on_tool_error(self) -> bool:
+        """Whether failed tool calls switch the rest of the request to the large model."""
+        return self.enabled and bool(self.escalation.get("tool_error"))
+
+    def record_escalation(self, reason: str) -> None:
+        """Count an escalation to the large model."""
+        with self._lock:
+            self._stats["escalations"] += 1
+            self._stats["escalations_by_reason"][reason] = self._stats["escalations_by_reason"].get(reason, 0) + 1
+
+    def signature(self) -> str:
+        """Hash of the routing configuration (part of the response cache key)."""
+        config = {"enabled": self.enabled, "models": self.models, "routing": self.routing, "escalation": self.escalation}
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    def stats(self) -> Dict[str, Any]:
+        """Routed calls per model and escalations."""
+        with self._lock:
+            return {**self._stats, "by_model": dict(self._stats["by_model"]),
+                    "escalations_by_reason": dict(self._stats["escalations_by_reason"]), "enabled": self.enabled}
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of a call (0.0 for models without a price)."""
+    prompt_price, completion_price = PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+# one router per process
+model_router = ModelRouter.from_env()
@@ -0,0 +1,95 @@
+"""
+Parallel execution of the tool calls of one agent round.
+Read-only tool calls run concurrently on a bounded thread pool; a write tool call waits for all calls before it
+and blocks all calls after it, so writes keep their order relative to everything else.
+Results are returned in the original tool_call order.
+"""
+
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from agent.tools import read_only_tools
+from agent.tool_executor import execute_tool
+
+# maximum number of tool calls executed at the same time
+MAX_PARALLEL_TOOL_CALLS = 4
+
+# shared pool, bounded for the whole process
+_pool = ThreadPoolExecutor(max_workers=MAX_PARALLEL_TOOL_CALLS, thread_name_prefix="tool-call")
+
+
+def parse_arguments(arguments_str: str) -> Dict[str, Any]:
+    """
+    Parse the JSON arguments of a tool call.
+
+    Args:
+        arguments_str (str) : arguments as produced by the model (may be empty)
+
+    Returns:
+        Dict[str, Any] : parsed arguments ({} if empty)
+
+    Raises:
+        ValueError: If the arguments are not a valid JSON object
+    """
+    if not arguments_str or not arguments_str.strip():
+        return {}
+    arguments = json.loads(arguments_str)
+    if not isinstance(arguments, dict):
+        raise ValueError("Tool arguments must be a JSON object")
+    return arguments
+
+
+def _run_tool_call(tool_call) -> Tuple[Any, str, Dict[str, Any], Any]:
+    """Parse and execute one tool call. Returns (tool_call, function name, arguments, result)."""
+    function_name = tool_call.function.name
+    try:
+        arguments = parse_arguments(tool_call.function.arguments)
+    except ValueError as e:  # json.JSONDecodeError is a ValueError
+        return tool_call, function_name, {}, {"error": f"Invalid arguments for {function_name}: {e}"}
+
+    # execute_tool adds current_user to the dict, keep the parsed arguments clean for logging
+    result = execute_tool(function_name, dict(arguments))
+    return tool_call, function_name, arguments, result
+
+
+def _run_batch(batch: list) -> list:
+    """Run independent read-only calls concurrently (a single call runs in the calling thread)."""
+    if len(batch) == 1:
+        return [_run_tool_call(batch[0])]
+
+    # each call runs in a copy of the caller's context (request context, tracing ids, ...)
+    futures = [_pool.submit(contextvars.copy_context().run, _run_tool_call, tool_call) for tool_call in batch]
+    return [future.result() for future in futures]
+
+
+def execute_tool_calls(tool_calls: list) -> List[Tuple[Any, str, Dict[str, Any], Any]]:
+    """
+    Execute the tool calls of one agent round.
+
+    Consecutive read-only calls form a batch that runs in parallel; a write call runs alone after the batch
+    before it has finished, so the round takes about as long as its slowest read batch plus the writes.
+
+    Args:
+        tool_calls (list) : assistant_message.tool_calls
+
+    Returns:
+        List[Tuple] : (tool_call, function name, arguments, result) in the original order
+    """
+    results = []
+    batch = []
+    for tool_call in tool_calls:
+        if tool_call.function.name in read_only_tools:
+            batch.append(tool_call)
+            continue
+
+        # write: finish reads before it, then run it on its own
+        if batch:
+            results.extend(_run_batch(batch))
+            batch = []
+        results.append(_run_tool_call(tool_call))
+
+    if batch:
+        results.extend(_run_batch(batch))
+    return results
@@ -0,0 +1,421 @@
+"""
+Plan-and-execute mode: instead of one LLM round per step (look up ids, create, summarize), the model returns
+the complete plan in one call (forced submit_plan tool call) and the plan is executed locally:
+
+    {"steps": [{"id": "company", "tool": "resolve_entity", "arguments": {"entity_type": "company", "name": "E.ON"}},
+               {"id": "uc", "tool": "create_use_case",
+                "arguments": {"title": "...", "company_id": "$company.best_match.id", "industry_id": 1}}],
+     "answer": "Created use case $uc.id"}
+
+- "$<step id>.<key>.<index>..." refers to the result of an earlier step. An argument that is only a reference gets
+  the referenced value (int, list, ...), references inside longer strings are replaced by the value as text.
+- The plan is validated (known tools, required arguments, references only to earlier steps - so it is a DAG) and
+  executed in waves: steps whose dependencies are done run together, independent reads in parallel. Writes keep
+  their plan order relative to all other steps (as in parallel_executor).
+- A failed step (tool error, unresolvable reference) stops the plan; the model gets the results so far and plans
+  the rest (at most PLAN_MAX_REPLANS times). Completed writes are not repeated.
+- With "answer" the reply is rendered locally, otherwise one more LLM call (without tools) writes it.
+
+Enable per call (run_agent(..., plan=True)) or for the process with AGENT_PLAN_MODE=1.
+"""
+
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from openai.types.chat import ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
+
+from agent.parallel_executor import execute_tool_calls, parse_arguments
+from agent.tool_selector import MORE_TOOLS_NAME
+from agent.tools import read_only_tools, tools
+
+# plan mode by default (run_agent / stream_agent_async without plan argument)
+PLAN_MODE = os.getenv("AGENT_PLAN_MODE", "0") == "1"
+
+# limits of one plan
+PLAN_MAX_STEPS = 20
+PLAN_MAX_REPLANS = 2
+
+PLAN_TOOL_NAME = "submit_plan"
+
+PLAN_INSTRUCTIONS = f"""PLAN MODE:
+Do not call the database tools directly. Call {PLAN_TOOL_NAME} once with ALL tool calls needed for the request.
+- Each step has a unique id (letters, digits, underscore), a tool name and its arguments.
+- Use the result of an earlier step with "$<step id>.<key>" (list items: "$<step id>.0.id"), e.g.
+  "company_id": "$company.best_match.id" after a resolve_entity step with id "company".
+- Only refer to earlier steps. Steps without references to each other run in parallel.
+- Set "answer" when the reply doesn't depend on data you don't know yet (e.g. "Created use case $uc.id: $uc.title"),
+  leave it out for questions about the data - you will get the results to answer.
+- Requests that need no tools: no steps, reply in "answer"."""
+
+tool_submit_plan = {
+    "type": "function",
+    "function": {
+        "name": PLAN_TOOL_NAME,
+        "description": "Submit the complete plan of tool calls for the request (executed by the system in order of dependencies).",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "steps": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "string", "description": "Unique step id, e.g. 'company' or 's1'"},
+                            "tool": {"type": "string", "description": "Name of the tool to call"},
+                            "arguments": {"type": "object", "description": "Tool arguments, may contain $<step id>.<path> references"}
+                        },
+                        "required": ["id", "tool", "arguments"]
+                    }
+                },
+                "answer": {
+                    "type": "string",
+                    "description": "Reply to the user (optional, may contain $<step id>.<path> references)"
+                }
+            },
+            "required": ["steps"]
+        }
+    }
+}
+
+_STEP_ID = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# $step or $step.key.0.key (path segments: keys or list indexes)
+_REFERENCE = re.compile(r"\$([A-Za-z_][A-Za-z0-9_]*)((?:\.[A-Za-z0-9_]+)*)")
+
+_tool_parameters = {tool["function"]["name"]: tool["function"]["parameters"] for tool in tools}
+
+
+class PlanError(ValueError):
+    """Invalid plan or a step that can't be executed (message is sent back to the model)."""
+
+
+def plan_request_tools(tool_schema: list) -> Tuple[list, dict]:
+    """
+    Tools and tool_choice of a planning call: the selected tool schema (so the model knows the arguments)
+    plus submit_plan, which the model is forced to call.
+
+    Args:
+        tool_schema (list) : tool definitions of the selection (see tool_selector)
+
+    Returns:
+        Tuple[list, dict] : (tools, tool_choice)
+    """
+    return tool_schema + [tool_submit_plan], {"type": "function", "function": {"name": PLAN_TOOL_NAME}}
+
+
+def planning_messages(messages: list) -> list:
+    """Request messages with the plan mode instructions right after the (static, cacheable) system prompt."""
+    return messages[:1] + [{"role": "system", "content": PLAN_INSTRUCTIONS}] + messages[1:]
+
+
+def parse_plan(tool_calls: list, content: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Plan of a planning response.
+
+    Args:
+        tool_calls (list) : tool calls of the response (should be one submit_plan call)
+        content (str) : text of the response (used as answer if the model replied without a plan)
+
+    Returns:
+        Dict[str, Any] : {"steps": [...], "answer": str or None}
+
+    Raises:
+        PlanError: If the response contains no readable plan
+    """
+    call = next((call for call in tool_calls or [] if call.function.name == PLAN_TOOL_NAME), None)
+    if call is None:
+        if content:
+            return {"steps": [], "answer": content}
+        raise PlanError(f"No {PLAN_TOOL_NAME} call in the response")
+    try:
+        plan = parse_arguments(call.function.arguments)
+    except ValueError as e:
+        raise PlanError(f"Invalid {PLAN_TOOL_NAME} arguments: {e}") from e
+    return {"steps": plan.get("steps") or [], "answer": plan.get("answer")}
+
+
+def _references(value: Any) -> set:
+    """Step ids referenced anywhere in value."""
+    if isinstance(value, str):
+        return {match.group(1) for match in _REFERENCE.finditer(value)}
+    if isinstance(value, dict):
+        return set().union(*(_references(item) for item in value.values())) if value else set()
+    if isinstance(value, list):
+        return set().union(*(_references(item) for item in value)) if value else set()
+    return set()
+
+
+def validate_plan(plan: Dict[str, Any], done: Dict[str, Any], used_ids: Iterable[str] = ()) -> None:
+    """
+    Check a plan before anything is executed.
+
+    Args:
+        plan (Dict[str, Any]) : parsed plan
+        done (Dict[str, Any]) : results of steps completed by earlier plans (may be referenced)
+        used_ids (Iterable[str]) : ids of all steps of earlier plans, including failed and skipped ones
+            (not to be reused: step ids are the tool call ids of the answer call)
+
+    Raises:
+        PlanError: If the plan is invalid (unknown tool, missing argument, duplicate id, reference to a step
+                   that doesn't come earlier)
+    """
+    steps = plan["steps"]
+    if not isinstance(steps, list):
+        raise PlanError("steps must be a list")
+    if len(steps) > PLAN_MAX_STEPS:
+        raise PlanError(f"Plan has {len(steps)} steps, at most {PLAN_MAX_STEPS} are allowed")
+    if not steps and not plan.get("answer"):
+        raise PlanError("Plan has neither steps nor an answer")
+
+    known = set(done)
+    taken = known | set(used_ids)
+    for position, step in enumerate(steps, start=1):
+        if not isinstance(step, dict):
+            raise PlanError(f"Step {position} must be an object")
+        step_id, tool, arguments = step.get("id"), step.get("tool"), step.get("arguments", {})
+        if not isinstance(step_id, str) or not _STEP_ID.match(step_id):
+            raise PlanError(f"Step {position}: invalid id {step_id!r}")
+        if step_id in known:
+            raise PlanError(f"Step {position}: id '{step_id}' is used twice")
+        if step_id in taken:
+            raise PlanError(f"Step {position}: id '{step_id}' was already used by an earlier plan, use a new id")
+        if tool != MORE_TOOLS_NAME and tool not in _tool_parameters:
+            raise PlanError(f"Step '{step_id}': unknown tool '{tool}'")
+        if not isinstance(arguments, dict):
+            raise PlanError(f"Step '{step_id}': arguments must be an object")
+
+        missing = [name for name in _tool_parameters.get(tool, {}).get("required", []) if name not in arguments]
+        if missing:
+            raise PlanError(f"Step '{step_id}': missing argument(s) {', '.join(missing)} for {tool}")
+        unknown_references = _references(arguments) - known
+        if unknown_references:
+            raise PlanError(f"Step '{step_id}': references {', '.join(sorted(unknown_references))} "
+                            "which are not earlier steps")
+        known.add(step_id)
+        taken.add(step_id)
+
+    unknown_references = _references(plan.get("answer") or "") - known
+    if unknown_references:
+        raise PlanError(f"answer references unknown steps {', '.join(sorted(unknown_references))}")
+
+
+def _lookup(results: Dict[str, Any], step_id: str, path: str) -> Any:
+    """Value of $step_id.path."""
+    value = results[step_id]
+    for key in filter(None, path.split(".")):
+        if isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        elif isinstance(value, dict) and value.get(key) is not None:
+            value = value[key]
+        else:
+            raise PlanError(f"${step_id}{path} can't be resolved: '{key}' is missing or empty in "
+                           f"{json.dumps(value, default=str)[:200]}")
+    return value
+
+
+def resolve_references(value: Any, results: Dict[str, Any]) -> Any:
+    """
+    Replace $step.path references in value (recursively in dicts and lists) by the results of earlier steps.
+
+    Raises:
+        PlanError: If a path doesn't exist in the referenced result (e.g. resolve_entity found no match)
+    """
+    if isinstance(value, dict):
+        return {key: resolve_references(item, results) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_references(item, results) for item in value]
+    if not isinstance(value, str) or "$" not in value:
+        return value
+
+    whole = _REFERENCE.fullmatch(value)
+    if whole:
+        return _lookup(results, whole.group(1), whole.group(2))
+
+    def as_text(match):
+        found = _lookup(results, match.group(1), match.group(2))
+        return found if isinstance(found, str) else json.dumps(found, default=str)
+
+    return _REFERENCE.sub(as_text, value)
+
+
+def _waves(steps: list) -> List[list]:
+    """
+    Steps grouped into waves that can run together: a step runs after the steps it references,
+    a write after all steps before it, and every step after the last write before it.
+    """
+    level = {}
+    last_write = None
+    for position, step in enumerate(steps):
+        dependencies = {ref for ref in _references(step.get("arguments", {})) if ref in level}
+        if step["tool"] not in read_only_tools:
+            dependencies |= {earlier["id"] for earlier in steps[:position]}
+        elif last_write is not None:
+            dependencies.add(last_write)
+        level[step["id"]] = 1 + max((level[dependency] for dependency in dependencies), default=-1)
+        if step["tool"] not in read_only_tools:
+            last_write = step["id"]
+
+    waves = [[] for _ in range(max(level.values(), default=-1) + 1)]
+    for step in steps:
+        waves[level[step["id"]]].append(step)
+    return waves
+
+
+def execute_plan(plan: Dict[str, Any], results: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Execute a validated plan wave by wave (reads of a wave in parallel via execute_tool_calls).
+
+    Args:
+        plan (Dict[str, Any]) : validated plan
+        results (Dict[str, Any]) : step id -> result, extended in place (holds results of earlier plans)
+
+    Yields:
+        Dict[str, Any] : {"step", "tool", "arguments", "result", "error"} per executed (or failed) step;
+                         execution stops after the first failed wave
+    """
+    for wave in _waves(plan["steps"]):
+        calls, failed = [], []
+        for step in wave:
+            try:
+                arguments = resolve_references(step.get("arguments", {}), results)
+            except PlanError as e:
+                failed.append({"step": step["id"], "tool": step["tool"], "arguments": step.get("arguments", {}),
+                               "result": None, "error": str(e)})
+                continue
+            calls.append(ChatCompletionMessageToolCall(
+                id=step["id"], type="function", function=Function(name=step["tool"], arguments=json.dumps(arguments))
+            ))
+
+        for tool_call, function_name, arguments, result in execute_tool_calls(calls):
+            error = result.get("error") if isinstance(result, dict) else None
+            if error is None:
+                results[tool_call.id] = result
+            else:
+                failed.append({"step": tool_call.id, "tool": function_name, "arguments": arguments,
+                               "result": result, "error": error})
+            yield {"step": tool_call.id, "tool": function_name, "arguments": arguments, "result": result,
+                   "error": error}
+
+        for failure in failed:
+            if failure["result"] is None:  # reference couldn't be resolved - never executed
+                yield failure
+        if failed:
+            return
+
+
+def render_answer(answer: str, results: Dict[str, Any]) -> Optional[str]:
+    """The plan's answer with references replaced, None if a reference can't be resolved."""
+    try:
+        rendered = resolve_references(answer, results)
+    except PlanError:
+        return None
+    return rendered if isinstance(rendered, str) else json.dumps(rendered, default=str)
+
+
+class PlanSession:
+    """
+    State of one plan-and-execute request, shared by the sync and the async agent:
+    planning messages, results of completed steps, the last error and the answer.
+
+    Loop:
+        plan = session.accept(planning_response_message)    # None: invalid plan, ask again
+        session.finish(list(execute_plan(plan, session.results)))
+        ... until session.done or no replans left, then session.answer or an LLM call with session.answer_messages()
+    """
+
+    def __init__(self, messages: list, tool_names: tuple = None):
+        self.messages = messages
+        self.planning = planning_messages(messages)
+        self.tool_names = tool_names
+        self.results: Dict[str, Any] = {}
+        self.executed: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.answer: Optional[str] = None
+        self.plan: Optional[Dict[str, Any]] = None
+        self.done = False
+        self._call_id = None
+        self._used_ids = set()  # step ids of accepted plans
+
+    def accept(self, message) -> Optional[Dict[str, Any]]:
+        """
+        Parse and validate the plan of a planning response.
+
+        Args:
+            message : assistant message of the planning call (content, tool_calls)
+
+        Returns:
+            Optional[Dict[str, Any]] : plan to execute, None if it is invalid (the error is sent with the next call)
+        """
+        tool_calls = message.tool_calls or []
+        self._call_id = next((call.id for call in tool_calls if call.function.name == PLAN_TOOL_NAME), None)
+        self.planning.append({
+            "role": "assistant",
+            "content": message.content or None,
+            **({"tool_calls": [call.model_dump() for call in tool_calls]} if tool_calls else {})
+        })
+        try:
+            plan = parse_plan(tool_calls, message.content)
+            if any(isinstance(step, dict) and step.get("tool") == MORE_TOOLS_NAME for step in plan["steps"]):
+                self.tool_names = None
+                raise PlanError("More tools requested - all tools are available now")
+            validate_plan(plan, self.results, self._used_ids)
+        except PlanError as e:
+            self._failed(str(e))
+            return None
+        self.plan = plan
+        self._used_ids.update(step["id"] for step in plan["steps"])
+        return plan
+
+    def finish(self, executed: List[Dict[str, Any]]) -> None:
+        """Record the executed steps of the accepted plan (see execute_plan)."""
+        self.executed.extend(executed)
+        failed = next((item for item in executed if item["error"] is not None), None)
+        if failed is not None:
+            self._failed(f"step '{failed['step']}' ({failed['tool']}) failed: {failed['error']}")
+            return
+        self.error = None
+        self.done = True
+        if self.plan.get("answer"):
+            self.answer = render_answer(self.plan["answer"], self.results)
+
+    def _failed(self, error: str) -> None:
+        self.error = error
+        done = [{"step": item["step"], "tool": item["tool"], "result": item["result"]}
+                for item in self.executed if item["error"] is None]
+        content = (
+            f"The plan could not be completed: {error}\n"
+            f"Completed steps (not to be repeated, their ids can be referenced): {json.dumps(done, default=str)}\n"
+            f"Call {PLAN_TOOL_NAME} again with the remaining steps only, using new step ids."
+        )
+        if self._call_id:
+            self.planning.append({"role": "tool", "tool_call_id": self._call_id, "content": content})
+        else:
+            self.planning.append({"role": "user", "content": content})
+
+    def answer_messages(self) -> list:
+        """
+        Input of the answer call (no tools): the request messages plus the executed steps as assistant
+        tool calls and tool results, and the error if the plan could not be completed.
+        """
+        messages = list(self.messages)
+        if self.executed:
+            messages.append({
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {"id": item["step"], "type": "function",
+                     "function": {"name": item["tool"], "arguments": json.dumps(item["arguments"], default=str)}}
+                    for item in self.executed
+                ]
+            })
+            messages.extend(
+                {"role": "tool", "tool_call_id": item["step"],
+                 "content": json.dumps(item["result"] if item["result"] is not None else {"error": item["error"]},
+                                       default=str)}
+                for item in self.executed
+            )
+        if self.error is not None:
+            messages.append({"role": "user", "content": f"(The request could not be completed: {self.error})"})
+        return messages
@@ -0,0 +1,131 @@
+"""
+Reference data for the agent context: a compact id <-> name map of industries and companies (and persons while
+there are few of them), sent as a system message right after the static system prompt. Requests like
+"create a use case for E.ON in Energy" can use the ids directly instead of spending a round on
+get_all_industries / get_all_companies.
+
+- Built from the database of the current user (tenant) and cached until the next database write (data_version).
+- Size budget AGENT_REFERENCE_TOKEN_BUDGET: persons are only added if the whole map stays within it; if industries
+  and companies alone exceed it, no map is sent and the model looks the ids up with the tools as before.
+"""
+
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from agent.history import estimate_tokens
+from agent.tool_executor import get_current_user, service
+from models.base import data_version
+
+# reference data on/off, maximum estimated tokens of the map
+REFERENCE_DATA_ENABLED = os.getenv("AGENT_REFERENCE_DATA", "1") == "1"
+REFERENCE_TOKEN_BUDGET = int(os.getenv("AGENT_REFERENCE_TOKEN_BUDGET", "1500"))
+
+REFERENCE_HEADER = (
+    "REFERENCE DATA (current ids - use them directly as tool arguments instead of calling get_all_industries, "
+    "get_all_companies or get_all_persons; use the tools only for names that are not listed here):"
+)
+
+
+class ReferenceData:
+    """
+    Cached reference data message per database (main database or tenant).
+    """
+
+    def __init__(self, enabled: bool = REFERENCE_DATA_ENABLED, token_budget: int = REFERENCE_TOKEN_BUDGET):
+        self.enabled = enabled
+        self.token_budget = token_budget
+        self._cache = {}  # tenant -> (data version, text or None)
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "builds": 0, "sent": 0, "with_persons": 0, "over_budget": 0, "tokens_sent": 0}
+
+    def message(self, user: dict = None) -> Optional[dict]:
+        """
+        System message with the reference data of the user's database.
+
+        Args:
+            user (dict) : current user (default: get_current_user())
+
+        Returns:
+            Optional[dict] : {"role": "system", "content": ...}, None if disabled, not readable or over budget
+        """
+        if not self.enabled:
+            return None
+        user = user if user is not None else get_current_user()
+        tenant = (user or {}).get("tenant")
+        version = data_version()
+
+        with self._lock:
+            self._stats["requests"] += 1
+            cached = self._cache.get(tenant)
+        if cached is not None and cached[0] == version:
+            text = cached[1]
+        else:
+            text = self._build(user)
+            with self._lock:
+                self._cache[tenant] = (version, text)  # version read before building: a write meanwhile rebuilds
+
+        if text is None:
+            return None
+        with self._lock:
+            self._stats["sent"] += 1
+            self._stats["tokens_sent"] += estimate_tokens(text)
+        return {"role": "system", "content": text}
+
+    def _build(self, user: Optional[dict]) -> Optional[str]:
+        """Reference data text within the token budget (None if industries and companies don't fit)."""
+        try:
+            industries = service.get_all_industries(current_user=user)
+            companies = service.get_all_companies(current_user=user)
+        except Exception:
+            return None  # e.g. no read permission - the tools report the error
+
+        lines = [
+            REFERENCE_HEADER,
+            "Industries (id name): " + "; ".join(f"{industry['id']} {industry['name']}" for industry in industries),
+            "Companies (id name [industry id]): " + "; ".join(
+                f"{company['id']} {company['name']} [{company['industry_id']}]" for company in companies
+            )
+        ]
+        text = "\n".join(lines)
+
+        with self._lock:
+            self._stats["builds"] += 1
+            if estimate_tokens(text) > self.token_budget:
+                self._stats["over_budget"] += 1
+                return None
+
+        # persons only while the whole map fits (fetch one row more than can fit to stop early)
+        limit = max((self.token_budget - estimate_tokens(text)) * 4 // 12, 0) + 1  # >= 12 characters per person
+        try:
+            persons = service.get_all_persons(current_user=user, fields=["id", "name", "company_id"], limit=limit)
+        except Exception:
+            return text
+        if len(persons) == limit:
+            return text  # more persons than could fit
+        with_persons = text + "\nPersons (id name [company id]): " + "; ".join(
+            f"{person['id']} {person['name']} [{person['company_id']}]" for person in persons
+        )
+        if persons and estimate_tokens(with_persons) <= self.token_budget:
+            with self._lock:
+                self._stats["with_persons"] += 1
+            return with_persons
+        return text
+
+    def clear(self) -> None:
+        """Drop the cached maps (rebuilt on the next request)."""
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests, maps sent (with persons), maps over budget and average tokens per sent map."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["enabled"] = self.enabled
+        stats["token_budget"] = self.token_budget
+        stats["avg_tokens"] = round(stats["tokens_sent"] / stats["sent"]) if stats["sent"] else 0
+        return stats
+
+
+# one reference data cache per process
+reference_data = ReferenceData()
@@ -0,0 +1,243 @@
+"""
+Exact-match cache for agent answers.
+Key: normalized messages, model, hash of the tool schema, tenant and role of the user.
+Every entry is tagged with the data version (models.base.data_version) at the start of the run;
+an entry is only stored if no write happened during the run and is only served while the version is unchanged,
+so any write invalidates all cached answers. Runs that wrote themselves are never cached.
+
+Identical concurrent requests are coalesced (single-flight): one run goes upstream, the others wait for its answer.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from models.base import data_version
+
+# cache on/off, maximum entries and lifetime of an entry
+RESPONSE_CACHE_ENABLED = os.getenv("AGENT_RESPONSE_CACHE", "1") == "1"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("AGENT_RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("AGENT_RESPONSE_CACHE_TTL", "600"))
+
+
+def _normalize_content(content: Any) -> Any:
+    """Whitespace and case insensitive text, so trivially different spellings of a question hit the same entry."""
+    if isinstance(content, str):
+        return re.sub(r"\s+", " ", content).strip().casefold()
+    if isinstance(content, list):  # content parts (e.g. system prompt with cache marker)
+        return [_normalize_content(part.get("text")) if isinstance(part, dict) else part for part in content]
+    return content
+
+
+def schema_hash(tools: list) -> str:
+    """Stable hash of a tool schema."""
+    return hashlib.sha256(json.dumps(tools, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(messages: list, model: str, tools_hash: str, user: Optional[dict] = None) -> str:
+    """
+    Cache key of an agent request.
+
+    Args:
+        messages (list) : messages of the request (dicts)
+        model (str) : model name
+        tools_hash (str) : hash of the tool schema (see schema_hash)
+        user (Optional[dict]) : current user, tenant and role are part of the key
+
+    Returns:
+        str : sha256 hex digest
+    """
+    normalized = [
+        {"role": message.get("role"), "content": _normalize_content(message.get("content"))}
+        for message in messages
+    ]
+    user = user or {}
+    payload = {
+        "messages": normalized,
+        "model": model,
+        "tools": tools_hash,
+        "tenant": user.get("tenant"),
+        "role": user.get("role")
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """One upstream run other identical requests are waiting for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.answer = None
+        self.cacheable = False
+
+
+class ResponseCache:
+    """
+    LRU cache of agent answers, invalidated by data version, with single-flight for concurrent misses.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl_seconds: int = RESPONSE_CACHE_TTL_SECONDS,
+                 enabled: bool = RESPONSE_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries = OrderedDict()  # key -> (answer, data version, stored at)
+        self._flights: Dict[str, _Flight] = {}
+        self._async_flights: Dict[str, "asyncio.Future"] = {}  # single-flight of the async agent
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "stores": 0, "not_cacheable": 0, "stale": 0}
+
+    def _lookup(self, key: str) -> Optional[str]:
+        """Valid cached answer or None (caller holds the lock). Drops stale and expired entries."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        answer, version, stored_at = entry
+        if version != data_version() or time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            self._stats["stale"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return answer
+
+    def get_or_run(self, key: str, run: Callable[[], str]) -> str:
+        """
+        Cached answer for key, or the answer of run() (stored if no data was written during the run).
+        Concurrent calls with the same key wait for the first one instead of running themselves.
+
+        Args:
+            key (str) : cache key (see cache_key)
+            run (Callable[[], str]) : runs the agent, returns the answer
+
+        Returns:
+            str : answer
+        """
+        if not self.enabled:
+            return run()
+
+        with self._lock:
+            answer = self._lookup(key)
+            if answer is not None:
+                self._stats["hits"] += 1
+                return answer
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._stats["misses"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.cacheable:
+                with self._lock:
+                    self._stats["coalesced"] += 1
+                return flight.answer
+            # the leader's run wrote data - this request must run on its own
+            with self._lock:
+                self._stats["misses"] += 1
+            return run()
+
+        try:
+            version = data_version()
+            answer = run()
+            flight.answer = answer
+            flight.cacheable = self.put(key, answer, version)
+            return answer
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[str]:
+        """
+        Cached answer for key or None, without single-flight (e.g. for streamed runs).
+
+        Args:
+            key (str) : cache key
+            count_miss (bool) : count a miss (False if the caller counts it via join_async)
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            answer = self._lookup(key)
+            if answer is not None:
+                self._stats["hits"] += 1
+            elif count_miss:
+                self._stats["misses"] += 1
+            return answer
+
+    def join_async(self, key: str):
+        """
+        Single-flight for async runs (call from the event loop after a cache miss).
+
+        Returns:
+            tuple : (future resolved with the leader's answer, or None if it is not shareable; is_leader)
+                The leader must call finish_async(key, ...) when done.
+        """
+        with self._lock:
+            future = self._async_flights.get(key)
+            if future is not None:
+                return future, False
+            future = asyncio.get_running_loop().create_future()
+            self._async_flights[key] = future
+            self._stats["misses"] += 1
+            return future, True
+
+    def finish_async(self, key: str, answer: Optional[str]) -> None:
+        """Resolve the async flight of key (answer None: waiting requests run on their own)."""
+        with self._lock:
+            future = self._async_flights.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(answer)
+
+    def note_follower(self, shared: bool) -> None:
+        """Count a waiting async request: coalesced if it got the leader's answer, otherwise a miss."""
+        with self._lock:
+            self._stats["coalesced" if shared else "misses"] += 1
+
+    def put(self, key: str, answer: str, version: int) -> bool:
+        """
+        Store an answer computed elsewhere (e.g. streamed), if the data didn't change since version.
+
+        Returns:
+            bool : whether the answer was stored
+        """
+        if not self.enabled:
+            return False
+        with self._lock:
+            if answer is None or data_version() != version:
+                self._stats["not_cacheable"] += 1
+                return False
+            self._entries[key] = (answer, version, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._stats["stores"] += 1
+            return True
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters, number of entries and hit ratio (hits + coalesced per request)."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        requests = stats["hits"] + stats["coalesced"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["coalesced"]) / requests, 3) if requests else 0.0
+        stats["enabled"] = self.enabled
+        return stats
+
+
+# one cache per process
+response_cache = ResponseCache()
@@ -1,56 +1,126 @@
 """
 Tool executor. Maps tool names to actual service functions and executes them.
+
+The acting user is request context: a context variable, so concurrent agent sessions (asyncio tasks, threads) each
+see their own user. Worker threads inherit it when they run in a copy of the caller's context (asyncio.to_thread,
+agent.parallel_executor, agent.hedging); plain threads start without a user.
 """
 
+import contextlib
+import contextvars
+
 from services import UseCaseService
+from agent.tool_selector import request_more_tools
+from agent.tracing import tracer
+from agent.tool_validation import ToolArgumentError, argument_validator
+from agent.tools import (
+    BATCH_MAX_OPERATIONS, LIST_DEFAULT_LIMIT, LIST_MAX_LIMIT, USE_CASE_SUMMARY_FIELDS, PERSON_SUMMARY_FIELDS
+)
 
 # init service
 service = UseCaseService()
 
-# Global variable to track current user (set by UI)
-current_user = None
+
+def _list_tool(list_function, summary_fields : list):
+    """
+    Wrap a list-returning service method for the agent: summary projection by default, capped and paged result.
+    One extra row is fetched to detect whether there are more rows than returned.
+
+    Args:
+        list_function : service method accepting fields, limit, offset and current_user
+        summary_fields (list) : fields returned when the model doesn't ask for specific fields
+
+    Returns:
+        function returning {"items", "count", "offset", "truncated"} plus "next_offset" and a hint if truncated
+    """
+    def run(fields : list = None, limit : int = None, offset : int = 0, current_user : dict = None, **filters):
+        limit = min(limit or LIST_DEFAULT_LIMIT, LIST_MAX_LIMIT)
+        offset = offset or 0
+        rows = list_function(
+            **filters, fields=fields or summary_fields, limit=limit + 1, offset=offset, current_user=current_user
+        )
+
+        items = rows[:limit]
+        result = {"items": items, "count": len(items), "offset": offset, "truncated": len(rows) > limit}
+        if result["truncated"]:
+            result["next_offset"] = offset + limit
+            result["hint"] = f"More rows available. Call again with offset={offset + limit} or narrow the filters."
+        return result
+
+    return run
+
+# user of the current request (set by the UI per chat / upload task, see set_current_user and user_context)
+_current_user = contextvars.ContextVar("current_user", default=None)
 
 # mapping
 # Map function names to actual Python functions
 tool_functions = {
-    "get_all_use_cases": service.get_all_use_cases,
+    "get_all_use_cases": _list_tool(service.get_all_use_cases, USE_CASE_SUMMARY_FIELDS),
     "get_use_case_by_id": service.get_use_case_by_id,
     "create_use_case": service.create_use_case,
     "update_use_case": service.update_use_case,
     "update_use_case_status": service.update_use_case_status,
     "delete_use_case": service.delete_use_case,
-    "filter_use_cases": service.filter_use_cases,
+    "filter_use_cases": _list_tool(service.filter_use_cases, USE_CASE_SUMMARY_FIELDS),
     "get_all_industries": service.get_all_industries,
     "get_all_companies": service.get_all_companies,
-    "get_all_persons": service.get_all_persons,
+    "get_all_persons": _list_tool(service.get_all_persons, PERSON_SUMMARY_FIELDS),
     "get_persons_by_use_case": service.get_persons_by_use_case,
     "create_industry": service.create_industry,                
     "create_company": service.create_company,                  
     "create_person": service.create_person,                    
-    "add_persons_to_use_case": service.add_persons_to_use_case 
+    "add_persons_to_use_case": service.add_persons_to_use_case,
+    "resolve_entity": service.resolve_entity,
+    "request_more_tools": request_more_tools
 }
 
 
 def set_current_user(user):
     """
-    Set the current user for permission checks.
-    Should be called by the UI after login.
+    Set the current user for permission checks, for the current context only (asyncio task or thread)
+    and the worker threads started from it. Should be called by the UI before running the agent.
     
     Args:
         user (dict): User dict with id, email, role, name
+
+    Returns:
+        contextvars.Token : token to restore the previous user (reset_current_user)
+    """
+    return _current_user.set(user)
+
+
+def reset_current_user(token):
+    """Restore the user that was current before set_current_user returned token."""
+    _current_user.reset(token)
+
+
+@contextlib.contextmanager
+def user_context(user):
+    """
+    Run a block as user (restores the previous user afterwards).
+
+    Usage:
+        with user_context(current_user):
+            answer = run_agent(message)
     """
-    global current_user
-    current_user = user
+    token = set_current_user(user)
+    try:
+        yield user
+    finally:
+        reset_current_user(token)
 
 
 def get_current_user():
-    """Get the current logged-in user."""
-    return current_user
+    """Get the user of the current request (None if none was set in this context)."""
+    return _current_user.get()
 
 
 def execute_tool(function_name : str, arguments : dict):
     """
     Execute a tool function by name with given arguments.
+    The arguments are checked and coerced against the tool schema first (see tool_validation): string ids become
+    ints, enum values are normalized, unknown keys are dropped; invalid calls are answered with an error naming
+    the wrong arguments, without touching the database.
     
     Args:
         function_name (str): Name of the function to call
@@ -64,17 +134,99 @@ def execute_tool(function_name : str, arguments : dict):
     if function_name not in tool_functions.keys():
         return {"error" : f"Unknown function: {function_name}"}
 
-    try: 
-        actual_function = tool_functions[function_name]
+    with tracer.span("tool", function_name, arguments=dict(arguments)) as span:
+        try: 
+            actual_function = tool_functions[function_name]
 
-        # Add current_user to arguments for all service methods
-        # (All service methods now accept current_user parameter)
-        arguments['current_user'] = current_user
+            # schema check before dispatch
+            arguments, coerced, ignored = argument_validator.validate(function_name, arguments)
+            if coerced:
+                span["coerced"] = coerced
+            if ignored:
+                span["ignored_arguments"] = ignored
 
-        # call the function
-        result = actual_function(**arguments)
+            # Add current_user to arguments for all service methods
+            # (All service methods now accept current_user parameter)
+            arguments['current_user'] = get_current_user()
 
-        return result
-    
-    except Exception as e:
-        return {"error" : str(e)}
\ No newline at end of file
+            # call the function
+            result = actual_function(**arguments)
+
+            return result
+        
+        except ToolArgumentError as e:
+            span["error"] = str(e)
+            span["invalid_arguments"] = True
+            return {"error" : str(e)}
+
+        except Exception as e:
+            span["error"] = str(e)
+            return {"error" : str(e)}
+
+
+# long text fields left out of the per-operation results of a batch (the model wrote them itself or can fetch them)
+BATCH_OMITTED_FIELDS = ("description", "expected_benefit")
+
+
+def _compact(result):
+    """Result of one batch operation without long text fields."""
+    if isinstance(result, dict) and "error" not in result:
+        return {key: value for key, value in result.items() if key not in BATCH_OMITTED_FIELDS}
+    return result
+
+
+class _BatchAborted(Exception):
+    """Raised inside the transaction of an atomic batch when an operation failed (rolls back the batch)."""
+
+
+def execute_batch(operations : list, atomic : bool = False, current_user : dict = None):
+    """
+    Execute several tool operations in one call (tool execute_batch), in order. Every operation runs through
+    execute_tool (argument check, trace span, permissions of the current user).
+    Atomic batches run in one transaction (UseCaseService.run_in_transaction) and stop at the first failed
+    operation: nothing is saved, the remaining operations are skipped.
+
+    Args:
+        operations (list) : [{"tool": name, "arguments": {...}}]
+        atomic (bool) : all-or-nothing
+        current_user (dict) : current user dictionary (the operations use the user of the context)
+
+    Returns:
+        dict : {"completed", "failed", "results"} with one result per operation ({"error"} for failed ones);
+            atomic batches that failed additionally have "error", "rolled_back" and "skipped"
+    """
+    # the schema only allows single tools as operations (no nested batches)
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        raise ValueError(f"At most {BATCH_MAX_OPERATIONS} operations per batch, got {len(operations)}.")
+
+    results = []
+
+    def run():
+        for index, operation in enumerate(operations):
+            result = execute_tool(operation["tool"], dict(operation.get("arguments") or {}))
+            results.append(_compact(result))
+            if atomic and isinstance(result, dict) and "error" in result:
+                raise _BatchAborted(index)
+
+    if not atomic:
+        run()
+        failed = sum(1 for result in results if isinstance(result, dict) and "error" in result)
+        return {"completed": len(results) - failed, "failed": failed, "results": results}
+
+    try:
+        service.run_in_transaction(run, current_user=current_user)
+    except _BatchAborted as e:
+        index = e.args[0]
+        return {
+            "error": f"Operation {index} ({operations[index]['tool']}) failed: {results[index]['error'].rstrip('.')}. "
+                     "Nothing was saved.",
+            "rolled_back": True,
+            "completed": 0,
+            "failed": 1,
+            "skipped": len(operations) - index - 1,
+            "results": [{"rolled_back": True} for _ in range(index)] + [results[index]]
+        }
+    return {"completed": len(results), "failed": 0, "results": results}
+
+
+tool_functions["execute_batch"] = execute_batch
@@ -0,0 +1,233 @@
+"""
+Per-request tool selection.
+Instead of all tool definitions, a request only gets the tools whose keywords (English/German) or name words
+appear in the recent user messages, plus the lookup tools most requests need and the request_more_tools
+fallback. If the model calls request_more_tools, the agent sends all tools from the next round on.
+
+Also builds minified variants of the schemas (short descriptions, no parameter descriptions).
+"""
+
+import copy
+import functools
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from agent.history import estimate_tokens
+from agent.tools import tools, tool_request_more_tools
+
+# tool selection on/off, minified schemas on/off
+TOOL_SELECTION_ENABLED = os.getenv("AGENT_TOOL_SELECTION", "1") == "1"
+MINIFIED_TOOLS_ENABLED = os.getenv("AGENT_MINIFIED_TOOLS", "0") == "1"
+
+# tools sent with every selected subset (needed to map names to ids in most requests)
+CORE_TOOLS = ["get_all_industries", "get_all_companies", "resolve_entity"]
+
+# selected subsets larger than this are not worth it - all tools are sent instead
+MAX_SELECTED_TOOLS = 10
+
+# maximum length of a minified tool description
+MINIFIED_DESCRIPTION_CHARS = 160
+
+MORE_TOOLS_NAME = tool_request_more_tools["function"]["name"]
+
+# words (lower case, prefixes are enough) that make a tool relevant
+TOOL_KEYWORDS = {
+    "get_all_use_cases": ["all", "alle", "list", "liste", "overview", "übersicht", "show", "zeig", "how many", "wie viele"],
+    "get_use_case_by_id": ["#", "id", "nummer", "number", "detail"],
+    "create_use_case": ["create", "add", "new", "erstell", "anleg", "hinzufüg", "neu"],
+    "update_use_case": ["update", "change", "rename", "edit", "move", "änder", "bearbeit", "umbenenn", "aktualisier"],
+    "update_use_case_status": ["status", "approve", "genehmig", "archiv", "progress", "arbeit", "complete", "abschließ",
+                               "abgeschlossen", "fertig", "done", "review", "bewertung", "prüfung"],
+    "delete_use_case": ["delete", "remove", "lösch", "entfern"],
+    "filter_use_cases": ["filter", "status", "industry", "branche", "company", "firma", "unternehmen", "for", "für",
+                         "from", "von", "bei", "approved", "genehmigt", "progress", "new", "neu", "completed", "archived",
+                         "work", "contribut", "beteiligt", "mitgearbeitet"],
+    "get_all_industries": ["industr", "branche", "sector", "sektor"],
+    "get_all_companies": ["compan", "firm", "unternehmen"],
+    "get_all_persons": ["person", "people", "who", "wer", "contact", "kontakt", "mitarbeiter", "employee"],
+    "get_persons_by_use_case": ["who", "wer", "contribut", "involved", "beteiligt", "work", "people"],
+    "create_industry": ["create", "add", "new", "erstell", "anleg", "neu"],
+    "create_company": ["create", "add", "new", "erstell", "anleg", "neu"],
+    "create_person": ["create", "add", "new", "erstell", "anleg", "neu"],
+    "add_persons_to_use_case": ["link", "assign", "contributor", "verknüpf", "zuordn", "zuweis", "beteiligt", "add"],
+    "resolve_entity": ["similar", "ähnlich", "exist", "duplicate", "duplikat"],
+    "execute_batch": ["each", "every", "several", "multiple", "bulk", "jede", "mehrere"]
+}
+
+# tools that are only useful together with others (e.g. create_use_case needs industry/company ids)
+TOOL_COMPANIONS = {
+    "get_all_use_cases": ["filter_use_cases"],
+    "create_use_case": ["create_company", "create_industry", "create_person", "add_persons_to_use_case"],
+    "create_company": ["create_industry"],
+    "create_person": ["get_all_persons"],
+    "add_persons_to_use_case": ["get_all_persons"],
+    "filter_use_cases": ["get_all_persons"],
+    "update_use_case": ["get_use_case_by_id"],
+    "delete_use_case": ["get_use_case_by_id"]
+}
+
+
+def _name_words(name: str) -> List[str]:
+    """Words of a tool name that also select it, e.g. 'persons' of get_persons_by_use_case."""
+    return [word for word in name.split("_") if word not in {"get", "all", "by", "to", "use", "case", "cases", "id"}]
+
+
+def minify_tool(tool: dict) -> dict:
+    """
+    Minified copy of a tool definition: first sentence of the description (max MINIFIED_DESCRIPTION_CHARS),
+    parameter descriptions removed. Names, types, enums and required parameters stay.
+
+    Args:
+        tool (dict) : tool definition
+
+    Returns:
+        dict : minified tool definition
+    """
+    minified = copy.deepcopy(tool)
+    function = minified["function"]
+    first_sentence = re.split(r"(?<=[.!?])\s", function["description"].strip(), maxsplit=1)[0]
+    function["description"] = first_sentence[:MINIFIED_DESCRIPTION_CHARS]
+
+    def strip_descriptions(schema):
+        if isinstance(schema, dict):
+            schema.pop("description", None)
+            for value in schema.values():
+                strip_descriptions(value)
+
+    for parameter in function["parameters"].get("properties", {}).values():
+        strip_descriptions(parameter)
+    return minified
+
+
+class ToolSelector:
+    """
+    Scores tools against the recent user messages and returns the subset to send.
+    Counts requests, selected tools and estimated prompt tokens saved.
+    """
+
+    def __init__(self, enabled: bool = TOOL_SELECTION_ENABLED, minified: bool = MINIFIED_TOOLS_ENABLED):
+        self.enabled = enabled
+        self.minified = minified
+        self._names = [tool["function"]["name"] for tool in tools]
+        self._stats = {"requests": 0, "subsets": 0, "selected_tools": 0, "tokens_full": 0, "tokens_sent": 0}
+        self._lock = threading.Lock()
+
+    def score(self, text: str) -> Dict[str, int]:
+        """
+        Relevance of every tool for a text (number of matching keywords and name words).
+
+        Args:
+            text (str) : user message(s)
+
+        Returns:
+            Dict[str, int] : tool name -> score (only tools with score > 0)
+        """
+        text = text.lower()
+        words = re.findall(r"[\w#]+", text)
+
+        def mentioned(keyword):
+            # phrases anywhere in the text, single keywords as word prefix ("compan" -> "companies")
+            return keyword in text if " " in keyword else any(word.startswith(keyword) for word in words)
+
+        scores = {}
+        for name in self._names:
+            score = sum(1 for keyword in TOOL_KEYWORDS.get(name, []) if mentioned(keyword))
+            score += sum(1 for word in _name_words(name) if mentioned(word.rstrip("s")))
+            if score:
+                scores[name] = score
+
+        # a number usually refers to a use case id ("use case 5")
+        if re.search(r"\d", text):
+            scores["get_use_case_by_id"] = scores.get("get_use_case_by_id", 0) + 1
+        return scores
+
+    def select(self, messages: List[dict]) -> Optional[Tuple[str, ...]]:
+        """
+        Tool names for a request, in the order of the tools list, plus request_more_tools.
+
+        Args:
+            messages (List[dict]) : messages of the request; the last two user messages are scored
+
+        Returns:
+            Optional[Tuple[str, ...]] : selected tool names, None for all tools
+        """
+        if not self.enabled:
+            return None
+
+        user_texts = [m.get("content") for m in messages if isinstance(m, dict) and m.get("role") == "user"]
+        text = " ".join(t for t in user_texts[-2:] if isinstance(t, str))
+
+        selected = set(CORE_TOOLS) | set(self.score(text))
+        for name in list(selected):
+            selected.update(TOOL_COMPANIONS.get(name, []))
+
+        if len(selected) > MAX_SELECTED_TOOLS:
+            return None
+        return tuple(name for name in self._names if name in selected) + (MORE_TOOLS_NAME,)
+
+    def record(self, names: Optional[Tuple[str, ...]], minified: bool) -> None:
+        """
+        Count a request and the estimated prompt tokens of the tools sent vs. all tools. The system prompt doesn't
+        list the tools, so this is the whole saving of the request.
+        """
+        full = schema_tokens(None, False)
+        sent = schema_tokens(names, minified)
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["subsets"] += 1 if names is not None else 0
+            self._stats["selected_tools"] += len(names) if names is not None else len(self._names)
+            self._stats["tokens_full"] += full
+            self._stats["tokens_sent"] += sent
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests, share with a subset, average tools per request and estimated tool schema tokens saved."""
+        with self._lock:
+            stats = dict(self._stats)
+        requests = stats["requests"] or 1
+        stats["avg_tools"] = round(stats["selected_tools"] / requests, 1)
+        stats["tokens_saved"] = stats["tokens_full"] - stats["tokens_sent"]
+        stats["saved_ratio"] = round(stats["tokens_saved"] / stats["tokens_full"], 3) if stats["tokens_full"] else 0.0
+        stats["enabled"] = self.enabled
+        stats["minified"] = self.minified
+        return stats
+
+
+@functools.lru_cache(maxsize=128)
+def tools_for(names: Optional[Tuple[str, ...]] = None, minified: bool = False) -> List[dict]:
+    """
+    Tool definitions for a selection (cached per selection).
+
+    Args:
+        names (Optional[Tuple[str, ...]]) : tool names (may include request_more_tools), None for all tools
+        minified (bool) : use minified definitions
+
+    Returns:
+        List[dict] : tool definitions
+    """
+    selected = list(tools) if names is None else [
+        tool for tool in tools + [tool_request_more_tools] if tool["function"]["name"] in names
+    ]
+    return [minify_tool(tool) for tool in selected] if minified else selected
+
+
+@functools.lru_cache(maxsize=128)
+def schema_tokens(names: Optional[Tuple[str, ...]] = None, minified: bool = False) -> int:
+    """Estimated prompt tokens of the tool definitions of a selection."""
+    return estimate_tokens(json.dumps(tools_for(names, minified)))
+
+
+def request_more_tools(reason: str = None, current_user: dict = None) -> Dict[str, Any]:
+    """
+    Tool function of request_more_tools. The agent loop switches to all tools when it sees this call.
+
+    Returns:
+        Dict[str, Any] : names of all tools
+    """
+    return {"more_tools": True, "available_tools": [tool["function"]["name"] for tool in tools]}
+
+
+# one selector per process
+tool_selector = ToolSelector()
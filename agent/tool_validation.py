@@ -0,0 +1,261 @@
+"""
+Validation and coercion of tool call arguments, run by execute_tool before dispatch.
+
+The JSON schemas of agent.tools are compiled once into one checker per argument, so a call costs a few
+function calls instead of a database session and an exception from deep in the service layer:
+
+- integer: numeric strings ("3", " 3 ") and integral floats (3.0) become int; booleans and other text are errors
+- string: numbers become strings; enum values are normalized (case, blanks, spaces/hyphens -> '_') and mapped
+  from user wording (STATUS_WORDS: 'genehmigt' -> 'approved', 'in progress' -> 'in_progress')
+- boolean: "true"/"false" (any case) and 0/1 become bool
+- array: a single value becomes a one-element list, items are checked like arguments
+- object: checked like the arguments of a call (properties, required keys, unknown keys dropped);
+  objects without declared properties pass unchanged
+- null for an optional argument means "not given"; required arguments must be present
+- unknown keys are dropped (the services don't accept them)
+
+Invalid calls are rejected with all problems at once, named by argument and with the accepted values, so the
+model can fix the call in its next round.
+"""
+
+import re
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+from agent.tools import STATUS_WORDS, tool_request_more_tools, tools
+
+_INTEGER = re.compile(r"[+-]?\d+(?:\.0*)?")
+
+# checker: value -> (checked value, coerced); raises ToolArgumentError with a message without the argument name
+Checker = Callable[[Any], Tuple[Any, bool]]
+
+
+class ToolArgumentError(ValueError):
+    """Arguments of a tool call that don't match its schema (message lists all problems)."""
+
+
+def _check_integer() -> Checker:
+    def check(value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value, False
+        if isinstance(value, float) and value.is_integer():
+            return int(value), True
+        if isinstance(value, str) and _INTEGER.fullmatch(value.strip()):
+            return int(value.strip().split(".")[0]), True  # no float: large ids stay exact
+        raise ToolArgumentError(f"expected an integer, got {_short(value)}")
+    return check
+
+
+def _check_string() -> Checker:
+    def check(value):
+        if isinstance(value, str):
+            return value, False
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value), True
+        raise ToolArgumentError(f"expected a string, got {_short(value)}")
+    return check
+
+
+def _check_enum(values: list) -> Checker:
+    # lookup table built once: normalized spelling / user wording -> enum value
+    lookup = {_normalize(alias): value for alias, value in STATUS_WORDS.items() if value in values}
+    lookup.update({_normalize(value): value for value in values})
+    accepted = ", ".join(values)
+
+    def check(value):
+        if value in values:
+            return value, False
+        if isinstance(value, str) and _normalize(value) in lookup:
+            return lookup[_normalize(value)], True
+        raise ToolArgumentError(f"{_short(value)} is not one of: {accepted}")
+    return check
+
+
+def _check_boolean() -> Checker:
+    words = {"true": True, "false": False}
+
+    def check(value):
+        if isinstance(value, bool):
+            return value, False
+        if isinstance(value, int) and value in (0, 1):
+            return bool(value), True
+        if isinstance(value, str) and value.strip().lower() in words:
+            return words[value.strip().lower()], True
+        raise ToolArgumentError(f"expected true or false, got {_short(value)}")
+    return check
+
+
+def _check_array(items: Checker) -> Checker:
+    def check(value):
+        coerced = not isinstance(value, list)
+        checked, errors = [], []
+        for index, item in enumerate(value if isinstance(value, list) else [value]):
+            try:
+                item, item_coerced = items(item)
+            except ToolArgumentError as e:
+                errors.extend(_located(f"[{index}]", e))
+                continue
+            checked.append(item)
+            coerced = coerced or item_coerced
+        if errors:
+            raise ToolArgumentError("; ".join(errors))
+        return checked, coerced
+    return check
+
+
+def _check_object(properties: Dict[str, Checker], required: List[str]) -> Checker:
+    def check(value):
+        if not isinstance(value, dict):
+            raise ToolArgumentError(f"expected an object, got {_short(value)}")
+        if not properties:
+            return value, False
+        checked, errors = {}, []
+        coerced = any(key not in properties for key in value)  # unknown keys dropped
+        for key, item in value.items():
+            if key not in properties or item is None:
+                continue
+            try:
+                checked[key], item_coerced = properties[key](item)
+            except ToolArgumentError as e:
+                errors.extend(_located(f".{key}", e))
+                continue
+            coerced = coerced or item_coerced
+        errors = [f".{key}: missing" for key in required if key not in value or value[key] is None] + errors
+        if errors:
+            raise ToolArgumentError("; ".join(errors))
+        return checked, coerced
+    return check
+
+
+def _compile(schema: dict) -> Checker:
+    """Checker for one schema node (types the tools don't use pass unchanged)."""
+    kind = schema.get("type")
+    if kind == "integer":
+        return _check_integer()
+    if kind == "string":
+        return _check_enum(schema["enum"]) if "enum" in schema else _check_string()
+    if kind == "boolean":
+        return _check_boolean()
+    if kind == "array":
+        return _check_array(_compile(schema.get("items", {})))
+    if kind == "object":
+        properties = {key: _compile(value) for key, value in schema.get("properties", {}).items()}
+        return _check_object(properties, list(schema.get("required", [])))
+    return lambda value: (value, False)
+
+
+def _located(location: str, error: ToolArgumentError) -> List[str]:
+    """Problems of a nested checker, prefixed with where they are (e.g. 'operations' + '[0].tool: ...')."""
+    return [
+        f"{location}{part}" if part.startswith(("[", ".")) else f"{location}: {part}"
+        for part in str(error).split("; ")
+    ]
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[\s\-]+", "_", text.strip().lower())
+
+
+def _short(value: Any) -> str:
+    """Short representation of a value for error messages."""
+    text = repr(value)
+    return text if len(text) <= 60 else text[:57] + "..."
+
+
+class CompiledTool:
+    """
+    Compiled schema of one tool: a checker per property plus the required properties.
+    """
+
+    def __init__(self, name: str, parameters: dict):
+        self.name = name
+        self.properties = {
+            key: _compile(schema) for key, schema in parameters.get("properties", {}).items()
+        }
+        self.required = list(parameters.get("required", []))
+
+    def validate(self, arguments: dict) -> Tuple[Dict[str, Any], List[str], List[str]]:
+        """
+        Check and coerce the arguments of a call.
+
+        Args:
+            arguments (dict) : arguments as produced by the model
+
+        Returns:
+            Tuple[Dict[str, Any], List[str], List[str]] : checked arguments, coerced keys, dropped unknown keys
+
+        Raises:
+            ToolArgumentError: If arguments are missing or can't be coerced (message lists all problems)
+        """
+        checked, coerced, unknown, errors, invalid = {}, [], [], [], []
+        for key, value in arguments.items():
+            check = self.properties.get(key)
+            if check is None:
+                unknown.append(key)
+                continue
+            if value is None:
+                continue  # optional argument given as null: not given
+            try:
+                checked[key], was_coerced = check(value)
+            except ToolArgumentError as e:
+                errors.extend(_located(key, e))
+                invalid.append(key)
+                continue
+            if was_coerced:
+                coerced.append(key)
+
+        missing = [key for key in self.required if key not in checked and key not in invalid]
+        errors = [f"missing required argument '{key}'" for key in missing] + errors
+        if errors:
+            hint = f" (unknown arguments ignored: {', '.join(unknown)})" if unknown else ""
+            raise ToolArgumentError(f"Invalid arguments for {self.name}: {'; '.join(errors)}{hint}")
+        return checked, coerced, unknown
+
+
+class ToolArgumentValidator:
+    """
+    Compiled schemas of all tools; counts validated, coerced and rejected calls and dropped keys.
+    """
+
+    def __init__(self, tool_definitions: list = None):
+        self.tools = {
+            tool["function"]["name"]: CompiledTool(tool["function"]["name"], tool["function"].get("parameters", {}))
+            for tool in (tool_definitions if tool_definitions is not None else tools + [tool_request_more_tools])
+        }
+        self._stats = {"calls": 0, "coerced": 0, "stripped": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    def validate(self, name: str, arguments: dict) -> Tuple[Dict[str, Any], List[str], List[str]]:
+        """
+        Check and coerce the arguments of a call to tool name (tools without a compiled schema pass unchanged).
+
+        Returns:
+            Tuple[Dict[str, Any], List[str], List[str]] : checked arguments, coerced keys, dropped unknown keys
+
+        Raises:
+            ToolArgumentError: If the arguments don't match the schema
+        """
+        compiled = self.tools.get(name)
+        if compiled is None:
+            return dict(arguments), [], []
+        try:
+            checked, coerced, unknown = compiled.validate(arguments)
+        except ToolArgumentError:
+            self._count("calls", "rejected")
+            raise
+        self._count("calls", *(["coerced"] if coerced else []), *(["stripped"] if unknown else []))
+        return checked, coerced, unknown
+
+    def _count(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._stats[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Validated calls, calls with coerced values / dropped unknown keys, rejected calls."""
+        with self._lock:
+            return dict(self._stats)
+
+
+# compiled once per process
+argument_validator = ToolArgumentValidator()
@@ -5,6 +5,59 @@ Also for each tool a comprehensive description is given for how and in in which
 multiple calls are needed.
 """
 
+from services import UseCaseService
+
+# List tools (get_all_use_cases, filter_use_cases, get_all_persons) return a compact summary projection
+# and at most LIST_DEFAULT_LIMIT rows unless the model asks for more fields/rows (see tool_executor)
+LIST_DEFAULT_LIMIT = 25
+LIST_MAX_LIMIT = 100
+
+# fields the service can project (single source: UseCaseService)
+USE_CASE_LIST_FIELDS = UseCaseService.USE_CASE_FIELDS
+USE_CASE_SUMMARY_FIELDS = ["id", "title", "status", "company_name", "industry_name"]
+PERSON_LIST_FIELDS = UseCaseService.PERSON_FIELDS
+PERSON_SUMMARY_FIELDS = ["id", "name", "role", "company_name"]
+
+# maximum number of operations in one execute_batch call
+BATCH_MAX_OPERATIONS = 50
+
+# user wording -> status value (same mapping as in the status descriptions below); used by the fast path
+# (intent_router) and to normalize status arguments of tool calls (tool_validation)
+STATUS_WORDS = {
+    "new": "new", "neu": "new", "neue": "new", "neuen": "new",
+    "in review": "in_review", "in_review": "in_review", "in bewertung": "in_review", "zur prüfung": "in_review",
+    "approved": "approved", "genehmigt": "approved", "genehmigte": "approved", "genehmigten": "approved",
+    "in progress": "in_progress", "in_progress": "in_progress", "laufend": "in_progress", "laufende": "in_progress",
+    "laufenden": "in_progress",
+    "in arbeit": "in_progress",
+    "completed": "completed", "done": "completed", "fertig": "completed", "abgeschlossen": "completed",
+    "abgeschlossene": "completed", "abgeschlossenen": "completed",
+    "archived": "archived", "archiviert": "archived", "archivierte": "archived", "archivierten": "archived"
+}
+
+
+def _list_properties(fields: list, summary_fields: list) -> dict:
+    """Schema properties for projection and paging of a list tool."""
+    return {
+        "fields": {
+            "type": "array",
+            "items": {"type": "string", "enum": fields},
+            "description": (
+                f"Fields to return (optional, default: {', '.join(summary_fields)}). "
+                "Only request long text fields like description or expected_benefit when the user needs them."
+            )
+        },
+        "limit": {
+            "type": "integer",
+            "description": f"Maximum number of rows (optional, default {LIST_DEFAULT_LIMIT}, max {LIST_MAX_LIMIT})"
+        },
+        "offset": {
+            "type": "integer",
+            "description": "Number of rows to skip (optional, default 0). Use next_offset of a truncated result to get the next page."
+        }
+    }
+
+
 # Tool 1: Get all use cases
 tool_get_all_use_cases = {
     "type": "function",
@@ -14,12 +67,13 @@ tool_get_all_use_cases = {
             "Retrieve all use cases from the database. "
             "Use this when the user wants to see all use cases, list use cases, "
             "or get an overview of everything in the system. "
-            "Returns comprehensive information including title, description, status, "
-            "company, and industry for each use case."
+            "Returns a compact summary (id, title, status, company, industry) per use case by default; "
+            "request more fields via 'fields'. Results are paged: if 'truncated' is true, "
+            "call again with offset=next_offset for more."
         ),
         "parameters": {
             "type": "object",
-            "properties": {},
+            "properties": _list_properties(USE_CASE_LIST_FIELDS, USE_CASE_SUMMARY_FIELDS),
             "required": []
         }
     }
@@ -241,7 +295,8 @@ tool_filter_use_cases = {
             "you can use one or combine multiple filters. "
             "Use this when the user wants use cases matching specific conditions "
             "(e.g., 'show energy sector use cases', 'what's in progress', 'cases from company X'). "
-            "Returns a list of use cases matching ALL provided filters (AND logic)."
+            "Returns a list of use cases matching ALL provided filters (AND logic), "
+            "as compact summaries and paged like get_all_use_cases (fields, limit, offset)."
         ),
         "parameters": {
             "type": "object",
@@ -280,7 +335,8 @@ tool_filter_use_cases = {
                         "Only return use cases that this specific person contributed to. "
                         "Must be a valid person ID number from the database."
                     )
-                }
+                },
+                **_list_properties(USE_CASE_LIST_FIELDS, USE_CASE_SUMMARY_FIELDS)
             },
             "required": []
         }
@@ -295,12 +351,12 @@ tool_get_all_industries = {
         "name": "get_all_industries",
         "description": (
             "Get a complete list of all industries with their IDs and names. "
-            "CRITICAL: When a user mentions an industry by NAME (e.g., 'IT', 'Energy', 'Healthcare', "
-            "'Energie', 'Gesundheitswesen'), you MUST call this function FIRST to find the industry_id, "
-            "THEN use that ID in subsequent calls to filter_use_cases, create_use_case, or update_use_case. "
-            "This is a TWO-STEP process: (1) Call get_all_industries to map name→ID, (2) Use the ID. "
-            "Example: User says 'Show me Energy sector use cases' → Call get_all_industries() → "
-            "Find that Energy has id=1 → Then call filter_use_cases(industry_id=1)"
+            "When a user mentions an industry by NAME (e.g., 'IT', 'Energy', 'Healthcare', 'Energie', "
+            "'Gesundheitswesen'), take its industry_id from the REFERENCE DATA message if it is listed there. "
+            "Only if it is not listed (or there is no reference data), call this function first to map name→ID, "
+            "then use the ID in filter_use_cases, create_use_case or update_use_case. "
+            "Example: User says 'Show me Energy sector use cases', Energy is not in the reference data → "
+            "Call get_all_industries() → Find that Energy has id=1 → Then call filter_use_cases(industry_id=1)"
         ),
         "parameters": {
             "type": "object",
@@ -317,12 +373,12 @@ tool_get_all_companies = {
         "name": "get_all_companies",
         "description": (
             "Get a complete list of all companies with their IDs, names, and industry information. "
-            "CRITICAL: When a user mentions a company by NAME, "
-            "you MUST call this function FIRST to find the company_id and industry_id, "
-            "THEN use those IDs in subsequent calls to create_use_case, update_use_case, or filter_use_cases. "
-            "This is a TWO-STEP process: (1) Call get_all_companies to map name→IDs, (2) Use the IDs. "
-            "Example: User says 'Create a use case for Siemens' → Call get_all_companies() → "
-            "Find that Siemens Energy has id=1, industry_id=1 → Then call create_use_case(company_id=1, industry_id=1)"
+            "When a user mentions a company by NAME, take its company_id and industry_id from the REFERENCE DATA "
+            "message if it is listed there. Only if it is not listed (or there is no reference data), call this "
+            "function first to map name→IDs, then use the IDs in create_use_case, update_use_case or filter_use_cases. "
+            "Example: User says 'Create a use case for Siemens', Siemens is not in the reference data → "
+            "Call get_all_companies() → Find that Siemens Energy has id=1, industry_id=1 → "
+            "Then call create_use_case(company_id=1, industry_id=1)"
         ),
         "parameters": {
             "type": "object",
@@ -340,14 +396,18 @@ tool_get_all_persons = {
         "description": (
             "Get a complete list of all persons with their IDs, names, roles, and company information. "
             "Use this when the user asks about people, contributors, or who works where. "
-            "When a user mentions a person by name and you need their person_id for filtering, "
-            "call this function first to find the ID, then use it in filter_use_cases(person_id=...). "
-            "Example: User says 'Show me use cases that Anna worked on' → Call get_all_persons() → "
-            "Find Anna's ID → Call filter_use_cases(person_id=...)"
+            "When a user mentions a person by name and you need their person_id for filtering, take it from the "
+            "REFERENCE DATA message if the person is listed there; otherwise call this function first to find the "
+            "ID, then use it in filter_use_cases(person_id=...). "
+            "Example: User says 'Show me use cases that Anna worked on', Anna is not in the reference data → "
+            "Call get_all_persons() → "
+            "Find Anna's ID → Call filter_use_cases(person_id=...). "
+            "Results are paged: if 'truncated' is true, call again with offset=next_offset "
+            "(or use resolve_entity to look up a single person by name)."
         ),
         "parameters": {
             "type": "object",
-            "properties": {},
+            "properties": _list_properties(PERSON_LIST_FIELDS, PERSON_SUMMARY_FIELDS),
             "required": []
         }
     }
@@ -385,8 +445,8 @@ tool_create_industry = {
         "description": (
             "Create a new industry in the database. "
             "Use this when you need to add a new industry that doesn't exist yet. "
-            "IMPORTANT: Check if the industry already exists using get_all_industries first. "
-            "Only create if it truly doesn't exist."
+            "IMPORTANT: Only create it if it doesn't exist: check the REFERENCE DATA message, "
+            "or get_all_industries if there is no reference data."
         ),
         "parameters": {
             "type": "object",
@@ -409,7 +469,8 @@ tool_create_company = {
         "description": (
             "Create a new company in the database. "
             "Use this when you need to add a new company that doesn't exist yet. "
-            "IMPORTANT: Before creating, check if the company exists using get_all_companies. "
+            "IMPORTANT: Only create it if it doesn't exist: check the REFERENCE DATA message, "
+            "or get_all_companies if there is no reference data. "
             "You must provide a valid industry_id - if the industry doesn't exist (check this), create it first."
         ),
         "parameters": {
@@ -438,7 +499,8 @@ tool_create_person = {
             "Create a new person in the database. "
             "Use this when you need to add a person who contributed to use cases. "
             "IMPORTANT: You must provide a valid company_id. "
-            "If you're unsure if the person already exists, check get_all_persons first."
+            "If you're unsure if the person already exists and they are not in the REFERENCE DATA message, "
+            "check resolve_entity or get_all_persons first."
         ),
         "parameters": {
             "type": "object",
@@ -489,6 +551,100 @@ tool_add_persons_to_use_case = {
     }
 }
 
+# Tool 16: Resolve entity by fuzzy name
+tool_resolve_entity = {
+    "type": "function",
+    "function": {
+        "name": "resolve_entity",
+        "description": (
+            "Find existing companies or persons whose name is similar to a given name (fuzzy matching). "
+            "Tolerates legal forms, titles and spelling variants: 'E.ON SE' finds 'E.ON', "
+            "'Dr. Anna Schmidt' finds 'Anna Schmidt'. "
+            "Use this BEFORE create_company or create_person to avoid creating duplicates, "
+            "and to map a company/person name to its ID without listing everything. "
+            "Returns scored candidates (score 0-1, best first) and best_match if one is confident enough. "
+            "If best_match is null but candidates exist, ask the user or pick a candidate only if clearly the same."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "entity_type": {
+                    "type": "string",
+                    "description": "Kind of entity to resolve",
+                    "enum": ["company", "person"]
+                },
+                "name": {
+                    "type": "string",
+                    "description": "The name as mentioned by the user (e.g., 'Siemens Energy AG', 'Dr. Thomas Klein')"
+                },
+                "company_id": {
+                    "type": "integer",
+                    "description": "Only for persons (optional): restrict candidates to persons of this company"
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Maximum number of candidates to return (optional, default 5)"
+                }
+            },
+            "required": ["entity_type", "name"]
+        }
+    }
+}
+
+# Tool 17: Execute many operations in one call
+tool_execute_batch = {
+    "type": "function",
+    "function": {
+        "name": "execute_batch",
+        "description": (
+            "Execute several tool operations in one call, e.g. update the status of many use cases, create several "
+            "persons or delete a list of use cases. "
+            "Use this instead of calling the same tool many times when the arguments of all operations are already "
+            "known (ids resolved); operations run in the given order. "
+            "With atomic=true the operations are all-or-nothing: if one fails, none of them is saved. "
+            "Returns the number of completed and failed operations and one compact result per operation "
+            f"(max {BATCH_MAX_OPERATIONS} operations)."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "operations": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "tool": {
+                                "type": "string",
+                                "description": "Name of the tool to call",
+                                "enum": [
+                                    "get_use_case_by_id", "create_use_case", "update_use_case",
+                                    "update_use_case_status", "delete_use_case", "get_persons_by_use_case",
+                                    "create_industry", "create_company", "create_person", "add_persons_to_use_case",
+                                    "resolve_entity"
+                                ]
+                            },
+                            "arguments": {
+                                "type": "object",
+                                "description": "Arguments of the call, as for a direct call of the tool"
+                            }
+                        },
+                        "required": ["tool", "arguments"]
+                    },
+                    "description": (
+                        "Operations to execute in order, e.g. "
+                        "[{\"tool\": \"update_use_case_status\", \"arguments\": {\"use_case_id\": 3, \"status\": \"approved\"}}]"
+                    )
+                },
+                "atomic": {
+                    "type": "boolean",
+                    "description": "All-or-nothing: roll back all operations if one fails (optional, default false)"
+                }
+            },
+            "required": ["operations"]
+        }
+    }
+}
+
 # Combine all tools into a list
 tools = [
     tool_get_all_use_cases,
@@ -505,5 +661,45 @@ tools = [
     tool_create_industry,
     tool_create_company,
     tool_create_person,
-    tool_add_persons_to_use_case
-]
\ No newline at end of file
+    tool_add_persons_to_use_case,
+    tool_resolve_entity,
+    tool_execute_batch
+]
+
+# Fallback for per-request tool selection (see tool_selector): only sent when the request got a subset of the tools.
+# Not part of `tools`.
+tool_request_more_tools = {
+    "type": "function",
+    "function": {
+        "name": "request_more_tools",
+        "description": (
+            "Only a subset of the tools is available for this request. "
+            "Call this if you need a tool that is not in your list (e.g. to create, update, delete or link entries); "
+            "all tools will be available in the next step."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "reason": {
+                    "type": "string",
+                    "description": "What you need the additional tools for (optional)"
+                }
+            },
+            "required": []
+        }
+    }
+}
+
+# Tools that only read from the database.
+# Calls to these tools within one agent round may run concurrently; all other tools are writes and run in order.
+read_only_tools = {
+    "get_all_use_cases",
+    "get_use_case_by_id",
+    "filter_use_cases",
+    "get_all_industries",
+    "get_all_companies",
+    "get_all_persons",
+    "get_persons_by_use_case",
+    "resolve_entity",
+    "request_more_tools"
+}
@@ -0,0 +1,249 @@
+"""
+Request tracing: UI -> agent -> LLM calls / tool calls -> SQL statements.
+A trace is one chat request with a correlation id (trace_id); spans are timed steps within it:
+
+    request   the chat message (app.py) or a run_agent call without UI
+    agent     run_agent / stream_agent_async
+    llm       one LLM call (latency, prompt/cached/completion tokens)
+    tool      one execute_tool call
+    sql       one SQL statement (SQLAlchemy cursor events)
+
+The current trace and span live in context variables, so spans of worker threads (asyncio.to_thread,
+parallel tool calls) and of the SQL event hooks land in the right trace. Finished traces are appended to
+AGENT_TRACE_FILE as JSON lines (one line per span) and the last TRACE_KEEP traces are kept in memory for the
+admin timeline.
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# tracing on/off, JSON lines export (empty: no file), traces kept in memory
+TRACING_ENABLED = os.getenv("AGENT_TRACING", "1") == "1"
+TRACE_FILE = os.getenv("AGENT_TRACE_FILE", os.path.join("logs", "traces.jsonl"))
+TRACE_KEEP = 50
+
+# SQL statements are shortened to this many characters in the span
+SQL_STATEMENT_CHARS = 300
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class Trace:
+    """Spans of one request (spans are added by several threads)."""
+
+    def __init__(self, name: str):
+        self.trace_id = _new_id()
+        self.name = name
+        self.started_at = time.time()
+        self.t0 = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Dict[str, Any], start: float, end: float) -> None:
+        """Add a finished span (start/end: perf_counter values)."""
+        span["start_ms"] = round((start - self.t0) * 1000, 2)
+        span["duration_ms"] = round((end - start) * 1000, 2)
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Trace with spans in start order and time per span kind."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start_ms"])
+        root = next((span for span in spans if span["parent_id"] is None), None)
+        by_kind = {}
+        for span in spans:
+            totals = by_kind.setdefault(span["kind"], {"count": 0, "duration_ms": 0.0})
+            totals["count"] += 1
+            totals["duration_ms"] = round(totals["duration_ms"] + span["duration_ms"], 2)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": root["duration_ms"] if root else 0.0,
+            "error": root.get("error") if root else None,
+            "by_kind": by_kind,
+            "spans": spans
+        }
+
+
+class Tracer:
+    """
+    Creates traces and spans, exports finished traces and keeps the recent ones.
+    """
+
+    def __init__(self, enabled: bool = TRACING_ENABLED, path: str = TRACE_FILE, keep: int = TRACE_KEEP):
+        self.enabled = enabled
+        self.path = path
+        self._recent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def trace(self, name: str, new_trace: bool = False, **attrs) -> Iterator[Dict[str, Any]]:
+        """
+        Start a trace (or, inside a running trace, a span of kind "request"/"agent" named name).
+
+        Args:
+            name (str) : request type, e.g. 'chat', 'agent', 'transcript'
+            new_trace (bool) : always start a new trace (background work started from within a request)
+            **attrs : attributes of the root span (user, message, ...)
+
+        Yields:
+            Dict[str, Any] : attributes of the root span (add more while running)
+        """
+        if not self.enabled or (_current_trace.get() is not None and not new_trace):
+            with self.span("agent" if name == "agent" else "request", name, **attrs) as span_attrs:
+                yield span_attrs
+            return
+
+        trace = Trace(name)
+        previous_trace, previous_span = _current_trace.get(), _current_span.get()
+        _current_trace.set(trace)
+        _current_span.set(None)
+        try:
+            with self.span("request", name, **attrs) as span_attrs:
+                yield span_attrs
+        finally:
+            _current_trace.set(previous_trace)
+            _current_span.set(previous_span)
+            self._finish(trace)
+
+    @contextlib.contextmanager
+    def span(self, kind: str, name: str, **attrs) -> Iterator[Dict[str, Any]]:
+        """
+        Time a step of the current trace (no-op outside of a trace).
+
+        Args:
+            kind (str) : 'request', 'agent', 'llm', 'tool', 'sql', ...
+            name (str) : e.g. LLM stage or tool name
+            **attrs : span attributes
+
+        Yields:
+            Dict[str, Any] : attributes of the span (add more while running)
+        """
+        trace = _current_trace.get() if self.enabled else None
+        if trace is None:
+            yield attrs
+            return
+
+        parent = _current_span.get()
+        span = {
+            "trace_id": trace.trace_id,
+            "span_id": _new_id(),
+            "parent_id": parent["span_id"] if parent else None,
+            "kind": kind,
+            "name": name,
+            "attrs": attrs
+        }
+        _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            span["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            # set instead of reset: generators may be finished in another context
+            _current_span.set(parent)
+            trace.add(span, start, time.perf_counter())
+
+    def record(self, kind: str, name: str, start: float, end: float, **attrs) -> None:
+        """Add an already finished span (start/end: perf_counter values) to the current trace."""
+        trace = _current_trace.get() if self.enabled else None
+        if trace is None:
+            return
+        parent = _current_span.get()
+        trace.add({
+            "trace_id": trace.trace_id,
+            "span_id": _new_id(),
+            "parent_id": parent["span_id"] if parent else None,
+            "kind": kind,
+            "name": name,
+            "attrs": attrs
+        }, start, end)
+
+    def annotate(self, **attrs) -> None:
+        """Add attributes to the current span (e.g. token usage of an LLM call)."""
+        span = _current_span.get() if self.enabled else None
+        if span is not None:
+            span["attrs"].update(attrs)
+
+    def active(self) -> bool:
+        """Whether the caller runs inside a trace."""
+        return self.enabled and _current_trace.get() is not None
+
+    def current_trace_id(self) -> Optional[str]:
+        """Correlation id of the current trace, None outside of a trace."""
+        trace = _current_trace.get()
+        return trace.trace_id if trace else None
+
+    def _finish(self, trace: Trace) -> None:
+        finished = trace.to_dict()
+        with self._lock:
+            self._recent.append(finished)
+            if not self.path:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as file:
+                    for span in finished["spans"]:
+                        file.write(json.dumps(span, default=str) + "\n")
+            except OSError as e:
+                print(f"Trace export failed: {e}")
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent traces first, without spans."""
+        with self._lock:
+            traces = list(self._recent)[-limit:]
+        return [{key: value for key, value in trace.items() if key != "spans"} for trace in reversed(traces)]
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        """Recent trace with all spans, None if unknown."""
+        with self._lock:
+            return next((trace for trace in self._recent if trace["trace_id"] == trace_id), None)
+
+
+# one tracer per process
+tracer = Tracer()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _sql_start(conn, cursor, statement, parameters, context, executemany):
+    if tracer.active():
+        conn.info.setdefault("trace_sql_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _sql_end(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("trace_sql_start")
+    if not starts:
+        return
+    start = starts.pop()
+    tracer.record("sql", statement.split(None, 1)[0].upper() if statement.strip() else "SQL", start,
+                  time.perf_counter(), statement=" ".join(statement.split())[:SQL_STATEMENT_CHARS],
+                  rows=cursor.rowcount, executemany=executemany)
+
+
+@event.listens_for(Engine, "handle_error")
+def _sql_error(context):
+    starts = context.connection.info.get("trace_sql_start") if context.connection is not None else None
+    if not starts:
+        return
+    tracer.record("sql", "ERROR", starts.pop(), time.perf_counter(),
+                  statement=" ".join((context.statement or "").split())[:SQL_STATEMENT_CHARS],
+                  error=str(context.original_exception))
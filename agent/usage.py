@@ -0,0 +1,96 @@
+"""
+Token usage of the LLM calls of the agent.
+Records prompt (input), cached input and completion tokens per call, as reported by the provider
+(OpenAI format usage, prompt_tokens_details.cached_tokens for prompt cache hits), plus totals and estimated cost
+per model (see agent.model_router).
+"""
+
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+from agent.model_router import estimate_cost
+from agent.tracing import tracer
+
+
+class UsageTracker:
+    """
+    Collects token usage per LLM call and running totals.
+    """
+
+    def __init__(self, max_recent: int = 200):
+        self.recent = deque(maxlen=max_recent)
+        self._totals = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+        self._by_model = {}
+        self._lock = threading.Lock()
+
+    def record(self, usage, stage: str = "agent", model: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Record the usage of one LLM call.
+
+        Args:
+            usage : usage object of the response (None if the provider sent none)
+            stage (str) : what the call was for (e.g. 'agent', 'final', 'summary')
+            model (Optional[str]) : model of the call (for totals and cost per model)
+
+        Returns:
+            Optional[Dict[str, Any]] : stage, model, prompt_tokens, cached_tokens, uncached_tokens, completion_tokens,
+                                       cost_usd
+        """
+        if usage is None:
+            return None
+
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        entry = {
+            "stage": stage,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "uncached_tokens": prompt_tokens - cached_tokens,
+            "completion_tokens": completion_tokens,
+            "cost_usd": estimate_cost(model, prompt_tokens, completion_tokens)
+        }
+        with self._lock:
+            self.recent.append(entry)
+            for totals in (self._totals, self._by_model.setdefault(model, dict.fromkeys(self._totals, 0))):
+                totals["calls"] += 1
+                totals["prompt_tokens"] += entry["prompt_tokens"]
+                totals["cached_tokens"] += entry["cached_tokens"]
+                totals["completion_tokens"] += entry["completion_tokens"]
+
+        # token usage on the span of the LLM call
+        tracer.annotate(prompt_tokens=entry["prompt_tokens"], cached_tokens=entry["cached_tokens"],
+                        completion_tokens=entry["completion_tokens"], cost_usd=entry["cost_usd"])
+        return entry
+
+    def totals(self) -> Dict[str, Any]:
+        """Running totals and share of input tokens served from the prompt cache."""
+        with self._lock:
+            totals = dict(self._totals)
+        totals["uncached_tokens"] = totals["prompt_tokens"] - totals["cached_tokens"]
+        totals["cache_hit_ratio"] = round(totals["cached_tokens"] / totals["prompt_tokens"], 3) if totals["prompt_tokens"] else 0.0
+        return totals
+
+    def by_model(self) -> Dict[str, Dict[str, Any]]:
+        """Totals per model with estimated cost (USD)."""
+        with self._lock:
+            by_model = {model: dict(totals) for model, totals in self._by_model.items()}
+        for model, totals in by_model.items():
+            totals["cost_usd"] = round(estimate_cost(model, totals["prompt_tokens"], totals["completion_tokens"]), 6)
+        return by_model
+
+    def reset(self) -> None:
+        """Clear recent calls and totals."""
+        with self._lock:
+            self.recent.clear()
+            self._by_model.clear()
+            for key in self._totals:
+                self._totals[key] = 0
+
+
+# one tracker per process
+usage_tracker = UsageTracker()
@@ -1,9 +1,14 @@
 from nicegui import ui, app
 from services.user_service import UserService
+from services.maintenance_service import maintenance_scheduler
 
 # init user service
 user_service = UserService()
 
+# background database maintenance on the NiceGUI event loop
+app.on_startup(maintenance_scheduler.start)
+app.on_shutdown(maintenance_scheduler.stop)
+
 # Global storage for UI elements (can't be stored in app.storage)
 ui_elements = {}  # ← ADD THIS LINE
 
@@ -168,6 +173,28 @@ def refresh_use_case_table():
     except Exception as e:
         print(f"Error refreshing table: {e}")
 
+_client_tasks = {}  # client id -> running agent tasks of that browser tab
+
+
+def cancel_on_disconnect(task):
+    """Cancel task (a running agent request) when the browser of the current client disconnects.
+
+    Args:
+        task (asyncio.Task) : task to cancel
+    """
+    client = ui.context.client
+    tasks = _client_tasks.get(client.id)
+    if tasks is None:
+        tasks = _client_tasks[client.id] = set()
+
+        def cancel_tasks():
+            for running in _client_tasks.pop(client.id, set()):
+                running.cancel()
+
+        client.on_disconnect(cancel_tasks)
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+
 async def send_message(message_input, chat_container):
     """Handle sending a message to the agent (async to prevent UI freeze). 
     Calls agent and shows agent thinking while processing. Updates table afterwards.
@@ -177,8 +204,10 @@ async def send_message(message_input, chat_container):
         chat_container (ui.column) : container obj
     """
     import asyncio
-    from agent import run_agent
+    from agent import stream_agent_async
+    from agent.tracing import tracer
     from agent.tool_executor import set_current_user
+    from agent.history import history_manager, empty_summary
     
     # Get message text
     user_message = message_input.value.strip()
@@ -191,8 +220,9 @@ async def send_message(message_input, chat_container):
     # Get current user and history
     current_user = app.storage.user.get('current_user')
     history = app.storage.user.get('conversation_history', [])
+    summary_state = app.storage.user.get('history_summary') or empty_summary()
     
-    # Set current user for agent permissions
+    # Set current user for agent permissions (context of this handler task only - other chats keep their user)
     set_current_user(current_user)
     
     # Add user message to history
@@ -219,38 +249,71 @@ async def send_message(message_input, chat_container):
     # Scroll to show thinking message
     chat_container.run_method('scrollTo', 0, 99999)
     
-    # Run agent in background thread (prevents UI freeze)
+    # Run agent on the event loop (AsyncOpenAI) - events are streamed into the chat;
+    # the run is cancelled if the browser disconnects
+    thinking_removed = False
+    cancel_on_disconnect(asyncio.current_task())
+
     try:
-        # Build conversation history
-        agent_history = [msg for msg in history]
-        
-        # Run agent in executor (separate thread, non-blocking)
-        agent_response = await asyncio.to_thread(
-            run_agent,
-            user_message,
-            conversation_history=agent_history[:-1],
-            verbose=False,
-            max_rounds=10
-        )
-        
-        # Remove "thinking..." message
-        thinking_row.delete()
-        
+        # Build conversation history: rolling summary + recent turns within the token budget
+        agent_history = history_manager.select(history[:-1], summary_state)
+
+        response_label = None
+        round_text = ''  # text of the current round (rounds ending in tool calls are replaced by the next one)
+        agent_response = ''
+        with tracer.trace('chat', user=current_user['email'] if current_user else None, message=user_message[:200]):
+            async for event in stream_agent_async(user_message, conversation_history=agent_history, verbose=False, max_rounds=10):
+                if event['type'] == 'token':
+                    if response_label is None:
+                        # first token - replace "thinking..." with the answer bubble
+                        thinking_row.delete()
+                        thinking_removed = True
+                        with chat_container:
+                            with ui.row().classes('justify-start mb-2'):
+                                response_label = ui.label('').classes(
+                                    'bg-white px-4 py-2 rounded-lg border max-w-[80%] whitespace-pre-wrap'
+                                )
+                    round_text += event['content']
+                    response_label.set_text(round_text)
+                    chat_container.run_method('scrollTo', 0, 99999)
+
+                elif event['type'] == 'tool_call_started':
+                    if response_label is None:
+                        thinking_label.set_text(f'🔧 {event["name"]}...')
+
+                elif event['type'] == 'plan':
+                    if response_label is None:
+                        thinking_label.set_text(f'🗺️ running a plan with {event["steps"]} step(s)...')
+
+                elif event['type'] in ('round', 'retry'):
+                    round_text = ''
+
+                elif event['type'] == 'done':
+                    agent_response = event['content']
+
+        # Remove "thinking..." message (answer without any streamed token)
+        if response_label is None:
+            thinking_row.delete()
+            thinking_removed = True
+            with chat_container:
+                with ui.row().classes('justify-start mb-2'):
+                    response_label = ui.label('').classes(
+                        'bg-white px-4 py-2 rounded-lg border max-w-[80%] whitespace-pre-wrap'
+                    )
+        response_label.set_text(agent_response)
+
         # Add agent response to history
         history.append({
             'role': 'assistant',
             'content': agent_response
         })
-        
-        # Display agent message
-        with chat_container:
-            with ui.row().classes('justify-start mb-2'):
-                ui.label(agent_response).classes(
-                    'bg-white px-4 py-2 rounded-lg border max-w-[80%] whitespace-pre-wrap'
-                )
-        
+
         # Save history
         app.storage.user['conversation_history'] = history
+
+        # Fold older turns into the summary in the background (next request uses it)
+        if history_manager.needs_compaction(history, summary_state):
+            asyncio.create_task(compact_history(list(history), summary_state, current_user['id'] if current_user else None))
         
         # Scroll to bottom
         chat_container.run_method('scrollTo', 0, 99999)
@@ -261,15 +324,45 @@ async def send_message(message_input, chat_container):
         
     except Exception as e:
         # Remove "thinking..." message
-        thinking_row.delete()
+        if not thinking_removed:
+            thinking_row.delete()
         
-        # Show error
+        # Show error (also TimeoutError of a slow LLM call)
         with chat_container:
             with ui.row().classes('justify-start mb-2'):
                 ui.label(f'Error: {str(e)}').classes(
                     'bg-red-100 text-red-700 px-4 py-2 rounded-lg border border-red-300 max-w-[80%]'
                 )
 
+async def compact_history(history_snapshot, summary_state, key):
+    """Compute the new rolling summary of the conversation in a worker thread and store it.
+
+    Args:
+        history_snapshot (list) : conversation history at the time of the answer
+        summary_state (dict) : current summary state
+        key : identifies the conversation (user id), only one compaction per conversation at a time
+    """
+    import asyncio
+    from agent.history import history_manager
+    from agent.tracing import tracer
+
+    if not history_manager.try_start_compaction(key):
+        return
+    try:
+        # own trace - the chat request that started the compaction is already answered
+        with tracer.trace('summary', new_trace=True, user=key):
+            new_state = await asyncio.to_thread(history_manager.compact, history_snapshot, summary_state)
+
+        # conversation was cleared in the meantime (logout) -> summary no longer valid
+        if len(app.storage.user.get('conversation_history', [])) < new_state['summarized']:
+            return
+        app.storage.user['history_summary'] = new_state
+    except Exception as e:
+        # no summary this time - select() still keeps the request within the budget
+        print(f"History compaction failed: {e}")
+    finally:
+        history_manager.finish_compaction(key)
+
 def show_use_case_details(use_case_data, current_user):
     """Show use case details in a dialog and visualizes use case data and 
     oppotunity for change/delete if user owns the corresponding rights.
@@ -483,8 +576,6 @@ def show_main_app():
             # Upload Transcript button (only for maintainer/admin)
             if check_permission(current_user, 'create'):
                 async def handle_upload(e):
-                    import asyncio
-                    
                     try:
                         # Check file type
                         if not e.name.endswith('.txt'):
@@ -506,53 +597,50 @@ def show_main_app():
                             )
                             return
                         
-                        from extraction.transcript_processor import extract_prompts_from_transcript
-                        from agent import run_agent
+                        from extraction.transcript_processor import extract_prompts_from_transcript_async
+                        from agent import run_agent_async
                         from agent.tool_executor import set_current_user
+                        from agent.tracing import tracer
                         
                         set_current_user(current_user)
                         
-                        # Step 1: Extract prompts
-                        ui.notify('📄 Extracting use cases from transcript...', type='info', position='top')
+                        with tracer.trace('transcript', user=current_user['email'], file=e.name):
+                            # Step 1: Extract prompts
+                            ui.notify('📄 Extracting use cases from transcript...', type='info', position='top')
                         
-                        # Run extraction in background
-                        prompts = await asyncio.to_thread(
-                            extract_prompts_from_transcript,
-                            content,
-                            verbose=False
-                        )
+                            # Run extraction (async LLM call, UI stays responsive)
+                            prompts = await extract_prompts_from_transcript_async(content, verbose=False)
                         
-                        if not prompts:
-                            ui.notify('No use cases found in transcript', type='warning')
-                            return
+                            if not prompts:
+                                ui.notify('No use cases found in transcript', type='warning')
+                                return
                         
-                        ui.notify(f'✓ Found {len(prompts)} use case(s). Creating them...', type='positive', position='top')
+                            ui.notify(f'✓ Found {len(prompts)} use case(s). Creating them...', type='positive', position='top')
                         
-                        # Step 2: Process each prompt with agent
-                        successful = 0
+                            # Step 2: Process each prompt with agent
+                            successful = 0
                         
-                        for i, prompt in enumerate(prompts, 1):
-                            ui.notify(
-                                f'Creating use case {i}/{len(prompts)}...', 
-                                type='info',
-                                position='top',
-                                timeout=2000
-                            )
-                            
-                            try:
-                                # Run agent in background
-                                await asyncio.to_thread(
-                                    run_agent,
-                                    prompt,
-                                    conversation_history=None,
-                                    verbose=False,
-                                    max_rounds=10
+                            for i, prompt in enumerate(prompts, 1):
+                                ui.notify(
+                                    f'Creating use case {i}/{len(prompts)}...', 
+                                    type='info',
+                                    position='top',
+                                    timeout=2000
                                 )
-                                successful += 1
+                            
+                                try:
+                                    # Run agent (async, UI stays responsive)
+                                    await run_agent_async(
+                                        prompt,
+                                        conversation_history=None,
+                                        verbose=False,
+                                        max_rounds=10
+                                    )
+                                    successful += 1
                                 
-                            except Exception as e:
-                                print(f"Error creating use case {i}: {e}")
-                                # Continue with next use case
+                                except Exception as e:
+                                    print(f"Error creating use case {i}: {e}")
+                                    # Continue with next use case
                         
                         # Final notification
                         if successful == len(prompts):
@@ -599,6 +687,7 @@ def show_main_app():
             def logout():
                 app.storage.user['current_user'] = None
                 app.storage.user['conversation_history'] = []
+                app.storage.user['history_summary'] = None
                 ui.notify('Logged out successfully', type='info')
                 ui.navigate.to('/')
             
@@ -941,6 +1030,7 @@ def show_main_app():
             {'name': 'email', 'label': 'Email', 'field': 'email', 'align': 'left'},
             {'name': 'name', 'label': 'Name', 'field': 'name', 'align': 'left'},
             {'name': 'role', 'label': 'Role', 'field': 'role', 'align': 'left'},
+            {'name': 'tenant', 'label': 'Tenant', 'field': 'tenant', 'align': 'left'},
             {'name': 'actions', 'label': 'Actions', 'field': 'id', 'align': 'center'},
         ]
         
@@ -999,6 +1089,273 @@ def show_main_app():
 
         user_table.on('set_role', change_user_role)
 
+        # Cross-tenant overview (only for admins of the main database)
+        if not current_user.get('tenant'):
+            with ui.expansion('Tenants', icon='domain').classes('w-full mt-4'):
+                tenant_columns = [
+                    {'name': 'tenant', 'label': 'Tenant', 'field': 'tenant', 'align': 'left'},
+                    {'name': 'use_cases', 'label': 'Use Cases', 'field': 'use_cases', 'align': 'left'},
+                    {'name': 'companies', 'label': 'Companies', 'field': 'companies', 'align': 'left'},
+                    {'name': 'persons', 'label': 'Persons', 'field': 'persons', 'align': 'left'},
+                    {'name': 'by_status', 'label': 'By Status', 'field': 'by_status', 'align': 'left'},
+                ]
+                tenant_table = ui.table(columns=tenant_columns, rows=[], row_key='tenant').classes('w-full')
+
+                def refresh_tenant_overview():
+                    try:
+                        overview = service.get_tenant_overview(current_user=current_user)
+                        tenant_table.rows = [{
+                            **entry,
+                            'tenant': entry['tenant'] or '(main)',
+                            'by_status': ', '.join(f'{k}: {v}' for k, v in sorted(entry['by_status'].items()))
+                        } for entry in overview]
+                        tenant_table.update()
+                    except Exception as error:
+                        ui.notify(f'Error loading tenants: {error}', type='negative')
+
+                refresh_tenant_overview()
+                ui.button('Refresh', on_click=refresh_tenant_overview, icon='refresh').props('flat dense')
+
+    # === DATABASE MAINTENANCE (Admin only) ===
+    if check_permission(current_user, 'maintenance'):
+        # covers all databases: only for admins of the main database
+        if not current_user.get('tenant'):
+            with ui.expansion('Database Maintenance', icon='build').classes('w-full mt-4'):
+                maintenance_info = ui.label('').classes('text-sm text-gray-600')
+
+                maintenance_columns = [
+                    {'name': 'started', 'label': 'Started', 'field': 'started', 'align': 'left'},
+                    {'name': 'reason', 'label': 'Reason', 'field': 'reason', 'align': 'left'},
+                    {'name': 'duration_ms', 'label': 'Duration (ms)', 'field': 'duration_ms', 'align': 'left'},
+                    {'name': 'effect', 'label': 'Effect', 'field': 'effect', 'align': 'left'},
+                    {'name': 'error', 'label': 'Error', 'field': 'error', 'align': 'left'},
+                ]
+                maintenance_table = ui.table(columns=maintenance_columns, rows=[], row_key='started').classes('w-full')
+                backup_info = ui.label('No backup yet').classes('text-sm text-gray-600')
+
+                def refresh_maintenance_status():
+                    status = maintenance_scheduler.get_status(current_user=current_user)
+                    pending = sum(status['pending_writes'].values())
+                    maintenance_info.text = (
+                        f"Scheduler {'running' if status['running'] else 'stopped'} · "
+                        f"next scheduled run in {status['seconds_until_next_run'] // 60} min · "
+                        f"{pending} rows written since last run (threshold {status['write_threshold']})"
+                    )
+                    maintenance_table.rows = [{
+                        **run,
+                        'effect': '; '.join(
+                            f"{db['database']}: {db['size_before_kb']} → {db['size_after_kb']} KB, "
+                            f"free pages {db['free_pages_before']} → {db['free_pages_after']}"
+                            for db in run['databases']
+                        )
+                    } for run in status['history']]
+                    maintenance_table.update()
+
+                    backups = status['backup_history']
+                    if backups:
+                        last = backups[0]
+                        ok = [r for r in last['results'] if 'error' not in r]
+                        throughput = sum(r['bytes'] for r in ok) / max(sum(r['duration_s'] for r in ok), 1e-6) / 1024
+                        backup_info.text = (
+                            f"Last backup {last['started']} ({last['reason']}): {len(ok)}/{len(last['results'])} database(s), "
+                            f"{throughput:.0f} KB/s"
+                        )
+
+                async def run_maintenance_now():
+                    import asyncio
+                    ui.notify('Running database maintenance...', type='info')
+                    record = await asyncio.to_thread(maintenance_scheduler.run_once, 'manual', current_user)
+                    ui.notify(f"Maintenance finished in {record['duration_ms']} ms", type='positive')
+                    refresh_maintenance_status()
+
+                async def run_backup_now():
+                    import asyncio
+                    ui.notify('Creating backup...', type='info')
+                    record = await asyncio.to_thread(maintenance_scheduler.run_backup, 'manual', current_user)
+                    failed = [r for r in record['results'] if 'error' in r]
+                    if failed:
+                        ui.notify(f"Backup failed for {len(failed)} database(s): {failed[0]['error']}", type='negative')
+                    else:
+                        ui.notify(f"Backup of {len(record['results'])} database(s) finished in {record['duration_ms']} ms", type='positive')
+                    refresh_maintenance_status()
+
+                refresh_maintenance_status()
+                with ui.row().classes('gap-2'):
+                    ui.button('Run now', on_click=run_maintenance_now, icon='play_arrow').props('dense')
+                    ui.button('Backup now', on_click=run_backup_now, icon='backup').props('dense outline')
+                    ui.button('Refresh', on_click=refresh_maintenance_status, icon='refresh').props('flat dense')
+
+        # === AGENT METRICS ===
+        # metrics and traces of every tenant (users, messages, tool arguments, SQL): main database admins only
+        if not current_user.get('tenant'):
+            with ui.expansion('Agent Metrics', icon='insights').classes('w-full mt-4'):
+                cache_info = ui.label('').classes('text-sm text-gray-600')
+                fast_path_info = ui.label('').classes('text-sm text-gray-600')
+                tool_info = ui.label('').classes('text-sm text-gray-600')
+                argument_info = ui.label('').classes('text-sm text-gray-600')
+                token_info = ui.label('').classes('text-sm text-gray-600')
+                connection_info = ui.label('').classes('text-sm text-gray-600')
+                reference_info = ui.label('').classes('text-sm text-gray-600')
+                routing_info = ui.label('').classes('text-sm text-gray-600')
+                hedging_info = ui.label('').classes('text-sm text-gray-600')
+
+                def refresh_agent_metrics():
+                    from agent.intent_router import intent_router
+                    from agent.hedging import hedger
+                    from agent.llm_client import connection_stats
+                    from agent.model_router import model_router
+                    from agent.reference_data import reference_data
+                    from agent.response_cache import response_cache
+                    from agent.tool_selector import tool_selector
+                    from agent.tool_validation import argument_validator
+                    from agent.usage import usage_tracker
+
+                    cache = response_cache.stats()
+                    cache_info.text = (
+                        f"Response cache {'on' if cache['enabled'] else 'off'}: {cache['hits']} hits, "
+                        f"{cache['coalesced']} coalesced, {cache['misses']} misses "
+                        f"(hit ratio {cache['hit_ratio']:.0%}), {cache['entries']} entries, "
+                        f"{cache['stale']} invalidated by writes/expiry"
+                    )
+                    fast_path = intent_router.stats()
+                    fast_path_info.text = (
+                        f"Fast path {'on' if fast_path['enabled'] else 'off'}: {fast_path['hits']} of {fast_path['requests']} "
+                        f"messages answered without LLM (hit rate {fast_path['hit_rate']:.0%})"
+                        + (' · ' + ', '.join(f'{k}: {v}' for k, v in fast_path['by_intent'].items()) if fast_path['by_intent'] else '')
+                    )
+                    selection = tool_selector.stats()
+                    tool_info.text = (
+                        f"Tool selection {'on' if selection['enabled'] else 'off'}"
+                        f"{' (minified schemas)' if selection['minified'] else ''}: "
+                        f"{selection['avg_tools']} tools per LLM call on average, "
+                        f"~{selection['tokens_saved']} tool schema tokens saved ({selection['saved_ratio']:.0%})"
+                    )
+                    arguments = argument_validator.stats()
+                    argument_info.text = (
+                        f"Tool arguments: {arguments['calls']} calls checked, {arguments['coerced']} with coerced values, "
+                        f"{arguments['stripped']} with unknown keys dropped, {arguments['rejected']} rejected before the database"
+                    )
+                    tokens = usage_tracker.totals()
+                    token_info.text = (
+                        f"LLM calls: {tokens['calls']} · input tokens {tokens['prompt_tokens']} "
+                        f"({tokens['cached_tokens']} cached, {tokens['uncached_tokens']} uncached) · "
+                        f"output tokens {tokens['completion_tokens']}"
+                        + ''.join(f" · {model}: {totals['calls']} calls, ${totals['cost_usd']:.4f}"
+                                  for model, totals in usage_tracker.by_model().items())
+                    )
+                    connections = connection_stats.stats()
+                    connection_info.text = (
+                        f"HTTP {'2' if connections['http2'] else '1.1'}: {connections['requests']} requests on "
+                        f"{connections['new_connections']} connections ({connections['reuse_ratio']:.0%} reused, "
+                        f"{connections['tls_handshakes']} TLS handshakes) · {connections['retries']} retries"
+                        + (' (' + ', '.join(f'{k}: {v}' for k, v in connections['retries_by_reason'].items()) + ')'
+                           if connections['retries_by_reason'] else '')
+                    )
+                    reference = reference_data.stats()
+                    reference_info.text = (
+                        f"Reference data {'on' if reference['enabled'] else 'off'}: id map sent with {reference['sent']} of "
+                        f"{reference['requests']} requests (~{reference['avg_tokens']} tokens, budget {reference['token_budget']}, "
+                        f"{reference['with_persons']} of {reference['builds']} builds with persons, "
+                        f"{reference['over_budget']} over budget)"
+                    )
+                    routing = model_router.stats()
+                    routing_info.text = (
+                        f"Model routing {'on' if routing['enabled'] else 'off'}: "
+                        + ', '.join(f'{model}: {calls}' for model, calls in routing['by_model'].items())
+                        + f" · {routing['escalations']} escalations to the large model"
+                        + (' (' + ', '.join(f'{k}: {v}' for k, v in routing['escalations_by_reason'].items()) + ')'
+                           if routing['escalations_by_reason'] else '')
+                    )
+                    hedging = hedger.stats()
+                    open_models = [model for model, state in hedging['breaker']['models'].items() if state != 'closed']
+                    hedging_info.text = (
+                        f"Hedging {'on' if hedging['enabled'] else 'off'}: {hedging['hedged']} of {hedging['calls']} LLM calls "
+                        f"hedged ({hedging['hedge_rate']:.0%}, hedge faster {hedging['hedge_wins']}x), "
+                        f"{hedging['fallbacks']} fallbacks to another model · circuit breaker opened "
+                        f"{hedging['breaker']['opened']}x, {hedging['breaker']['skipped']} calls skipped"
+                        + (f" (open: {', '.join(open_models)})" if open_models else '')
+                    )
+
+                refresh_agent_metrics()
+                ui.button('Refresh', on_click=refresh_agent_metrics, icon='refresh').props('flat dense')
+
+            with ui.expansion('Request Traces', icon='timeline').classes('w-full mt-4'):
+                ui.label('Recent agent requests - click one to see its timeline').classes('text-sm text-gray-600')
+                trace_columns = [
+                    {'name': 'started', 'label': 'Started', 'field': 'started', 'align': 'left'},
+                    {'name': 'name', 'label': 'Request', 'field': 'name', 'align': 'left'},
+                    {'name': 'trace_id', 'label': 'Correlation ID', 'field': 'trace_id', 'align': 'left'},
+                    {'name': 'duration_ms', 'label': 'Total (ms)', 'field': 'duration_ms', 'align': 'left'},
+                    {'name': 'llm', 'label': 'LLM', 'field': 'llm', 'align': 'left'},
+                    {'name': 'tool', 'label': 'Tools', 'field': 'tool', 'align': 'left'},
+                    {'name': 'sql', 'label': 'SQL', 'field': 'sql', 'align': 'left'},
+                    {'name': 'error', 'label': 'Error', 'field': 'error', 'align': 'left'},
+                ]
+                trace_table = ui.table(columns=trace_columns, rows=[], row_key='trace_id').classes('w-full cursor-pointer')
+                timeline = ui.column().classes('w-full gap-1 mt-2')
+
+                span_colors = {'request': 'bg-gray-400', 'agent': 'bg-gray-500', 'llm': 'bg-blue-500',
+                               'tool': 'bg-green-500', 'sql': 'bg-orange-400'}
+
+                def refresh_traces():
+                    import time
+                    from agent.tracing import tracer
+
+                    def kind_total(trace, kind):
+                        totals = trace['by_kind'].get(kind)
+                        return f"{totals['count']}× · {totals['duration_ms']:.0f} ms" if totals else '-'
+
+                    trace_table.rows = [{
+                        'started': time.strftime('%H:%M:%S', time.localtime(trace['started_at'])),
+                        'name': trace['name'],
+                        'trace_id': trace['trace_id'],
+                        'duration_ms': round(trace['duration_ms']),
+                        'llm': kind_total(trace, 'llm'),
+                        'tool': kind_total(trace, 'tool'),
+                        'sql': kind_total(trace, 'sql'),
+                        'error': trace['error'] or ''
+                    } for trace in tracer.recent()]
+                    trace_table.update()
+
+                def show_trace(trace_id):
+                    from agent.tracing import tracer
+
+                    timeline.clear()
+                    trace = tracer.get(trace_id)
+                    if trace is None:
+                        return
+                    total = trace['duration_ms'] or 1
+                    depth = {}  # span id -> nesting level (parents start before their children)
+                    with timeline:
+                        ui.label(f"{trace['name']} {trace_id}: {trace['duration_ms']:.0f} ms").classes('text-sm font-medium')
+                        for span in trace['spans']:
+                            level = depth[span['span_id']] = depth.get(span['parent_id'], -1) + 1
+                            attrs = span['attrs']
+                            if span['kind'] == 'llm':
+                                details = (f"{attrs.get('prompt_tokens', '?')} in ({attrs.get('cached_tokens', 0)} cached), "
+                                           f"{attrs.get('completion_tokens', '?')} out")
+                            elif span['kind'] == 'sql':
+                                details = attrs.get('statement', '')
+                            else:
+                                details = ', '.join(f'{key}={value}' for key, value in attrs.items())
+                            if span.get('error'):
+                                details = f"{span['error']} · {details}"
+                            left = span['start_ms'] / total * 100
+                            width = max(span['duration_ms'] / total * 100, 0.3)
+                            with ui.row().classes('w-full items-center gap-2 no-wrap'):
+                                ui.label(f"{span['kind']}: {span['name']}").classes(
+                                    'text-xs w-56 shrink-0 truncate'
+                                ).style(f'padding-left: {level * 12}px').tooltip(details)
+                                with ui.element('div').classes('relative grow h-3 bg-gray-100 rounded'):
+                                    ui.element('div').classes(
+                                        f"absolute h-3 rounded {span_colors.get(span['kind'], 'bg-gray-400')}"
+                                    ).style(f'left: {left:.2f}%; width: {width:.2f}%')
+                                ui.label(f"{span['duration_ms']:.0f} ms").classes('text-xs w-20 text-right shrink-0')
+
+                trace_table.on('rowClick', lambda e: show_trace(e.args[1]['trace_id']))
+                refresh_traces()
+                ui.button('Refresh', on_click=refresh_traces, icon='refresh').props('flat dense')
+
 if __name__ in {"__main__", "__mp_main__"}:
     ui.run(
         title='UseCase Manager', 
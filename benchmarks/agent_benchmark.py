@@ -0,0 +1,444 @@
+"""
+Agent loop benchmark: scripted scenarios (queries, creates, the three workshop transcripts) against the local
+stub LLM (utils.llm_stub_server) on a fresh dummy database. No network, no API key, deterministic.
+
+Per scenario: LLM rounds, tool calls, prompt/completion tokens (stub estimate: characters / 4 of the request),
+estimated cost (agent.model_router prices), wall time, LLM time and local overhead (wall time minus LLM time:
+prompt building, tool selection, tool execution, SQL). Counts come from the request traces (agent.tracing).
+The report ends with calls, LLM time, tokens and cost per model (model routing: the stub answers the small model
+faster, see --small-latency).
+
+    python benchmarks/agent_benchmark.py                    compare with benchmarks/baselines/agent_benchmark.json
+    python benchmarks/agent_benchmark.py --update-baseline  write the current results as the new baseline
+    python benchmarks/agent_benchmark.py --latency 0.5 --repeat 5 --mode async
+    python benchmarks/agent_benchmark.py --plan             plan-and-execute mode (agent.planner), own baseline
+
+Exits with 1 if a scenario regressed beyond THRESHOLDS (more rounds or tool calls, more tokens, much more
+local overhead). Recorded real completions can be replayed with --cassette (see utils.llm_backend).
+
+The scripts encode assumptions about the model, they don't measure its behaviour: e.g. a lookup() round is dropped
+when the request carries the reference data map (agent.reference_data), so the saved round is scripted, not
+observed. test_reference_lookup.py checks it on recorded completions of the real model.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from utils.llm_stub_server import start_stub_server  # noqa: E402  (imports no agent module)
+
+BASELINE_DIR = os.path.join(REPO_ROOT, "benchmarks", "baselines")
+TRANSCRIPT_DIR = os.path.join(REPO_ROOT, "test_data", "transcripts")
+
+# allowed increase per metric: (relative, absolute) - a regression needs to exceed both
+THRESHOLDS = {
+    "rounds": (0.0, 0),
+    "tool_calls": (0.0, 0),
+    "prompt_tokens": (0.05, 50),
+    "completion_tokens": (0.05, 20),
+    "cost_usd": (0.05, 0.0005),
+    "overhead_ms": (0.5, 25.0)
+}
+
+# stored with the results and printed with the report (see module docstring)
+SCRIPTED_NOTE = ("rounds and tool calls follow the scripts: lookup rounds are dropped by the script when the "
+                 "reference data map is sent, so that saving is assumed, not measured (replay a recorded cassette "
+                 "to measure it)")
+
+# per-model split at the end of the report
+MODEL_COLUMNS = ["calls", "llm_ms", "prompt_tokens", "completion_tokens", "cost_usd"]
+
+ADMIN = {"id": 3, "email": "admin@example.com", "role": "admin", "name": "Admin User", "tenant": None}
+
+
+def call(tool, **arguments):
+    """Scripted tool call."""
+    return {"name": tool, "arguments": json.dumps(arguments)}
+
+
+def lookup(*calls):
+    """
+    Scripted id lookup round - dropped by the script when the request carries the reference data map
+    (agent.reference_data). Assumes the model needs no lookup then; the benchmark can't verify that.
+    """
+    return {"tool_calls": list(calls), "lookup": True}
+
+
+def step(step_id, tool, **arguments):
+    """Scripted plan step."""
+    return {"id": step_id, "tool": tool, "arguments": arguments}
+
+
+def submit_plan(steps, answer=None):
+    """Scripted planning answer (plan mode)."""
+    return {"tool_calls": [call("submit_plan", steps=steps, **({"answer": answer} if answer else {}))]}
+
+
+def created_id(messages):
+    """Id returned by the last tool call (e.g. the new use case of create_use_case)."""
+    return json.loads(messages[-1]["content"])["id"]
+
+
+# user message -> LLM answers per round (dict, or function of the request messages)
+SCRIPTS = {
+    "Which use cases do we have in the Energy sector?": [
+        lookup(call("get_all_industries")),
+        {"tool_calls": [call("filter_use_cases", industry_id=1)]},
+        {"content": "There are 3 use cases in the Energy sector: Smart Grid Optimization, Predictive Maintenance "
+                    "for Wind Turbines and Energy Trading Forecasts."}
+    ],
+    "Tell me about use case 2 and who worked on it": [
+        {"tool_calls": [call("get_use_case_by_id", use_case_id=2), call("get_persons_by_use_case", use_case_id=2)]},
+        {"content": "Use case 2 is about predictive maintenance; Lisa Müller and Thomas Klein contributed."}
+    ],
+    "Which use cases did Anna Schmidt work on?": [
+        lookup(call("resolve_entity", entity_type="person", name="Anna Schmidt")),
+        {"tool_calls": [call("filter_use_cases", person_id=1)]},
+        {"content": "Anna Schmidt worked on Smart Grid Optimization with AI."}
+    ],
+    "Please move the smart grid use case to completed": [
+        {"tool_calls": [call("get_all_use_cases", fields=["id", "title"])]},
+        {"tool_calls": [call("update_use_case_status", use_case_id=1, status="completed")]},
+        {"content": "Done - 'Smart Grid Optimization with AI' is now completed."}
+    ],
+    "Create a use case 'Turbine Vibration Analysis' for Siemens Energy, detecting bearing damage early": [
+        lookup(call("resolve_entity", entity_type="company", name="Siemens Energy")),
+        {"tool_calls": [call("create_use_case", title="Turbine Vibration Analysis", company_id=1, industry_id=1,
+                             description="Detect bearing damage early from vibration data")]},
+        {"content": "Created the use case 'Turbine Vibration Analysis' for Siemens Energy."}
+    ],
+    "Add the company Vattenfall in the Energy industry": [
+        lookup(call("get_all_industries")),
+        {"tool_calls": [call("create_company", name="Vattenfall", industry_id=1)]},
+        {"content": "Vattenfall was added to the Energy industry."}
+    ],
+    "Please mark use case number 999 as approved": [
+        {"tool_calls": [call("update_use_case_status", use_case_id=999, status="approved")]},
+        {"content": "There is no use case with ID 999, so nothing was changed."}
+    ],
+    "Thanks, that's all for now": [
+        {"content": "You're welcome!"}
+    ]
+}
+
+# transcript file -> (company, company id, industry id, person, person id, extracted use case titles)
+TRANSCRIPTS = {
+    "energy_workshop_transcript.txt": ("E.ON", 2, 1, "Lisa Müller", 3,
+                                       ["Load Forecasting for Distribution Grids", "Customer Churn Prediction"]),
+    "manufacturing_workshop_transcript.txt": ("Trumpf", 6, 2, "Laura Meyer", 9,
+                                              ["Laser Cutting Parameter Optimization", "Visual Quality Inspection"]),
+    "healthcare_workshop_transcript.txt": ("Helios Kliniken", 8, 3, "Dr. Stefan Richter", 12,
+                                           ["Patient Flow Optimization", "Discharge Letter Drafting"])
+}
+
+
+def _transcript_prompt(company, person, title):
+    return f"Create a use case '{title}' for {company}. Contributor: {person}."
+
+
+# user message -> planning answer in plan mode (the answer call, if any, gets the last entry of SCRIPTS)
+PLANS = {
+    "Which use cases do we have in the Energy sector?": submit_plan([
+        step("industries", "get_all_industries"),
+        step("use_cases", "filter_use_cases", industry_id=1)
+    ]),
+    "Tell me about use case 2 and who worked on it": submit_plan([
+        step("use_case", "get_use_case_by_id", use_case_id=2),
+        step("persons", "get_persons_by_use_case", use_case_id=2)
+    ]),
+    "Which use cases did Anna Schmidt work on?": submit_plan([
+        step("anna", "resolve_entity", entity_type="person", name="Anna Schmidt"),
+        step("use_cases", "filter_use_cases", person_id="$anna.best_match.id")
+    ]),
+    "Please move the smart grid use case to completed": submit_plan([
+        step("use_cases", "get_all_use_cases", fields=["id", "title"]),
+        step("update", "update_use_case_status", use_case_id="$use_cases.items.0.id", status="completed")
+    ], answer="Done - '$update.title' is now $update.status."),
+    "Create a use case 'Turbine Vibration Analysis' for Siemens Energy, detecting bearing damage early": submit_plan([
+        step("company", "resolve_entity", entity_type="company", name="Siemens Energy"),
+        step("use_case", "create_use_case", title="Turbine Vibration Analysis", company_id="$company.best_match.id",
+             industry_id=1, description="Detect bearing damage early from vibration data")
+    ], answer="Created the use case '$use_case.title' (ID $use_case.id) for Siemens Energy."),
+    "Add the company Vattenfall in the Energy industry": submit_plan([
+        step("industries", "get_all_industries"),
+        step("company", "create_company", name="Vattenfall", industry_id="$industries.0.id")
+    ], answer="Vattenfall (ID $company.id) was added to the Energy industry."),
+    "Please mark use case number 999 as approved": submit_plan([
+        step("status", "update_use_case_status", use_case_id=999, status="approved")
+    ], answer="Use case 999 is now approved."),
+    "Thanks, that's all for now": submit_plan([], answer="You're welcome!")
+}
+
+for _company, _company_id, _industry_id, _person, _person_id, _titles in TRANSCRIPTS.values():
+    for _title in _titles:
+        SCRIPTS[_transcript_prompt(_company, _person, _title)] = [
+            lookup(call("resolve_entity", entity_type="company", name=_company),
+                   call("resolve_entity", entity_type="person", name=_person)),
+            {"tool_calls": [call("create_use_case", title=_title, company_id=_company_id, industry_id=_industry_id)]},
+            lambda messages, person_id=_person_id: {
+                "tool_calls": [call("add_persons_to_use_case", use_case_id=created_id(messages), person_ids=[person_id])]
+            },
+            {"content": f"Created '{_title}' for {_company} and linked {_person}."}
+        ]
+        PLANS[_transcript_prompt(_company, _person, _title)] = submit_plan([
+            step("company", "resolve_entity", entity_type="company", name=_company),
+            step("person", "resolve_entity", entity_type="person", name=_person),
+            step("use_case", "create_use_case", title=_title, company_id="$company.best_match.id",
+                 industry_id=_industry_id),
+            step("link", "add_persons_to_use_case", use_case_id="$use_case.id", person_ids=["$person.best_match.id"])
+        ], answer=f"Created '$use_case.title' (ID $use_case.id) for {_company} and linked {_person}.")
+
+SCENARIOS = [
+    ("query: industry filter", "agent", "Which use cases do we have in the Energy sector?"),
+    ("query: details + people", "agent", "Tell me about use case 2 and who worked on it"),
+    ("query: by person", "agent", "Which use cases did Anna Schmidt work on?"),
+    ("query: fast path", "agent", "show use case 3"),
+    ("small talk", "agent", "Thanks, that's all for now"),
+    ("update: status", "agent", "Please move the smart grid use case to completed"),
+    ("update: tool error", "agent", "Please mark use case number 999 as approved"),
+    ("create: use case", "agent", "Create a use case 'Turbine Vibration Analysis' for Siemens Energy, detecting bearing damage early"),
+    ("create: company", "agent", "Add the company Vattenfall in the Energy industry"),
+] + [(f"transcript: {name.split('_')[0]}", "transcript", name) for name in TRANSCRIPTS]
+
+
+def scripted_responder(body):
+    """Stub LLM: extraction requests get the scripted prompts, agent requests the next step of their script."""
+    messages = body.get("messages", [])
+    user_indexes = [i for i, m in enumerate(messages) if m.get("role") == "user"]
+    if not user_indexes:
+        return {"content": "No question."}
+    user_message = messages[user_indexes[-1]]["content"]
+
+    if user_message.startswith("Extract use case prompts from this transcript"):
+        for name, (company, _, _, person, _, titles) in TRANSCRIPTS.items():
+            with open(os.path.join(TRANSCRIPT_DIR, name), encoding="utf-8") as file:
+                if file.read()[:200] in user_message:
+                    return {"content": json.dumps([_transcript_prompt(company, person, title) for title in titles])}
+        return {"content": "[]"}
+
+    if body.get("tool_choice", {}).get("function", {}).get("name") == "submit_plan":
+        if messages[-1].get("role") == "tool" and user_message in SCRIPTS:
+            return submit_plan([], answer=SCRIPTS[user_message][-1]["content"])  # replan after a failed step
+        return PLANS.get(user_message, submit_plan([], answer=f"(no plan for: {user_message[:80]})"))
+
+    script = SCRIPTS.get(user_message)
+    if script is None:
+        return {"content": f"(no script for: {user_message[:80]})"}
+    if any(m.get("role") == "system" and str(m.get("content")).startswith("REFERENCE DATA") for m in messages):
+        script = [answer for answer in script if not (isinstance(answer, dict) and answer.get("lookup"))]
+    step = sum(1 for m in messages[user_indexes[-1]:] if m.get("role") == "assistant")
+    answer = script[min(step, len(script) - 1)]
+    if not body.get("tools") and (callable(answer) or "tool_calls" in answer):
+        answer = script[-1]  # forced final answer without tools
+    return answer(messages) if callable(answer) else {key: value for key, value in answer.items() if key != "lookup"}
+
+
+def _reset_database():
+    """Fresh dummy database in the current (temporary) directory."""
+    from models.base import engine
+    import init_dummy_database
+
+    engine.dispose()
+    init_dummy_database.delete_existing_db()
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_dummy_database.create_comprehensive_data()
+
+
+def _run_scenario(kind, payload, mode, plan=False):
+    import asyncio
+    from agent import run_agent, run_agent_async
+    from extraction.transcript_processor import extract_prompts_from_transcript
+
+    if kind == "agent":
+        if mode == "async":
+            asyncio.run(run_agent_async(payload, use_cache=False, plan=plan))
+        else:
+            run_agent(payload, use_cache=False, plan=plan)
+        return
+
+    with open(os.path.join(TRANSCRIPT_DIR, payload), encoding="utf-8") as file:
+        prompts = extract_prompts_from_transcript(file.read(), verbose=False)
+    for prompt in prompts:
+        if mode == "async":
+            asyncio.run(run_agent_async(prompt, use_cache=False, plan=plan))
+        else:
+            run_agent(prompt, use_cache=False, plan=plan)
+
+
+def measure(kind, payload, mode, plan=False):
+    """Run one scenario inside a trace and derive its metrics from the spans."""
+    from agent.tracing import tracer
+
+    start = time.perf_counter()
+    with tracer.trace("benchmark") as root:
+        _run_scenario(kind, payload, mode, plan)
+        trace_id = tracer.current_trace_id()
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    spans = tracer.get(trace_id)["spans"]
+    llm = [span for span in spans if span["kind"] == "llm"]
+    llm_ms = sum(span["duration_ms"] for span in llm)
+    by_model = {}
+    for span in llm:
+        model = by_model.setdefault(span["attrs"].get("model", "?"), dict.fromkeys(MODEL_COLUMNS, 0))
+        model["calls"] += 1
+        model["llm_ms"] += span["duration_ms"]
+        model["prompt_tokens"] += span["attrs"].get("prompt_tokens", 0)
+        model["completion_tokens"] += span["attrs"].get("completion_tokens", 0)
+        model["cost_usd"] += span["attrs"].get("cost_usd", 0.0)
+    return {
+        "rounds": len(llm),
+        "tool_calls": sum(1 for span in spans if span["kind"] == "tool"),
+        "sql_statements": sum(1 for span in spans if span["kind"] == "sql"),
+        "prompt_tokens": sum(span["attrs"].get("prompt_tokens", 0) for span in llm),
+        "completion_tokens": sum(span["attrs"].get("completion_tokens", 0) for span in llm),
+        "cost_usd": round(sum(span["attrs"].get("cost_usd", 0.0) for span in llm), 6),
+        "wall_ms": round(wall_ms, 1),
+        "llm_ms": round(llm_ms, 1),
+        "overhead_ms": round(wall_ms - llm_ms, 1),
+        "by_model": {name: {**model, "llm_ms": round(model["llm_ms"], 1), "cost_usd": round(model["cost_usd"], 6)}
+                     for name, model in by_model.items()}
+    }
+
+
+def run(latency, token_latency, repeat, mode, plan=False):
+    """Run all scenarios repeat times (fresh database each time); counts of the first run, median timings."""
+    from agent.tool_executor import set_current_user
+
+    set_current_user(ADMIN)
+    runs = {name: [] for name, _, _ in SCENARIOS}
+    for _ in range(repeat):
+        _reset_database()
+        for name, kind, payload in SCENARIOS:
+            runs[name].append(measure(kind, payload, mode, plan))
+
+    results = {}
+    for name, measured in runs.items():
+        result = dict(measured[0])
+        for key in ("wall_ms", "llm_ms", "overhead_ms"):
+            result[key] = round(statistics.median(m[key] for m in measured), 1)
+        result["by_model"] = {
+            model: {**split, "llm_ms": round(statistics.median(
+                m["by_model"].get(model, {}).get("llm_ms", 0.0) for m in measured), 1)}
+            for model, split in result["by_model"].items()
+        }
+        results[name] = result
+    return {"latency": latency, "token_latency": token_latency, "mode": mode, "plan": plan, "repeat": repeat,
+            "note": SCRIPTED_NOTE, "scenarios": results}
+
+
+def compare(results, baseline):
+    """Regressions of results vs. baseline (list of messages)."""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            continue
+        for metric, (relative, absolute) in THRESHOLDS.items():
+            if metric not in previous:
+                continue  # baseline from before the metric existed
+            allowed = previous[metric] + max(previous[metric] * relative, absolute)
+            if current[metric] > allowed:
+                regressions.append(f"{name}: {metric} {previous[metric]} -> {current[metric]} (allowed {allowed:g})")
+    return regressions
+
+
+def print_report(results, baseline=None):
+    columns = ["rounds", "tool_calls", "prompt_tokens", "completion_tokens", "cost_usd", "wall_ms", "llm_ms",
+               "overhead_ms"]
+    print(f"stub latency {results['latency']} s (small model {results.get('small_latency', results['latency'])} s, "
+          f"+{results['token_latency']} s per chunk), mode {results['mode']}"
+          f"{' (plan-and-execute)' if results.get('plan') else ''}, median of {results['repeat']} run(s)")
+    print(f"note: {results.get('note', SCRIPTED_NOTE)}\n")
+    print(f"{'scenario':<28} {'rounds':>6} {'tools':>6} {'prompt':>8} {'compl.':>7} {'wall ms':>9} {'llm ms':>9} "
+          f"{'local ms':>9} {'Δ local':>8}")
+    totals = dict.fromkeys(columns, 0)
+    for name, result in results["scenarios"].items():
+        for column in columns:
+            totals[column] += result[column]
+        previous = (baseline or {}).get("scenarios", {}).get(name)
+        delta = f"{result['overhead_ms'] - previous['overhead_ms']:+.0f}" if previous else ""
+        print(f"{name:<28} {result['rounds']:>6} {result['tool_calls']:>6} {result['prompt_tokens']:>8} "
+              f"{result['completion_tokens']:>7} {result['wall_ms']:>9.0f} {result['llm_ms']:>9.0f} "
+              f"{result['overhead_ms']:>9.0f} {delta:>8}")
+    print(f"\n{'total':<28} {totals['rounds']:>6} {totals['tool_calls']:>6} {totals['prompt_tokens']:>8} "
+          f"{totals['completion_tokens']:>7} {totals['wall_ms']:>9.0f} {totals['llm_ms']:>9.0f} "
+          f"{totals['overhead_ms']:>9.0f}")
+
+    models = {}
+    for result in results["scenarios"].values():
+        for model, split in result.get("by_model", {}).items():
+            for column in MODEL_COLUMNS:
+                models.setdefault(model, dict.fromkeys(MODEL_COLUMNS, 0))[column] += split[column]
+    previous_cost = sum(result.get("cost_usd", 0.0) for result in (baseline or {}).get("scenarios", {}).values())
+    print(f"\n{'model':<36} {'calls':>6} {'llm ms':>9} {'prompt':>8} {'compl.':>7} {'cost $':>9}")
+    for model, split in models.items():
+        print(f"{model:<36} {split['calls']:>6} {split['llm_ms']:>9.0f} {split['prompt_tokens']:>8} "
+              f"{split['completion_tokens']:>7} {split['cost_usd']:>9.4f}")
+    print(f"estimated cost ${totals['cost_usd']:.4f}" + (f" (baseline ${previous_cost:.4f})" if previous_cost else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent loop benchmark against the stub LLM")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub seconds before every response")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="stub seconds between streamed chunks")
+    parser.add_argument("--small-latency", type=float, help="stub seconds before responses of the small model "
+                                                            "(default: 40%% of --latency)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario (median timings)")
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync", help="run_agent or run_agent_async")
+    parser.add_argument("--plan", action="store_true", help="plan-and-execute mode (agent.planner)")
+    parser.add_argument("--cassette", help="replay recorded completions first (see utils.llm_backend)")
+    parser.add_argument("--baseline", help="baseline file (default: benchmarks/baselines/agent_benchmark[_plan].json)")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args()
+    args.baseline = args.baseline or os.path.join(BASELINE_DIR, f"agent_benchmark{'_plan' if args.plan else ''}.json")
+
+    # stub LLM, scratch database and no trace file - before any agent module is imported
+    server = start_stub_server(cassette_path=args.cassette, responder=scripted_responder,
+                               latency=args.latency, token_latency=args.token_latency)
+    os.environ.update({"OPENROUTER_BASE_URL": server.base_url, "OPENROUTER_API_KEY": "benchmark",
+                       "LLM_BACKEND": "live", "AGENT_TRACE_FILE": ""})
+    os.chdir(tempfile.mkdtemp(prefix="agent-benchmark-"))
+
+    from agent.model_router import model_router
+    small_latency = args.small_latency if args.small_latency is not None else args.latency * 0.4
+    server.model_latency = {model_router.models["small"]: small_latency}
+
+    results = run(args.latency, args.token_latency, args.repeat, args.mode, args.plan)
+    results["small_latency"] = small_latency
+    server.shutdown()
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+    print_report(results, baseline)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nbaseline written: {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print("\nno baseline yet - run with --update-baseline")
+        return 0
+    regressions = compare(results, baseline)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"\n{len(regressions)} regression(s) vs. baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
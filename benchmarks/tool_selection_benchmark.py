@@ -0,0 +1,54 @@
+"""
+Prompt tokens of the tool schema per request: all tools vs. selected subset vs. selected subset minified.
+Token counts are estimates (characters / 4, see agent.history.estimate_tokens); no LLM calls are made.
+
+    python benchmarks/tool_selection_benchmark.py
+"""
+
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")  # client is created on import, never called
+
+from agent.tool_selector import ToolSelector, schema_tokens  # noqa: E402
+
+SCENARIOS = [
+    ("list all", "Show me all use cases"),
+    ("filter by industry", "Show me all Energy use cases"),
+    ("filter by person", "Which use cases did Anna Schmidt work on?"),
+    ("details", "What is use case 5 about?"),
+    ("status change", "Setze Use Case 3 auf genehmigt"),
+    ("create use case", "Create a use case 'Smart Factory' for Siemens Energy, contributed by Thomas Klein"),
+    ("create company", "Lege die Firma Volkswagen in der Branche Automotive an"),
+    ("contributors", "Who worked on use case 2?"),
+    ("delete", "Delete use case 7"),
+    ("small talk", "Thanks, that's all for now"),
+]
+
+
+def run():
+    """Print estimated tool schema tokens per scenario and the total savings."""
+    selector = ToolSelector(enabled=True)
+    full = schema_tokens(None, False)
+    totals = {"full": 0, "subset": 0, "minified": 0}
+
+    print(f"{'scenario':<20} {'tools':>5} {'full':>7} {'subset':>7} {'minified':>9}  saved")
+    for name, message in SCENARIOS:
+        names = selector.select([{"role": "user", "content": message}])
+        subset = schema_tokens(names, False)
+        minified = schema_tokens(names, True)
+        totals["full"] += full
+        totals["subset"] += subset
+        totals["minified"] += minified
+        count = len(names) if names else "all"
+        print(f"{name:<20} {count:>5} {full:>7} {subset:>7} {minified:>9}  {1 - minified / full:.0%}")
+
+    print(f"\n{'total':<20} {'':>5} {totals['full']:>7} {totals['subset']:>7} {totals['minified']:>9}")
+    print(f"subset saves {1 - totals['subset'] / totals['full']:.0%}, subset + minified saves {1 - totals['minified'] / totals['full']:.0%}")
+    print(f"all tools minified: {schema_tokens(None, True)} tokens")
+
+
+if __name__ == "__main__":
+    run()
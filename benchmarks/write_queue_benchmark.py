@@ -0,0 +1,97 @@
+"""
+Write throughput: independent sessions (current design) vs. single writer with group commit.
+
+Runs on a fresh temporary database (the real use_cases.db is not touched):
+    python benchmarks/write_queue_benchmark.py [--threads 8] [--writes 50]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# temporary working directory -> models.base creates use_cases.db there
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.chdir(tempfile.mkdtemp(prefix="write-queue-bench-"))
+
+from models.base import Base, engine, SessionLocal  # noqa: E402
+from models import Industry, Company  # noqa: E402
+from services import UseCaseService  # noqa: E402
+
+BENCH_USER = {"id": 0, "email": "bench@example.com", "role": "maintainer", "name": "Bench", "tenant": None}
+
+
+def setup_database():
+    """Create tables and one industry/company to write use cases for."""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        industry = Industry(name="Benchmark")
+        db.add(industry)
+        db.commit()
+        db.add(Company(name="Benchmark Corp", industry_id=industry.id))
+        db.commit()
+    finally:
+        db.close()
+
+
+def run(service: UseCaseService, threads: int, writes_per_thread: int) -> dict:
+    """
+    Concurrent create_use_case calls.
+
+    Returns:
+        dict : ops, errors, seconds, ops_per_sec, locked (number of 'database is locked' errors)
+    """
+    errors = []
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        for i in range(writes_per_thread):
+            try:
+                service.create_use_case(f"bench {worker_id}-{i}", 1, 1, current_user=BENCH_USER)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    seconds = time.perf_counter() - started
+
+    ops = threads * writes_per_thread
+    return {
+        "ops": ops,
+        "errors": len(errors),
+        "locked": sum("locked" in e for e in errors),
+        "seconds": round(seconds, 3),
+        "ops_per_sec": round((ops - len(errors)) / seconds, 1)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=50, help="writes per thread")
+    args = parser.parse_args()
+
+    setup_database()
+    print(f"Database: {os.path.abspath('use_cases.db')}")
+    print(f"{args.threads} threads x {args.writes} create_use_case calls\n")
+
+    direct = run(UseCaseService(single_writer=False), args.threads, args.writes)
+    print(f"independent sessions : {direct}")
+
+    service = UseCaseService(single_writer=True)
+    queued = run(service, args.threads, args.writes)
+    from services.write_queue import get_writer
+    print(f"single writer        : {queued}")
+    print(f"writer stats         : {get_writer(None).stats()}")
+
+    if direct["ops_per_sec"]:
+        print(f"\nspeedup: {queued['ops_per_sec'] / direct['ops_per_sec']:.2f}x")
@@ -6,20 +6,23 @@ Extracts use cases from workshop transcripts using two-step workflow:
 """
 
 import json
-import os
 from dotenv import load_dotenv
-from openai import OpenAI
 from agent import run_agent
+from agent.async_agent import llm_call_slot
+from agent.llm_client import get_async_client, get_client
+from agent.model_router import model_router
+from agent.tracing import tracer
+from agent.usage import usage_tracker
 from typing import List, Dict
 
 # Load environment
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY")
-)
+# Shared OpenAI client (same connection pool as the agent)
+client = get_client()
+
+# maximum seconds for the async extraction call
+EXTRACTION_TIMEOUT_SECONDS = 180
 
 extraction_prompt = """
 You are an expert at extracting use cases from workshop transcripts.
@@ -71,18 +74,59 @@ def extract_prompts_from_transcript(transcript_text: str, verbose: bool = True)
         print("="*60)
     
     # Call LLM with extraction prompt
-    response = client.chat.completions.create(
-        model="anthropic/claude-3.5-sonnet",
-        messages=[
+    request = _extraction_request(transcript_text)
+    with tracer.span("llm", "extraction", model=request["model"], transcript_chars=len(transcript_text)):
+        response = client.chat.completions.create(**request)
+        usage_tracker.record(getattr(response, "usage", None), "extraction", request["model"])
+    
+    return _parse_prompts(response.choices[0].message.content, verbose=verbose)
+
+
+async def extract_prompts_from_transcript_async(transcript_text: str, verbose: bool = False) -> List:
+    """
+    Async variant of extract_prompts_from_transcript (AsyncOpenAI, no worker thread needed).
+    
+    Args:
+        transcript_text (str): The full transcript text
+        verbose (bool): Whether to print progress
+        
+    Returns:
+        list: List of prompt strings for the agent
+    """
+    # counts against the agent's LLM concurrency limit, but gets more time (long transcripts)
+    request = _extraction_request(transcript_text)
+    with tracer.span("llm", "extraction", model=request["model"], transcript_chars=len(transcript_text)):
+        async with llm_call_slot(timeout=EXTRACTION_TIMEOUT_SECONDS):
+            response = await get_async_client().chat.completions.create(**request)
+        usage_tracker.record(getattr(response, "usage", None), "extraction", request["model"])
+
+    return _parse_prompts(response.choices[0].message.content, verbose=verbose)
+
+
+def _extraction_request(transcript_text: str) -> Dict:
+    """Arguments of the extraction LLM call (model of the extraction stage, see agent.model_router)."""
+    return {
+        "model": model_router.model("extraction"),
+        "messages": [
             {"role": "system", "content": extraction_prompt},
             {"role": "user", "content": f"Extract use case prompts from this transcript:\n\n{transcript_text}"}
         ],
-        max_tokens=3000,
-        temperature=0.3  # Lower temp for consistent extraction
-    )
-    
-    result = response.choices[0].message.content
+        "max_tokens": 3000,
+        "temperature": 0.3  # Lower temp for consistent extraction
+    }
+
+
+def _parse_prompts(result: str, verbose: bool = True) -> List:
+    """
+    Parse the JSON array of prompts returned by the extraction LLM call.
     
+    Args:
+        result (str): LLM response
+        verbose (bool): Whether to print progress
+        
+    Returns:
+        list: List of prompt strings ([] if the response is not valid JSON)
+    """
     if verbose:
         print("\nLLM Response:")
         print(result[:300] + "..." if len(result) > 300 else result)
@@ -1,22 +1,258 @@
-from sqlalchemy import create_engine
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # Create the base class for all models
 Base = declarative_base()
 
-# Database file 
+# Database file
 DATABASE_URL = "sqlite:///use_cases.db"
 
+# Tenant databases: one SQLite file per tenant in this folder
+TENANT_DB_DIR = os.getenv("USE_CASE_TENANT_DIR", "tenants")
+
+# Maximum number of tenant engines kept open at the same time (least recently used are closed)
+MAX_OPEN_TENANTS = int(os.getenv("USE_CASE_MAX_OPEN_TENANTS", "8"))
+
+# SQLite allows at most 10 attached databases per connection (compile time default)
+MAX_ATTACHED_DATABASES = 10
+
+# Tables that only live in the main database (not copied into tenant databases)
+GLOBAL_TABLES = {"users"}
+
 # Create engine (connection to database)
 engine = create_engine(DATABASE_URL, echo=False)
 
 # Create session factory (for database operations)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+@event.listens_for(Engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Databases release free pages via PRAGMA incremental_vacuum (see maintenance service).
+    Takes effect on a new, empty database file; existing files are converted by the first maintenance run (VACUUM).
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    cursor.close()
+
+
+# Change version of the data: increased by every write statement and every commit on any engine.
+# Caches of derived data (e.g. agent answers) compare it to detect writes.
+_data_version = 0
+_data_version_lock = threading.Lock()
+
+
+def _bump_data_version() -> None:
+    global _data_version
+    with _data_version_lock:
+        _data_version += 1
+
+
+def data_version() -> int:
+    """Current change version of the data (any database)."""
+    return _data_version
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _track_write_statements(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE"):
+        _bump_data_version()
+
+
+@event.listens_for(Engine, "commit")
+def _track_commits(conn):
+    # again on commit: a read that started between the write and its commit must not be cached under the new version
+    _bump_data_version()
+
+
+def tenant_database_path(tenant: str) -> str:
+    """
+    Path of the SQLite file of a tenant.
+
+    Args:
+        tenant (str): Tenant name (letters, digits, '_' and '-')
+
+    Returns:
+        str: Path to the tenant database file
+
+    Raises:
+        ValueError: If the tenant name is not valid
+    """
+    if not tenant or not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", tenant):
+        raise ValueError(f"Invalid tenant name '{tenant}'. Use letters, digits, '_' or '-' (max 64 characters).")
+    return os.path.join(TENANT_DB_DIR, f"{tenant}.db")
+
+
+def tenant_schema(position: int) -> str:
+    """
+    Schema name under which a tenant database is attached (see attach_tenants), by its position in the attached
+    tenants. Positional, because names derived from tenant names can collide: schema names are case-insensitive
+    and can't contain '-' ('a-b', 'a_b' and 'A_B' are different tenants).
+    """
+    return f"t{position}"
+
+
+class TenantEngineCache:
+    """
+    Lazily opened engines and session factories, one per tenant database.
+    Keeps at most max_open engines; the least recently used one is disposed when the limit is exceeded.
+    """
+
+    def __init__(self, max_open: int = MAX_OPEN_TENANTS):
+        self.max_open = max_open
+        self._entries = OrderedDict()  # tenant -> (engine, session factory)
+        self._lock = threading.Lock()
+
+    def get(self, tenant: str):
+        """
+        Get engine and session factory of a tenant, opening (and creating) the database if needed.
+
+        Args:
+            tenant (str): Tenant name
+
+        Returns:
+            tuple: (engine, sessionmaker)
+        """
+        with self._lock:
+            entry = self._entries.get(tenant)
+            if entry is not None:
+                self._entries.move_to_end(tenant)
+                return entry
+
+            path = tenant_database_path(tenant)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+            tenant_engine = create_engine(f"sqlite:///{path}", echo=False)
+            Base.metadata.create_all(
+                bind=tenant_engine,
+                tables=[t for t in Base.metadata.sorted_tables if t.name not in GLOBAL_TABLES]
+            )
+            entry = (tenant_engine, sessionmaker(autocommit=False, autoflush=False, bind=tenant_engine))
+            self._entries[tenant] = entry
+
+            # evict least recently used tenants
+            while len(self._entries) > self.max_open:
+                _, (old_engine, _) = self._entries.popitem(last=False)
+                old_engine.dispose()  # sessions still holding a connection keep it until they close
+
+            return entry
+
+    def open_tenants(self) -> List[str]:
+        """Tenants with a currently open engine (least recently used first)."""
+        with self._lock:
+            return list(self._entries.keys())
+
+    def dispose_all(self) -> None:
+        """Close all tenant engines."""
+        with self._lock:
+            for tenant_engine, _ in self._entries.values():
+                tenant_engine.dispose()
+            self._entries.clear()
+
+
+tenant_engines = TenantEngineCache()
+
+
+def get_engine(tenant: Optional[str] = None):
+    """
+    Engine of a tenant database, or the main database if no tenant is given.
+
+    Args:
+        tenant (Optional[str]): Tenant name, None for the main database
+
+    Returns:
+        Engine: SQLAlchemy engine
+    """
+    if tenant is None:
+        return engine
+    return tenant_engines.get(tenant)[0]
+
+
+def get_session(tenant: Optional[str] = None):
+    """
+    New session on a tenant database, or the main database if no tenant is given.
+
+    Args:
+        tenant (Optional[str]): Tenant name, None for the main database
+
+    Returns:
+        Session: SQLAlchemy database session
+    """
+    if tenant is None:
+        return SessionLocal()
+    return tenant_engines.get(tenant)[1]()
+
+
+def list_tenants() -> List[str]:
+    """
+    All tenants that have a database file.
+
+    Returns:
+        List[str]: Sorted tenant names
+    """
+    if not os.path.isdir(TENANT_DB_DIR):
+        return []
+    return sorted(name[:-3] for name in os.listdir(TENANT_DB_DIR) if name.endswith(".db"))
+
+
+@contextmanager
+def attach_tenants(tenants: List[str]):
+    """
+    Connection on the main database with tenant databases attached, for cross-tenant queries.
+    Each tenant is available under tenant_schema(its position in tenants), e.g. SELECT * FROM t0.use_cases.
+
+    Args:
+        tenants (List[str]): Tenants to attach (at most MAX_ATTACHED_DATABASES)
+
+    Yields:
+        Connection: SQLAlchemy connection with the tenants attached
+
+    Raises:
+        ValueError: If too many tenants are given or a tenant name is invalid
+    """
+    if len(tenants) > MAX_ATTACHED_DATABASES:
+        raise ValueError(f"At most {MAX_ATTACHED_DATABASES} tenants can be attached at once, got {len(tenants)}")
+
+    paths = {tenant: tenant_database_path(tenant) for tenant in tenants}  # validates names
+    with engine.connect() as connection:
+        attached = []
+        try:
+            for position, tenant in enumerate(tenants):
+                connection.execute(text(f"ATTACH DATABASE :path AS {tenant_schema(position)}"), {"path": paths[tenant]})
+                attached.append(position)
+            yield connection
+        finally:
+            # connections go back to the pool, so detach again
+            for position in attached:
+                connection.execute(text(f"DETACH DATABASE {tenant_schema(position)}"))
+
+
+def ensure_user_tenant_column() -> None:
+    """
+    Add the 'tenant' column to an existing users table created before tenants existed.
+    (No migration system, so this small upgrade is done in place.)
+    """
+    inspector = inspect(engine)
+    if "users" not in inspector.get_table_names():
+        return
+    if "tenant" not in {column["name"] for column in inspector.get_columns("users")}:
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE users ADD COLUMN tenant VARCHAR(64)"))
+
+
 def get_db():
     """
     Function to get database session.
-    
+
     Yields:
         Session: SQLAlchemy database session.
     """
@@ -24,4 +260,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -16,6 +16,8 @@ class User(Base):
         password_hash (str): Hashed password (never store plain passwords!)
         role (str): User role - 'reader', 'maintainer', or 'admin'
         name (str): Optional display name
+        tenant (str): Optional tenant (client organization) whose database the user works on,
+            None for the main database
     """
     __tablename__ = 'users'
 
@@ -24,6 +26,7 @@ class User(Base):
     password_hash = Column(String(255), nullable=False)
     role = Column(String(50), nullable=False)
     name = Column(String(100), nullable=True)
+    tenant = Column(String(64), nullable=True)
     
     def __repr__(self):
         return f"<User(id={self.id}, email='{self.email}', role='{self.role}')>"
\ No newline at end of file
@@ -0,0 +1,228 @@
+"""
+Online hot backups of the SQLite databases through the SQLite backup API.
+Pages are copied in small steps with a pause in between, so writers are only blocked for one step at a time.
+Snapshots are verified by reopening them and rotated to keep the newest N per database.
+
+Command line:
+    python -m services.backup_service                 # back up main database
+    python -m services.backup_service --tenant acme   # back up one tenant database
+    python -m services.backup_service --all           # main database and all tenants
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from models.base import engine as main_engine, tenant_database_path, list_tenants
+
+# folder for snapshots
+BACKUP_DIR = os.getenv("USE_CASE_BACKUP_DIR", "backups")
+
+# number of snapshots kept per database
+BACKUP_RETENTION = int(os.getenv("USE_CASE_BACKUP_RETENTION", "7"))
+
+# pages copied per step, and pause between steps (lets writers in)
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP_SECONDS = 0.005
+
+# seconds between scheduled backups (0 = no scheduled backups)
+BACKUP_INTERVAL_SECONDS = int(os.getenv("USE_CASE_BACKUP_INTERVAL", str(24 * 3600)))
+
+
+class BackupService:
+    """
+    Creates, verifies and rotates snapshots of the main database and tenant databases.
+    """
+
+    def __init__(self, backup_dir: str = BACKUP_DIR, retention: int = BACKUP_RETENTION):
+        self.backup_dir = backup_dir
+        self.retention = retention
+
+    def _source_path(self, tenant: Optional[str] = None) -> str:
+        """Database file of the main database or a tenant."""
+        if tenant is None:
+            return main_engine.url.database
+        return tenant_database_path(tenant)
+
+    def _snapshot_prefix(self, tenant: Optional[str] = None) -> str:
+        """File name prefix of the snapshots of one database."""
+        return "main" if tenant is None else f"tenant-{tenant}"
+
+    def create_backup(self, tenant: Optional[str] = None, pages_per_step: int = BACKUP_PAGES_PER_STEP,
+                      step_sleep: float = BACKUP_STEP_SLEEP_SECONDS, verify: bool = True) -> Dict[str, Any]:
+        """
+        Copy a database to a new snapshot file while the app keeps running.
+
+        Args:
+            tenant (Optional[str]) : tenant to back up, None for the main database
+            pages_per_step (int) : pages copied per step (smaller = shorter write locks, slower backup)
+            step_sleep (float) : seconds to pause between steps
+            verify (bool) : reopen the snapshot and run an integrity check, default True
+
+        Returns:
+            Dict[str, Any] : path, bytes, pages, steps, duration_s, bytes_per_sec, verified, removed (rotated snapshots)
+
+        Raises:
+            FileNotFoundError: If the database does not exist
+            ValueError: If verification of the snapshot fails
+        """
+        source_path = self._source_path(tenant)
+        if not os.path.exists(source_path):
+            raise FileNotFoundError(f"Database '{source_path}' does not exist")
+
+        os.makedirs(self.backup_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        target_path = os.path.join(self.backup_dir, f"{self._snapshot_prefix(tenant)}-{timestamp}.db")
+
+        steps = 0
+
+        def progress(status, remaining, total):
+            nonlocal steps
+            steps += 1
+
+        started = time.perf_counter()
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+        try:
+            # copies pages_per_step pages, releases the lock, sleeps, continues;
+            # restarts automatically if another connection writes in between
+            source.backup(target, pages=pages_per_step, progress=progress, sleep=step_sleep)
+            page_count = target.execute("PRAGMA page_count").fetchone()[0]
+        except Exception:
+            # a partial snapshot (locked database, disk full) would count as the newest one in the rotation
+            target.close()
+            os.remove(target_path)
+            raise
+        finally:
+            target.close()
+            source.close()
+        duration = time.perf_counter() - started
+
+        size = os.path.getsize(target_path)
+        result = {
+            "tenant": tenant,
+            "path": target_path,
+            "bytes": size,
+            "pages": page_count,
+            "steps": steps,
+            "duration_s": round(duration, 3),
+            "bytes_per_sec": round(size / duration) if duration > 0 else None,
+            "verified": None,
+            "removed": []
+        }
+
+        if verify:
+            try:
+                self.verify_backup(target_path)
+            except Exception:
+                # a broken snapshot must not push good ones out of the rotation
+                os.remove(target_path)
+                raise
+            result["verified"] = True
+
+        result["removed"] = self.rotate(tenant)
+        return result
+
+    def verify_backup(self, path: str) -> Dict[str, Any]:
+        """
+        Reopen a snapshot read-only and check it.
+
+        Args:
+            path (str) : snapshot file
+
+        Returns:
+            Dict[str, Any] : tables and row count of use_cases
+
+        Raises:
+            ValueError: If the integrity check fails or the schema is missing
+        """
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            check = connection.execute("PRAGMA integrity_check").fetchone()[0]
+            if check != "ok":
+                raise ValueError(f"Backup '{path}' failed integrity check: {check}")
+
+            tables = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            if "use_cases" not in tables:
+                raise ValueError(f"Backup '{path}' does not contain the use_cases table")
+
+            use_cases = connection.execute("SELECT COUNT(*) FROM use_cases").fetchone()[0]
+            return {"tables": tables, "use_cases": use_cases}
+        finally:
+            connection.close()
+
+    def list_backups(self, tenant: Optional[str] = None) -> List[str]:
+        """
+        Snapshots of one database, newest first.
+
+        Args:
+            tenant (Optional[str]) : tenant, None for the main database
+
+        Returns:
+            List[str] : snapshot paths
+        """
+        if not os.path.isdir(self.backup_dir):
+            return []
+        # exact prefix + timestamp, so tenant "a" does not match the snapshots of tenant "a-1"
+        pattern = re.compile(re.escape(self._snapshot_prefix(tenant)) + r"-\d{8}-\d{6}-\d{6}\.db")
+        names = [name for name in os.listdir(self.backup_dir) if pattern.fullmatch(name)]
+        return [os.path.join(self.backup_dir, name) for name in sorted(names, reverse=True)]
+
+    def rotate(self, tenant: Optional[str] = None) -> List[str]:
+        """
+        Delete all but the newest `retention` snapshots of one database.
+
+        Args:
+            tenant (Optional[str]) : tenant, None for the main database
+
+        Returns:
+            List[str] : deleted snapshot paths
+        """
+        removed = self.list_backups(tenant)[self.retention:]
+        for path in removed:
+            os.remove(path)
+        return removed
+
+    def backup_all(self) -> List[Dict[str, Any]]:
+        """
+        Back up the main database and all tenant databases.
+        Errors of one database don't stop the others.
+
+        Returns:
+            List[Dict[str, Any]] : one result per database (see create_backup), or {"tenant", "error"}
+        """
+        results = []
+        for tenant in [None] + list_tenants():
+            try:
+                results.append(self.create_backup(tenant))
+            except Exception as e:
+                results.append({"tenant": tenant, "error": str(e)})
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Online backup of the use case databases")
+    parser.add_argument("--tenant", help="back up this tenant database instead of the main database")
+    parser.add_argument("--all", action="store_true", help="back up the main database and all tenant databases")
+    parser.add_argument("--no-verify", action="store_true", help="skip reopening and checking the snapshot")
+    args = parser.parse_args()
+
+    service = BackupService()
+    if args.all:
+        results = service.backup_all()
+    else:
+        results = [service.create_backup(args.tenant, verify=not args.no_verify)]
+
+    for result in results:
+        if "error" in result:
+            print(f"FAILED {result['tenant'] or 'main'}: {result['error']}")
+            continue
+        print(
+            f"{result['path']}: {result['bytes'] / 1024:.1f} KB in {result['duration_s']} s "
+            f"({result['bytes_per_sec'] / 1024:.1f} KB/s, {result['steps']} steps), "
+            f"verified={result['verified']}, rotated out {len(result['removed'])}"
+        )
@@ -0,0 +1,320 @@
+"""
+Database maintenance - keeps query plans and file size healthy.
+Runs ANALYZE, PRAGMA optimize, WAL checkpoints and incremental vacuum on the main database and all open
+tenant databases, on a schedule and after large write batches. Also runs the scheduled online backups.
+The scheduler runs as a background task on the NiceGUI event loop; the SQL itself runs in a worker thread.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+from models.base import engine as main_engine, tenant_engines
+from services.backup_service import BackupService, BACKUP_INTERVAL_SECONDS
+from utils.permissions import PermissionError, require_permission
+
+# seconds between scheduled runs (default 6 hours)
+MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("USE_CASE_MAINTENANCE_INTERVAL", str(6 * 3600)))
+
+# number of written rows (insert/update/delete) on one database that triggers an extra run
+MAINTENANCE_WRITE_THRESHOLD = int(os.getenv("USE_CASE_MAINTENANCE_WRITE_THRESHOLD", "500"))
+
+# how often the background task checks whether a run is due
+MAINTENANCE_CHECK_SECONDS = 30
+
+# pages released per incremental vacuum step (0 = all free pages)
+INCREMENTAL_VACUUM_PAGES = 0
+
+
+def _require_main_admin(current_user: dict) -> None:
+    """Maintenance covers all databases: only admins of the main database may see or start it."""
+    require_permission(current_user, "maintenance")
+    if current_user.get("tenant"):
+        raise PermissionError("Database maintenance is only allowed for admins of the main database")
+
+
+class MaintenanceScheduler:
+    """
+    Background maintenance of the SQLite databases.
+    Tracks written rows per database (SQLAlchemy cursor events) and keeps a history of recent runs
+    with duration and effect for the admin view.
+    """
+
+    def __init__(self, interval_seconds: int = MAINTENANCE_INTERVAL_SECONDS, write_threshold: int = MAINTENANCE_WRITE_THRESHOLD,
+                 backup_interval_seconds: int = BACKUP_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self.write_threshold = write_threshold
+        self.history = deque(maxlen=50)
+
+        # scheduled backups (0 = disabled)
+        self.backup_service = BackupService()
+        self.backup_interval_seconds = backup_interval_seconds
+        self.backup_history = deque(maxlen=20)
+        self._last_backup = time.monotonic()
+
+        self._pending_writes: Dict[str, int] = {}  # database url -> rows written since last run
+        self._last_run = time.monotonic()
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    # ---------- write tracking ----------
+
+    def note_writes(self, database_url: str, rows: int) -> None:
+        """
+        Count written rows of a database. Wakes up the background task once the threshold is crossed.
+
+        Args:
+            database_url (str) : url of the database written to
+            rows (int) : number of rows written
+        """
+        if rows <= 0:
+            return
+        with self._lock:
+            before = self._pending_writes.get(database_url, 0)
+            self._pending_writes[database_url] = before + rows
+            crossed = before < self.write_threshold <= before + rows
+
+        # may be called from any thread (agent runs in worker threads)
+        if crossed and self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def pending_writes(self) -> Dict[str, int]:
+        """Rows written per database since its last maintenance run."""
+        with self._lock:
+            return dict(self._pending_writes)
+
+    # ---------- maintenance ----------
+
+    def _maintain_engine(self, db_engine) -> Dict[str, Any]:
+        """
+        Run all maintenance steps on one database.
+
+        Args:
+            db_engine : SQLAlchemy engine of the database
+
+        Returns:
+            Dict[str, Any] : database, per step durations (ms) and effect (size, free pages, checkpointed frames)
+        """
+        result = {"database": db_engine.url.database, "steps": {}}
+
+        with db_engine.connect() as connection:
+            def pragma(name):
+                return connection.execute(text(f"PRAGMA {name}")).scalar()
+
+            page_size = pragma("page_size")
+            pages_before = pragma("page_count")
+            free_before = pragma("freelist_count")
+
+            def timed(step, sql):
+                started = time.perf_counter()
+                cursor = connection.execute(text(sql))
+                rows = cursor.fetchall() if cursor.returns_rows else []
+                result["steps"][step] = round((time.perf_counter() - started) * 1000, 1)
+                return rows
+
+            timed("analyze", "ANALYZE")
+            timed("optimize", "PRAGMA optimize")
+
+            # checkpoint only makes sense in WAL mode
+            if str(pragma("journal_mode")).lower() == "wal":
+                busy, wal_frames, checkpointed = timed("wal_checkpoint", "PRAGMA wal_checkpoint(TRUNCATE)")[0]
+                result["wal_frames_checkpointed"] = checkpointed
+
+            # incremental vacuum only works with auto_vacuum = INCREMENTAL (2); a database created before that setting
+            # (NONE) is converted once by a full VACUUM, which applies the setting of the connection (models.base)
+            if pragma("auto_vacuum") != 2:
+                timed("vacuum_convert", "VACUUM")
+            if pragma("auto_vacuum") == 2:
+                timed("incremental_vacuum", f"PRAGMA incremental_vacuum({INCREMENTAL_VACUUM_PAGES})")
+            else:
+                result["steps"]["incremental_vacuum"] = None  # not available for this database
+
+            connection.commit()
+
+            pages_after = pragma("page_count")
+            free_after = pragma("freelist_count")
+
+        result["size_before_kb"] = round(pages_before * page_size / 1024, 1)
+        result["size_after_kb"] = round(pages_after * page_size / 1024, 1)
+        result["free_pages_before"] = free_before
+        result["free_pages_after"] = free_after
+        return result
+
+    def run_once(self, reason: str = "manual", current_user: dict = None) -> Dict[str, Any]:
+        """
+        Run maintenance on the main database and all open tenant databases (blocking), started by an admin
+        of the main database.
+
+        Args:
+            reason (str) : why the run happens ('manual')
+            current_user (dict) : current user dictionary (id, email, role, name, tenant)
+
+        Returns:
+            Dict[str, Any] : run record (started, reason, duration_ms, databases, error)
+        """
+        _require_main_admin(current_user)
+        return self._run(reason)
+
+    def _run(self, reason: str) -> Dict[str, Any]:
+        """
+        Run maintenance on the main database and all open tenant databases (blocking, no permission check).
+
+        Args:
+            reason (str) : why the run happens ('schedule', 'writes', 'manual')
+
+        Returns:
+            Dict[str, Any] : run record (started, reason, duration_ms, databases, error)
+        """
+        with self._run_lock:  # never two runs at the same time
+            record = {
+                "started": datetime.now().isoformat(timespec="seconds"),
+                "reason": reason,
+                "databases": [],
+                "error": None
+            }
+            started = time.perf_counter()
+
+            engines = [main_engine] + [tenant_engines.get(tenant)[0] for tenant in tenant_engines.open_tenants()]
+            for db_engine in engines:
+                try:
+                    record["databases"].append(self._maintain_engine(db_engine))
+                except Exception as e:
+                    # e.g. database locked - try again next time
+                    record["error"] = f"{db_engine.url.database}: {e}"
+
+            record["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+            with self._lock:
+                self._pending_writes.clear()
+            self._last_run = time.monotonic()
+            self.history.append(record)
+            return record
+
+    def run_backup(self, reason: str = "manual", current_user: dict = None) -> Dict[str, Any]:
+        """
+        Back up the main database and all tenant databases (blocking), started by an admin of the main database.
+
+        Args:
+            reason (str) : why the backup happens ('manual')
+            current_user (dict) : current user dictionary (id, email, role, name, tenant)
+
+        Returns:
+            Dict[str, Any] : backup record (started, reason, duration_ms, results per database)
+        """
+        _require_main_admin(current_user)
+        return self._backup(reason)
+
+    def _backup(self, reason: str) -> Dict[str, Any]:
+        """
+        Back up the main database and all tenant databases (blocking, no permission check).
+
+        Args:
+            reason (str) : why the backup happens ('schedule', 'manual')
+
+        Returns:
+            Dict[str, Any] : backup record (started, reason, duration_ms, results per database)
+        """
+        started = time.perf_counter()
+        record = {
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "reason": reason,
+            "results": self.backup_service.backup_all()
+        }
+        record["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        self._last_backup = time.monotonic()
+        self.backup_history.append(record)
+        return record
+
+    def _backup_due(self) -> bool:
+        """Whether a scheduled backup is due now."""
+        return self.backup_interval_seconds > 0 and time.monotonic() - self._last_backup >= self.backup_interval_seconds
+
+    def _due_reason(self) -> Optional[str]:
+        """Why a run is due now, None if no run is due."""
+        if any(rows >= self.write_threshold for rows in self.pending_writes().values()):
+            return "writes"
+        if time.monotonic() - self._last_run >= self.interval_seconds:
+            return "schedule"
+        return None
+
+    # ---------- background task ----------
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=MAINTENANCE_CHECK_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            reason = self._due_reason()
+            if reason:
+                try:
+                    # SQL in a worker thread, the UI keeps running
+                    await asyncio.to_thread(self._run, reason)
+                except Exception as e:
+                    print(f"Database maintenance failed: {e}")
+
+            if self._backup_due():
+                try:
+                    await asyncio.to_thread(self._backup, "schedule")
+                except Exception as e:
+                    print(f"Database backup failed: {e}")
+
+    def start(self) -> None:
+        """Start the background task on the running event loop (e.g. from app.on_startup)."""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run_forever())
+
+    def stop(self) -> None:
+        """Stop the background task (e.g. from app.on_shutdown)."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def get_status(self, current_user: dict = None) -> Dict[str, Any]:
+        """
+        Status for admins of the main database (covers all databases).
+
+        Args:
+            current_user (dict) : current user dictionary (id, email, role, name, tenant)
+
+        Returns:
+            Dict[str, Any] : running, interval_seconds, write_threshold, pending_writes, seconds_until_next_run,
+                history (newest first), backup_interval_seconds, backup_history (newest first)
+        """
+        _require_main_admin(current_user)
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval_seconds,
+            "write_threshold": self.write_threshold,
+            "pending_writes": self.pending_writes(),
+            "seconds_until_next_run": max(0, round(self.interval_seconds - (time.monotonic() - self._last_run))),
+            "history": list(reversed(self.history)),
+            "backup_interval_seconds": self.backup_interval_seconds,
+            "backup_history": list(reversed(self.backup_history))
+        }
+
+
+# one scheduler per process
+maintenance_scheduler = MaintenanceScheduler()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _count_written_rows(conn, cursor, statement, parameters, context, executemany):
+    """Count rows written through any engine (main and tenant databases)."""
+    if statement.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE"):
+        maintenance_scheduler.note_writes(str(conn.engine.url), max(cursor.rowcount, 1))
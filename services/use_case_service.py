@@ -1,7 +1,54 @@
+import contextvars
+import functools
+import inspect
+import threading
 from typing import Optional, List, Dict, Any
-from models.base import SessionLocal
+from sqlalchemy import text
+from models.base import get_engine, get_session, list_tenants, attach_tenants, tenant_schema, MAX_ATTACHED_DATABASES
 from models import UseCase, Company, Industry, Person
-from utils.permissions import require_permission
+from utils.permissions import require_permission, PermissionError
+from utils.fuzzy_match import TrigramIndex, normalize_name
+from services.write_queue import SINGLE_WRITER_ENABLED, _GroupSession, get_writer, on_group_rollback
+
+# fuzzy name indexes shared by all service instances, built lazily from the database
+# key: (database url, entity type)
+_entity_indexes: Dict[tuple, TrigramIndex] = {}
+_entity_index_lock = threading.Lock()
+
+# session of the transaction opened by run_in_transaction in this context: (tenant, session)
+_transaction = contextvars.ContextVar("use_case_transaction", default=None)
+
+
+def _drop_entity_indexes(url : str) -> None:
+    """Forget the fuzzy name indexes of a database (rebuilt on next use), e.g. after a rollback."""
+    with _entity_index_lock:
+        for key in [key for key in _entity_indexes if key[0] == url]:
+            del _entity_indexes[key]
+
+
+# a failed group commit of the single writer undoes creates that were already added to the indexes
+on_group_rollback(_drop_entity_indexes)
+
+
+def _write_operation(method):
+    """
+    Decorator for service methods that write. If the single writer is enabled, the call is queued and executed
+    on the writer thread of the current user's database (group commit), otherwise it runs directly.
+    """
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.single_writer:
+            return method(self, *args, **kwargs)
+
+        current_user = signature.bind(self, *args, **kwargs).arguments.get('current_user')
+        writer = get_writer(self._get_tenant(current_user))
+        if writer.in_writer_thread():
+            return method(self, *args, **kwargs)  # nested call inside a queued operation
+        return writer.run(method, self, *args, **kwargs)
+
+    return wrapper
 
 
 class UseCaseService:
@@ -9,7 +56,25 @@ class UseCaseService:
     Layer that is intented to handle all interaction with the database for managin usecases. 
     CRUD operation.
     """
-    def __init__(self):
+
+    # entity types that can be resolved by fuzzy name matching
+    RESOLVABLE_ENTITIES = ['company', 'person']
+
+    # minimum trigram similarity for the best_match suggestion of resolve_entity
+    # not used for automatic reuse: "Michaela Weber" vs "Michael Weber" already scores 0.81
+    FUZZY_MATCH_THRESHOLD = 0.8
+
+    # fields of the list results, usable for projection (fields parameter of the list methods)
+    USE_CASE_FIELDS = ['id', 'title', 'description', 'expected_benefit', 'status', 'company_id', 'company_name', 'industry_id', 'industry_name']
+    PERSON_FIELDS = ['id', 'name', 'role', 'company_id', 'company_name']
+
+    def __init__(self, single_writer : bool = SINGLE_WRITER_ENABLED):
+        """
+        Args:
+            single_writer (bool) : queue write operations on one writer thread per database with group commit
+                (default: USE_CASE_SINGLE_WRITER environment variable)
+        """
+        self.single_writer = single_writer
         self.valid_status_values = [
             "new",
             "in_review",
@@ -19,9 +84,72 @@ class UseCaseService:
             "archived"
         ]
 
-    def _get_session(self):
-        """Helper to get database session"""
-        return SessionLocal()  # may get more complicated dont know, if so can be handeled centrally here
+    def _get_session(self, current_user : dict = None):
+        """
+        Helper to get database session. Routed to the tenant database of the current user
+        (main database if the user has no tenant).
+
+        Args:
+            current_user (dict) : current user dictionary (id, email, role, name, tenant)
+        """
+        transaction = _transaction.get()
+        if transaction is not None and transaction[0] == self._get_tenant(current_user):
+            return transaction[1]  # inside run_in_transaction
+        if self.single_writer:
+            writer = get_writer(self._get_tenant(current_user))
+            if writer.in_writer_thread():
+                return writer.group_session()  # session of the queued operation
+        return get_session(self._get_tenant(current_user))
+
+    def run_in_transaction(self, operations, current_user : dict = None):
+        """
+        Run several service calls as one transaction: all of their changes are committed together at the end,
+        or all are rolled back if operations raises. The service methods called inside commit/close as usual,
+        their commits only flush.
+        With the single writer the whole function is one queued operation (one savepoint of a commit group).
+
+        Args:
+            operations : function without arguments calling service methods (for the same user)
+            current_user (dict) : current user dictionary (id, email, role, name, tenant)
+
+        Returns:
+            result of operations
+
+        Raises:
+            the exception of operations, after the rollback
+        """
+        tenant = self._get_tenant(current_user)
+        if self.single_writer:
+            writer = get_writer(tenant)
+            if writer.in_writer_thread():
+                return operations()  # already inside a queued operation
+            try:
+                # the writer thread doesn't share this context (current user of the agent tools)
+                return writer.run(contextvars.copy_context().run, operations)
+            except Exception:
+                _drop_entity_indexes(str(get_engine(tenant).url))
+                raise
+
+        if _transaction.get() is not None:
+            return operations()  # nested: part of the outer transaction
+
+        db = get_session(tenant)
+        token = _transaction.set((tenant, _GroupSession(db)))
+        try:
+            result = operations()
+            db.commit()
+            return result
+        except Exception:
+            db.rollback()
+            _drop_entity_indexes(str(db.get_bind().url))  # may contain entries created in this transaction
+            raise
+        finally:
+            _transaction.reset(token)
+            db.close()
+
+    def _get_tenant(self, current_user : dict = None) -> Optional[str]:
+        """Helper returning the tenant of the current user, None for the main database."""
+        return current_user.get('tenant') if current_user else None
     
     def _validate_status(self, status : str) -> None:
         """
@@ -66,13 +194,109 @@ class UseCaseService:
             "industry_id": use_case.industry_id,
             "industry_name": use_case.industry.name
         }
-    
-    def get_all_use_cases(self, current_user : dict = None) -> List[Dict[str, Any]]: 
+
+    def _project(self, rows : List[Dict[str, Any]], fields : Optional[List[str]], valid_fields : List[str]) -> List[Dict[str, Any]]:
+        """
+        Helper keeping only the requested fields of result dicts.
+
+        Args:
+            rows (List[Dict[str, Any]]) : result dicts
+            fields (Optional[List[str]]) : fields to keep, None for all
+            valid_fields (List[str]) : fields the rows have
+
+        Raises:
+            ValueError: If an unknown field is requested
+        """
+        if fields is None:
+            return rows
+        unknown = [field for field in fields if field not in valid_fields]
+        if unknown:
+            raise ValueError(f"Unknown field(s) {', '.join(unknown)}. Valid fields: {', '.join(valid_fields)}")
+        return [{field: row[field] for field in fields} for row in rows]
+
+    def _paginate(self, query, id_column, limit : Optional[int], offset : int):
+        """
+        Helper applying limit/offset to a query (ordered by id so pages are stable).
+
+        Raises:
+            ValueError: If limit or offset is negative
+        """
+        if limit is not None and limit < 0:
+            raise ValueError("limit must not be negative")
+        if offset is not None and offset < 0:
+            raise ValueError("offset must not be negative")
+        query = query.order_by(id_column)
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
+    def _get_entity_index(self, db, entity_type : str) -> TrigramIndex:
+        """
+        Helper returning the fuzzy name index for companies or persons, built from the database on first use.
+        One index per database (tenant), identified by the session's bind.
+
+        Args:
+            db : open database session (used to identify the database and for the initial build)
+            entity_type (str) : 'company' or 'person'
+
+        Returns:
+            TrigramIndex : index over the entity names
+        """
+        key = (str(db.get_bind().url), entity_type)
+        with _entity_index_lock:
+            index = _entity_indexes.get(key)
+            if index is None:
+                index = TrigramIndex()
+                if entity_type == 'company':
+                    for comp in db.query(Company).all():
+                        index.add(comp.id, comp.name, industry_id=comp.industry_id)
+                else:
+                    for person in db.query(Person).all():
+                        index.add(person.id, person.name, role=person.role, company_id=person.company_id)
+                _entity_indexes[key] = index
+            return index
+
+    def _find_same_name(self, db, entity_type : str, name : str, where : Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """
+        Helper finding an entry whose name is the same after normalize_name (legal forms, titles, case and
+        punctuation ignored: "E.ON SE" == "E.ON", "Dr. Anna Schmidt" == "Anna Schmidt").
+        Used by find_or_create_* to reuse entries automatically; similar but different names are not reused.
+
+        Args:
+            db : open database session
+            entity_type (str) : 'company' or 'person'
+            name (str) : name to look up
+            where (Optional[dict]) : attribute filter, e.g. {"company_id": 3}
+
+        Returns:
+            Optional[int] : id of the entry, None if there is no entry with the same normalized name
+        """
+        normalized = normalize_name(name)
+        # same normalized name -> same trigram set (score 1.0), the exact check sorts out reordered words
+        for candidate in self._get_entity_index(db, entity_type).search(name, limit=5, min_score=1.0, where=where):
+            if normalize_name(candidate["name"]) == normalized:
+                return candidate["id"]
+        return None
+
+    def _index_company(self, db, company : Company) -> None:
+        """Helper adding a newly created company to the fuzzy name index."""
+        self._get_entity_index(db, 'company').add(company.id, company.name, industry_id=company.industry_id)
+
+    def _index_person(self, db, person : Person) -> None:
+        """Helper adding a newly created or changed person to the fuzzy name index."""
+        self._get_entity_index(db, 'person').add(person.id, person.name, role=person.role, company_id=person.company_id)
+
+    def get_all_use_cases(self, current_user : dict = None, fields : Optional[List[str]] = None, limit : Optional[int] = None, offset : int = 0) -> List[Dict[str, Any]]: 
         """  
         Retrieve all use cases from the database. If current user is allowed to. 
 
         Args:
             current_user (dict) : current user dictionary (id, email, role, name)
+            fields (Optional[List[str]]) : only return these fields (see USE_CASE_FIELDS), default all
+            limit (Optional[int]) : maximum number of use cases, default all
+            offset (int) : number of use cases to skip (ordered by id), default 0
     
         Returns:
             List[Dict[str, Any]]: List of dictionaries, each containing:
@@ -90,12 +314,12 @@ class UseCaseService:
         require_permission(current_user, 'read')
 
         # get db
-        db = self._get_session()
+        db = self._get_session(current_user)
 
         # try to get all use cases and format them reasonably
         try: 
-            use_cases = db.query(UseCase).all()
-            return [self._use_case_to_dict(uc) for uc in use_cases]
+            use_cases = self._paginate(db.query(UseCase), UseCase.id, limit, offset).all()
+            return self._project([self._use_case_to_dict(uc) for uc in use_cases], fields, self.USE_CASE_FIELDS)
         finally:
             db.close()
 
@@ -113,7 +337,7 @@ class UseCaseService:
         # check user rights
         require_permission(current_user, 'read')
 
-        db = self._get_session()
+        db = self._get_session(current_user)
 
         try: 
             matching_use_case = db.query(UseCase).filter(UseCase.id == use_case_id).first()
@@ -125,6 +349,7 @@ class UseCaseService:
         finally:
             db.close()
 
+    @_write_operation
     def create_use_case(self, title : str, company_id : int, industry_id : int, description : str = None, expected_benefit : str = None, status : str  = 'new', current_user : dict = None) -> Dict[str, Any]:
         """  
         Create new use case in the database if current user is allowed to.
@@ -144,7 +369,7 @@ class UseCaseService:
         # check user rights
         require_permission(current_user, "create")
 
-        db = self._get_session()
+        db = self._get_session(current_user)
 
         try:
 
@@ -190,6 +415,7 @@ class UseCaseService:
         finally:
             db.close()
 
+    @_write_operation
     def update_use_case(
             self, 
             use_case_id : int, 
@@ -220,7 +446,7 @@ class UseCaseService:
         # check user rights
         require_permission(current_user, "update")
         
-        db = self._get_session()
+        db = self._get_session(current_user)
 
         try: 
             # check if valid id
@@ -277,6 +503,7 @@ class UseCaseService:
             db.close()
 
 
+    @_write_operation
     def update_use_case_status(self, use_case_id : int, status : str, current_user : dict = None) -> Dict[str, Any]: 
         """ 
         Update the status of an use case specifed by the ID if the current user is allowed to.
@@ -296,7 +523,7 @@ class UseCaseService:
             require_permission(current_user, 'update')  # Maintainer or admin
         
         # Now update (don't call update_use_case to avoid double permission check)
-        db = self._get_session()
+        db = self._get_session(current_user)
         try:
             use_case = db.query(UseCase).filter(UseCase.id == use_case_id).first()
             if not use_case:
@@ -315,6 +542,7 @@ class UseCaseService:
         finally:
             db.close()
     
+    @_write_operation
     def delete_use_case(self, use_case_id : int, current_user : dict = None) -> Dict[str, Any]:
         """ 
         Delete one use case from the database and returns its informatin for the last time if the current user is allowed to.
@@ -328,7 +556,7 @@ class UseCaseService:
         """
         require_permission(current_user, "delete")
 
-        db = self._get_session()
+        db = self._get_session(current_user)
 
         try: 
             # check if is is valid
@@ -357,7 +585,10 @@ class UseCaseService:
             industry_id : Optional[int] = None, 
             status : Optional[str] = None, 
             person_id : Optional[int] = None,
-            current_user : dict = None
+            current_user : dict = None,
+            fields : Optional[List[str]] = None,
+            limit : Optional[int] = None,
+            offset : int = 0
     ) -> List[Dict[str, Any]]: 
         """ 
         Filter use cases by various criteria.
@@ -370,12 +601,15 @@ class UseCaseService:
             status: Filter by status (optional)
             person_id: Filter by person who contributed (optional)
             current_user (dict) : current user dictionary (id, email, role, name)
+            fields: Only return these fields (see USE_CASE_FIELDS), default all
+            limit: Maximum number of use cases, default all
+            offset: Number of matching use cases to skip (ordered by id), default 0
             
         Returns:
             List of use cases matching the filters
         """
         require_permission(current_user, "read")
-        db = self._get_session()
+        db = self._get_session(current_user)
 
         try:
 
@@ -398,9 +632,9 @@ class UseCaseService:
                 query = query.join(UseCase.persons).filter(Person.id == person_id)
 
             # run filter
-            filtered_use_cases = query.all()
+            filtered_use_cases = self._paginate(query, UseCase.id, limit, offset).all()
 
-            return [self._use_case_to_dict(uc) for uc in filtered_use_cases]
+            return self._project([self._use_case_to_dict(uc) for uc in filtered_use_cases], fields, self.USE_CASE_FIELDS)
 
         finally:
             db.close()
@@ -432,7 +666,7 @@ class UseCaseService:
                 - name: Industry name
         """
         require_permission(current_user, "read")
-        db = self._get_session()
+        db = self._get_session(current_user)
 
         try: 
             # return all industries as dictionaries
@@ -456,7 +690,7 @@ class UseCaseService:
                 - industry_name: Associated industry name
         """
         require_permission(current_user, "read")
-        db = self._get_session()
+        db = self._get_session(current_user)
 
         try: 
             companies = db.query(Company).all()
@@ -469,12 +703,15 @@ class UseCaseService:
         finally:
             db.close()
 
-    def get_all_persons(self, current_user : dict = None) -> List[Dict[str, Any]]: 
+    def get_all_persons(self, current_user : dict = None, fields : Optional[List[str]] = None, limit : Optional[int] = None, offset : int = 0) -> List[Dict[str, Any]]: 
         """ 
         Get all persons with their IDs, names, roles, and company information.
 
         Args:
             current_user (dict) : current user dictionary (id, email, role, name)
+            fields (Optional[List[str]]) : only return these fields (see PERSON_FIELDS), default all
+            limit (Optional[int]) : maximum number of persons, default all
+            offset (int) : number of persons to skip (ordered by id), default 0
         
         Returns:
             List[Dict[str, Any]]: List of dictionaries containing:
@@ -485,18 +722,18 @@ class UseCaseService:
                 - company_name: Associated company name
         """
         require_permission(current_user, "read")
-        db = self._get_session()
+        db = self._get_session(current_user)
 
         try:
             
-            persons = db.query(Person).all()
-            return [{
+            persons = self._paginate(db.query(Person), Person.id, limit, offset).all()
+            return self._project([{
                 "id": person.id,
                 "name": person.name,
                 "role": person.role,
                 "company_id": person.company_id,
                 "company_name": person.company.name
-            } for person in persons]
+            } for person in persons], fields, self.PERSON_FIELDS)
         finally:
             db.close()
 
@@ -516,7 +753,7 @@ class UseCaseService:
                 - company_name: Associated company name
         """
         require_permission(current_user, "read")
-        db = self._get_session()
+        db = self._get_session(current_user)
 
         try: 
             use_case = db.query(UseCase).filter(UseCase.id == use_case_id).first()
@@ -533,6 +770,7 @@ class UseCaseService:
         finally:
             db.close()
 
+    @_write_operation
     def create_industry(self, name: str, current_user : dict = None) -> Dict[str, Any]:
         """
         Create a new industry if the current user is allowed to.
@@ -548,7 +786,7 @@ class UseCaseService:
             ValueError: If industry with this name already exists
         """
         require_permission(current_user, "create")
-        db = self._get_session()
+        db = self._get_session(current_user)
         try:
             # Check if already exists
             existing = db.query(Industry).filter(Industry.name == name).first()
@@ -568,6 +806,7 @@ class UseCaseService:
         finally:
             db.close()
 
+    @_write_operation
     def create_company(self, name: str, industry_id: int, current_user : dict = None) -> Dict[str, Any]:
         """
         Create a new company if the current user is allowed to. 
@@ -584,7 +823,7 @@ class UseCaseService:
             ValueError: If company already exists or industry doesn't exist
         """
         require_permission(current_user, "create")
-        db = self._get_session()
+        db = self._get_session(current_user)
         try:
             # Check if industry exists
             industry = db.query(Industry).filter(Industry.id == industry_id).first()
@@ -601,6 +840,7 @@ class UseCaseService:
             db.add(company)
             db.commit()
             db.refresh(company)
+            self._index_company(db, company)
             
             return {
                 "id": company.id,
@@ -614,6 +854,7 @@ class UseCaseService:
         finally:
             db.close()
 
+    @_write_operation
     def create_person(self, name: str, role: str, company_id: int, current_user : dict = None) -> Dict[str, Any]:
         """
         Create a new person if the user is allowed to.
@@ -631,7 +872,7 @@ class UseCaseService:
             ValueError: If company doesn't exist
         """
         require_permission(current_user, "create")
-        db = self._get_session()
+        db = self._get_session(current_user)
         try:
             # Check if company exists
             company = db.query(Company).filter(Company.id == company_id).first()
@@ -644,6 +885,7 @@ class UseCaseService:
             db.add(person)
             db.commit()
             db.refresh(person)
+            self._index_person(db, person)
             
             return {
                 "id": person.id,
@@ -658,6 +900,7 @@ class UseCaseService:
         finally:
             db.close()
 
+    @_write_operation
     def find_or_create_industry(self, name: str, current_user : dict = None) -> Dict[str, Any]:
         """
         Find existing industry by name, or create if doesn't exist if the current user is allowed to.
@@ -671,7 +914,7 @@ class UseCaseService:
             Dict[str, Any]: Industry info (existing or newly created)
         """
         require_permission(current_user, "read")
-        db = self._get_session()
+        db = self._get_session(current_user)
         try:
             # Try to find existing (case-insensitive)
             industry = db.query(Industry).filter(
@@ -693,6 +936,7 @@ class UseCaseService:
         finally:
             db.close()
 
+    @_write_operation
     def find_or_create_company(self, name: str, industry_name: str, current_user : dict = None) -> Dict[str, Any]:
         """
         Find existing company by name, or create if doesn't exist is the current user is allowed to un this operation.
@@ -708,12 +952,18 @@ class UseCaseService:
             Dict[str, Any]: Company info (existing or newly created)
         """
         require_permission(current_user, "read")
-        db = self._get_session()
+        db = self._get_session(current_user)
         try:
             # Try to find existing company
             company = db.query(Company).filter(
                 Company.name.ilike(name)
             ).first()
+
+            # no exact match -> same normalized name ("E.ON SE" vs "E.ON")
+            if not company:
+                company_id = self._find_same_name(db, 'company', name)
+                if company_id is not None:
+                    company = db.query(Company).filter(Company.id == company_id).first()
             
             if company:
                 return {
@@ -740,6 +990,7 @@ class UseCaseService:
             db.add(company)
             db.commit()
             db.refresh(company)
+            self._index_company(db, company)
             
             return {
                 "id": company.id,
@@ -750,6 +1001,7 @@ class UseCaseService:
         finally:
             db.close()
 
+    @_write_operation
     def find_or_create_person(self, name: str, role: str, company_id: int, current_user : dict = None) -> Dict[str, Any]:
         """
         Find existing person by name and company, or create if doesn't exist if the current user is allowed to.
@@ -765,13 +1017,19 @@ class UseCaseService:
             Dict[str, Any]: Person info (existing or newly created)
         """
         require_permission(current_user, "read")
-        db = self._get_session()
+        db = self._get_session(current_user)
         try:
             # Try to find existing person at this company
             person = db.query(Person).filter(
                 Person.name == name,
                 Person.company_id == company_id
             ).first()
+
+            # no exact match -> same normalized name within the company ("Dr. Anna Schmidt" vs "Anna Schmidt")
+            if not person:
+                person_id = self._find_same_name(db, 'person', name, where={"company_id": company_id})
+                if person_id is not None:
+                    person = db.query(Person).filter(Person.id == person_id).first()
             
             if person:
                 # Update role if different
@@ -779,6 +1037,7 @@ class UseCaseService:
                     person.role = role
                     db.commit()
                     db.refresh(person)
+                    self._index_person(db, person)
                 
                 return {
                     "id": person.id,
@@ -794,6 +1053,7 @@ class UseCaseService:
             db.add(person)
             db.commit()
             db.refresh(person)
+            self._index_person(db, person)
             
             return {
                 "id": person.id,
@@ -805,6 +1065,7 @@ class UseCaseService:
         finally:
             db.close()
 
+    @_write_operation
     def add_persons_to_use_case(self, use_case_id: int, person_ids: List[int], current_user : dict = None) -> Dict[str, Any]:
         """
         Add persons to a use case if the current user is allowed to.
@@ -822,7 +1083,7 @@ class UseCaseService:
             ValueError: If use case doesn't exist
         """
         require_permission(current_user, "edit")
-        db = self._get_session()
+        db = self._get_session(current_user)
         try:
             use_case = db.query(UseCase).filter(UseCase.id == use_case_id).first()
             if not use_case:
@@ -853,5 +1114,106 @@ class UseCaseService:
         finally:
             db.close()
             
+    def resolve_entity(self, entity_type: str, name: str, company_id: Optional[int] = None, limit: int = 5, current_user : dict = None) -> Dict[str, Any]:
+        """
+        Resolve a company or person name to existing database entries by fuzzy (trigram) matching if the current user is allowed to.
+        Tolerates legal forms, titles, punctuation and small spelling differences.
+
+        Args:
+            entity_type (str): 'company' or 'person'
+            name (str): Name to resolve
+            company_id (Optional[int]): Only consider persons of this company (persons only)
+            limit (int): Maximum number of candidates, default 5
+            current_user (dict) : current user dictionary (id, email, role, name)
+
+        Returns:
+            Dict[str, Any]: Dictionary containing:
+                - entity_type: Resolved entity type
+                - query: Name that was resolved
+                - candidates: List of candidates (id, name, score and industry_id or role/company_id), best first
+                - best_match: Best candidate if its score reaches FUZZY_MATCH_THRESHOLD, else None
+
+        Raises:
+            ValueError: If entity type is unknown
+        """
+        require_permission(current_user, "read")
+
+        if entity_type not in self.RESOLVABLE_ENTITIES:
+            raise ValueError(f"Entity type '{entity_type}' is not valid. Please choose one of: {', '.join(self.RESOLVABLE_ENTITIES)}")
+
+        db = self._get_session(current_user)
+        try:
+            where = {"company_id": company_id} if entity_type == 'person' and company_id is not None else None
+            candidates = self._get_entity_index(db, entity_type).search(name, limit=limit, where=where)
+
+            best_match = None
+            if candidates and candidates[0]["score"] >= self.FUZZY_MATCH_THRESHOLD:
+                best_match = candidates[0]
+
+            return {
+                "entity_type": entity_type,
+                "query": name,
+                "candidates": candidates,
+                "best_match": best_match
+            }
+        finally:
+            db.close()
+            
+    def get_tenant_overview(self, current_user : dict = None) -> List[Dict[str, Any]]:
+        """
+        Cross-tenant overview (admin only): use case, company and person counts of the main database and every tenant database.
+        Tenant databases are ATTACHed to one connection in chunks, so each chunk is a single query.
+
+        Args:
+            current_user (dict) : current user dictionary (id, email, role, name, tenant)
+
+        Returns:
+            List[Dict[str, Any]]: One dictionary per database containing:
+                - tenant: Tenant name (None for the main database)
+                - use_cases: Number of use cases
+                - by_status: Dict status -> number of use cases
+                - companies: Number of companies
+                - persons: Number of persons
+        """
+        require_permission(current_user, "manage_tenants")
+        if self._get_tenant(current_user) is not None:
+            raise PermissionError("Cross-tenant queries are only allowed for admins of the main database")
+
+        tenants = list_tenants()
+        # main database first, then tenants in chunks the connection can attach
+        chunks = [[]] + [tenants[i:i + MAX_ATTACHED_DATABASES] for i in range(0, len(tenants), MAX_ATTACHED_DATABASES)]
+
+        overview = []
+        for chunk in chunks:
+            with attach_tenants(chunk) as connection:
+                schemas = [(None, "main")] if not chunk else [(t, tenant_schema(i)) for i, t in enumerate(chunk)]
+
+                # one UNION ALL query per chunk, tenant identified by its position
+                count_sql = " UNION ALL ".join(
+                    f"SELECT {i} AS pos, "
+                    f"(SELECT COUNT(*) FROM {schema}.companies) AS companies, "
+                    f"(SELECT COUNT(*) FROM {schema}.persons) AS persons"
+                    for i, (_, schema) in enumerate(schemas)
+                )
+                status_sql = " UNION ALL ".join(
+                    f"SELECT {i} AS pos, status, COUNT(*) AS n FROM {schema}.use_cases GROUP BY status"
+                    for i, (_, schema) in enumerate(schemas)
+                )
+
+                entries = [
+                    {"tenant": tenant, "use_cases": 0, "by_status": {}, "companies": 0, "persons": 0}
+                    for tenant, _ in schemas
+                ]
+                for pos, companies, persons in connection.execute(text(count_sql)):
+                    entries[pos]["companies"] = companies
+                    entries[pos]["persons"] = persons
+                for pos, status, n in connection.execute(text(status_sql)):
+                    entries[pos]["by_status"][status] = n
+                    entries[pos]["use_cases"] += n
+
+                overview.extend(entries)
+
+        return overview
+            
     def __repr__(self):
         return "<UseCaseService>"
\ No newline at end of file
@@ -4,7 +4,7 @@ User Service - handles authentication and user management.
 
 from typing import Optional, Dict, Any, List
 import bcrypt as bcrypt_lib
-from models.base import SessionLocal
+from models.base import SessionLocal, ensure_user_tenant_column, tenant_database_path
 from models.user import User
 
 
@@ -17,7 +17,8 @@ class UserService:
     VALID_ROLES = ['reader', 'maintainer', 'admin']
     
     def __init__(self):
-        pass
+        # databases created before tenants existed lack the users.tenant column
+        ensure_user_tenant_column()
     
     def _get_session(self):
         """Get database session."""
@@ -82,12 +83,13 @@ class UserService:
                 "id": user.id,
                 "email": user.email,
                 "role": user.role,
-                "name": user.name
+                "name": user.name,
+                "tenant": user.tenant
             }
         finally:
             db.close()
     
-    def create_user(self, email: str, password: str, role: str, name: str = None) -> Dict[str, Any]:
+    def create_user(self, email: str, password: str, role: str, name: str = None, tenant: str = None) -> Dict[str, Any]:
         """
         Create a new user.
         
@@ -96,6 +98,7 @@ class UserService:
             password: Plain text password (will be hashed)
             role: User role ('reader', 'maintainer', or 'admin')
             name: Optional display name
+            tenant: Optional tenant whose database the user works on (None = main database)
             
         Returns:
             Created user dict
@@ -121,6 +124,10 @@ class UserService:
             # Validate password
             if not password or len(password) < 4:
                 raise ValueError("Password must be at least 4 characters")
+
+            # Validate tenant name (raises ValueError)
+            if tenant is not None:
+                tenant_database_path(tenant)
             
             # Hash password
             password_hash = self._hash_password(password)
@@ -130,7 +137,8 @@ class UserService:
                 email=email,
                 password_hash=password_hash,
                 role=role,
-                name=name
+                name=name,
+                tenant=tenant
             )
             
             db.add(user)
@@ -141,7 +149,8 @@ class UserService:
                 "id": user.id,
                 "email": user.email,
                 "role": user.role,
-                "name": user.name
+                "name": user.name,
+                "tenant": user.tenant
             }
         except Exception as e:
             db.rollback()
@@ -163,7 +172,8 @@ class UserService:
                 "id": user.id,
                 "email": user.email,
                 "role": user.role,
-                "name": user.name
+                "name": user.name,
+                "tenant": user.tenant
             } for user in users]
         finally:
             db.close()
@@ -188,7 +198,8 @@ class UserService:
                 "id": user.id,
                 "email": user.email,
                 "role": user.role,
-                "name": user.name
+                "name": user.name,
+                "tenant": user.tenant
             }
         finally:
             db.close()
\ No newline at end of file
@@ -0,0 +1,240 @@
+"""
+Single-writer queue with group commit.
+All queued write operations of one database run on one dedicated connection in one thread.
+Operations are committed in small groups: every operation runs in its own SAVEPOINT (a failing operation
+only rolls back itself), the group shares one COMMIT and therefore one fsync.
+Callers get a Future per operation, resolved after the group has been committed.
+
+Enabled with USE_CASE_SINGLE_WRITER=1 (or UseCaseService(single_writer=True)).
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from models.base import get_engine
+
+# use the single writer for all service write operations
+SINGLE_WRITER_ENABLED = os.getenv("USE_CASE_SINGLE_WRITER", "0") == "1"
+
+# maximum operations per commit, and how long to wait for more operations before committing
+GROUP_COMMIT_MAX_OPERATIONS = 32
+GROUP_COMMIT_MAX_WAIT_SECONDS = 0.002
+
+
+# called with the database url after a group commit failed and was rolled back (see on_group_rollback)
+_rollback_listeners: List[Callable[[str], None]] = []
+
+
+def on_group_rollback(listener: Callable[[str], None]) -> None:
+    """
+    Register a function called with the database url when a group commit failed, e.g. to drop in-memory data
+    derived from the group's operations (their changes are gone although the operations ran successfully).
+    """
+    _rollback_listeners.append(listener)
+
+
+class _GroupSession:
+    """
+    Session handed to one operation inside a commit group.
+    The service code calls commit/rollback/close as usual; here commit only flushes (the group commits later),
+    rollback undoes this operation's savepoint and close does nothing (the connection stays open).
+    """
+
+    def __init__(self, session: Session):
+        self._session = session
+        self._savepoint = None
+
+    def _begin_operation(self):
+        self._savepoint = self._session.begin_nested()
+
+    def _end_operation(self, failed: bool):
+        if self._savepoint is not None and self._savepoint.is_active:
+            if failed:
+                self._savepoint.rollback()
+            else:
+                self._savepoint.commit()  # RELEASE SAVEPOINT, still inside the group transaction
+        self._savepoint = None
+
+    def commit(self):
+        self._session.flush()
+
+    def rollback(self):
+        if self._savepoint is not None and self._savepoint.is_active:
+            self._savepoint.rollback()
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+class SingleWriter:
+    """
+    Executes write operations of one database on a dedicated connection and thread, with group commit.
+    """
+
+    def __init__(self, tenant: Optional[str] = None, max_operations: int = GROUP_COMMIT_MAX_OPERATIONS,
+                 max_wait: float = GROUP_COMMIT_MAX_WAIT_SECONDS):
+        self.tenant = tenant
+        self.max_operations = max_operations
+        self.max_wait = max_wait
+
+        # own engine with exactly one connection; explicit BEGIN IMMEDIATE so SAVEPOINTs nest inside the
+        # group transaction (pysqlite's implicit transaction handling is switched off) and the write lock
+        # is taken once per group
+        url = get_engine(tenant).url
+        self._engine = create_engine(url, poolclass=StaticPool, connect_args={"check_same_thread": False})
+        event.listen(self._engine, "connect", self._disable_pysqlite_transactions)
+        event.listen(self._engine, "begin", lambda conn: conn.exec_driver_sql("BEGIN IMMEDIATE"))
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._local = threading.local()
+        self._stats = {"operations": 0, "groups": 0, "failed_operations": 0, "failed_groups": 0}
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"single-writer-{tenant or 'main'}", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    # ---------- caller side ----------
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Queue a write operation.
+
+        Args:
+            fn (Callable) : operation, gets its session via group_session() (the service does this in _get_session)
+            *args, **kwargs : arguments for fn
+
+        Returns:
+            Future : resolved with fn's result after the group commit, or with its exception
+        """
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Queue a write operation and wait for its result (raises its exception)."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def in_writer_thread(self) -> bool:
+        """Whether the caller is the writer thread (i.e. already inside a queued operation)."""
+        return threading.current_thread() is self._thread
+
+    def group_session(self) -> _GroupSession:
+        """Session of the operation currently executed (writer thread only)."""
+        return self._local.session
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters: operations, groups, failed operations/groups and average group size."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["avg_group_size"] = round(stats["operations"] / stats["groups"], 2) if stats["groups"] else 0
+        return stats
+
+    def close(self) -> None:
+        """Finish queued operations and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+        self._engine.dispose()
+
+    # ---------- writer thread ----------
+
+    def _collect_group(self, first) -> list:
+        """First operation plus whatever arrives within max_wait, up to max_operations."""
+        group = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(group) < self.max_operations:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:  # close() - put back so the loop ends after this group
+                self._queue.put(None)
+                break
+            group.append(item)
+        return group
+
+    def _run(self) -> None:
+        session = Session(bind=self._engine, autoflush=False)
+        group_session = _GroupSession(session)
+        self._local.session = group_session
+
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            group = self._collect_group(first)
+
+            outcomes = []  # (future, result, exception)
+            for future, fn, args, kwargs in group:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                group_session._begin_operation()
+                try:
+                    result = fn(*args, **kwargs)
+                    group_session._end_operation(failed=False)
+                    outcomes.append((future, result, None))
+                except BaseException as e:
+                    group_session._end_operation(failed=True)
+                    outcomes.append((future, None, e))
+
+            try:
+                session.commit()  # one COMMIT (and fsync) for the whole group
+                commit_error = None
+            except Exception as e:
+                session.rollback()
+                commit_error = e
+                for listener in _rollback_listeners:
+                    listener(str(self._engine.url))
+
+            failed = 0
+            for future, result, error in outcomes:
+                error = error or commit_error
+                if error is not None:
+                    failed += 1
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+            with self._stats_lock:
+                self._stats["operations"] += len(outcomes)
+                self._stats["groups"] += 1
+                self._stats["failed_operations"] += failed
+                self._stats["failed_groups"] += 1 if commit_error else 0
+
+        session.close()
+
+
+_writers: Dict[Optional[str], SingleWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(tenant: Optional[str] = None) -> SingleWriter:
+    """
+    The single writer of a database (created on first use).
+
+    Args:
+        tenant (Optional[str]) : tenant, None for the main database
+
+    Returns:
+        SingleWriter : writer of this database
+    """
+    with _writers_lock:
+        writer = _writers.get(tenant)
+        if writer is None:
+            writer = SingleWriter(tenant)
+            _writers[tenant] = writer
+        return writer
@@ -0,0 +1,164 @@
+"""
+Concurrency stress test of the per-request user context (agent.tool_executor)
+
+Many users run tools and whole agent sessions at the same time - every tool call has to run with the
+permissions of its own user. Probe: deleting a use case that doesn't exist answers with a different
+error per role (reader / maintainer: permission error naming the role, admin: not found), so nothing is changed.
+
+Needs the dummy database (init_dummy_database.py). The agent sessions run against the local stub LLM
+(utils.llm_stub_server), no API key needed.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+
+from utils.llm_stub_server import start_stub_server
+
+PROBE_ID = 99999
+PROBE_MESSAGE = f"Please get rid of use case number {PROBE_ID}"
+
+
+def probe_responder(body):
+    """Stub LLM: first round deletes the probe use case, then answers with the tool result."""
+    messages = body.get("messages", [])
+    if messages and messages[-1].get("role") == "tool":
+        return {"content": messages[-1]["content"]}
+    return {"tool_calls": [{"name": "delete_use_case", "arguments": f'{{"use_case_id": {PROBE_ID}}}'}]}
+
+
+# stub LLM before the agent is imported (the client reads the endpoint at import)
+server = start_stub_server(responder=probe_responder, latency=0.01)
+os.environ.update({"OPENROUTER_BASE_URL": server.base_url, "OPENROUTER_API_KEY": "stress-test",
+                   "LLM_BACKEND": "live", "AGENT_TRACE_FILE": "", "AGENT_REFERENCE_DATA": "0"})
+
+from agent import run_agent, run_agent_async  # noqa: E402
+from agent.tool_executor import execute_tool, get_current_user, set_current_user, user_context  # noqa: E402
+from services.user_service import UserService  # noqa: E402
+
+
+user_service = UserService()
+users = [
+    user_service.authenticate("reader@example.com", "reader123"),
+    user_service.authenticate("maintainer@example.com", "maintainer123"),
+    user_service.authenticate("admin@example.com", "admin123")
+]
+if not all(users):
+    print("Dummy users not found - run init_dummy_database.py first")
+    sys.exit(1)
+
+
+def expected(user, text):
+    """Whether a probe result belongs to user's role."""
+    text = str(text)
+    if user["role"] == "admin":
+        return "not found" in text
+    return f"'{user['role']}' does not have permission" in text
+
+
+failures = []
+failures_lock = threading.Lock()
+
+
+def check(label, user, result):
+    if not expected(user, result):
+        with failures_lock:
+            failures.append(f"{label}: {user['role']} got {str(result)[:100]}")
+
+
+print("=" * 80)
+print("CONCURRENT USER CONTEXT STRESS TEST")
+print("=" * 80)
+
+# Test 1: threads - every thread sets its user once and calls tools interleaved with the others
+print("\n" + "─" * 80)
+print("TEST 1: 24 threads x 50 tool calls, users set per thread")
+print("─" * 80)
+
+
+def thread_worker(user):
+    set_current_user(user)
+    for _ in range(50):
+        time.sleep(random.random() / 1000)
+        check("thread", user, execute_tool("delete_use_case", {"use_case_id": PROBE_ID}))
+
+
+threads = [threading.Thread(target=thread_worker, args=(users[n % 3],)) for n in range(24)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+print(f"1200 tool calls, {len(failures)} with the wrong user")
+
+# Test 2: asyncio tasks - user set per task, tools run in asyncio.to_thread workers
+print("\n" + "─" * 80)
+print("TEST 2: 60 asyncio tasks x 20 tool calls in worker threads")
+print("─" * 80)
+
+
+async def task_worker(user):
+    set_current_user(user)
+    for _ in range(20):
+        await asyncio.sleep(random.random() / 1000)
+        result = await asyncio.to_thread(execute_tool, "delete_use_case", {"use_case_id": PROBE_ID})
+        check("task", user, result)
+
+
+async def run_tasks():
+    await asyncio.gather(*(task_worker(users[n % 3]) for n in range(60)))
+
+before = len(failures)
+asyncio.run(run_tasks())
+print(f"1200 tool calls, {len(failures) - before} with the wrong user")
+
+# Test 3: whole agent sessions at once (async agent: LLM rounds, parallel tool execution)
+print("\n" + "─" * 80)
+print("TEST 3: 30 concurrent async agent sessions")
+print("─" * 80)
+
+
+async def agent_session(user):
+    with user_context(user):
+        answer = await run_agent_async(PROBE_MESSAGE, use_cache=False)
+        check("async agent", user, answer)
+
+
+async def run_sessions():
+    await asyncio.gather(*(agent_session(users[n % 3]) for n in range(30)))
+
+before = len(failures)
+asyncio.run(run_sessions())
+print(f"30 sessions, {len(failures) - before} answered with the wrong user")
+
+# Test 4: sync agent sessions in threads
+print("\n" + "─" * 80)
+print("TEST 4: 12 concurrent sync agent sessions (threads)")
+print("─" * 80)
+
+
+def sync_session(user):
+    with user_context(user):
+        check("sync agent", user, run_agent(PROBE_MESSAGE, use_cache=False))
+
+
+before = len(failures)
+threads = [threading.Thread(target=sync_session, args=(users[n % 3],)) for n in range(12)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+print(f"12 sessions, {len(failures) - before} answered with the wrong user")
+
+# the main thread never set a user
+assert get_current_user() is None, "user leaked into the main thread"
+server.shutdown()
+
+print("\n" + "=" * 80)
+for failure in failures[:10]:
+    print(f"FAILED {failure}")
+print("CONCURRENCY TESTS " + ("PASSED" if not failures else f"FAILED ({len(failures)} wrong user(s))"))
+print("=" * 80)
+sys.exit(1 if failures else 0)
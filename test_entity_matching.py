@@ -0,0 +1,85 @@
+"""
+Tests of the name matching of find_or_create_company / find_or_create_person and resolve_entity
+
+Runs on a tenant database in a temporary folder (created on first use), the real databases are not touched.
+
+1. find_or_create_* reuse an entry only if the name is the same after normalization (legal forms, titles,
+   case, punctuation): "E.ON SE" == "E.ON", "Dr. Anna Schmidt" == "Anna Schmidt"
+2. similar but different names are not merged ("Michaela Weber" vs "Michael Weber" scores above 0.8)
+3. resolve_entity still suggests the similar entry as best_match
+"""
+
+import os
+import sys
+import tempfile
+
+# temporary tenant folder before models.base reads it
+os.environ["USE_CASE_TENANT_DIR"] = tempfile.mkdtemp(prefix="entity_matching_test_")
+
+from services import UseCaseService  # noqa: E402
+
+TENANT = "entity_matching_test"
+admin = {"id": 1, "email": "admin@example.com", "role": "admin", "name": "Admin", "tenant": TENANT}
+service = UseCaseService(single_writer=False)
+
+failures = []
+
+
+def check(label, condition, detail=""):
+    print(f"   {'OK    ' if condition else 'FAILED'} {label}" + (f" ({detail})" if detail and not condition else ""))
+    if not condition:
+        failures.append(label)
+
+
+eon = service.find_or_create_company("E.ON", "Energy", current_user=admin)
+siemens = service.find_or_create_company("Siemens Energy", "Energy", current_user=admin)
+persons = {name: service.find_or_create_person(name, "Engineer", eon["id"], current_user=admin)
+           for name in ["Anna Schmidt", "Michael Weber", "Daniel Fischer", "Thomas Klein"]}
+
+print("=" * 80)
+print("ENTITY MATCHING TESTS")
+print("=" * 80)
+
+# Test 1: same normalized name
+print("\n" + "─" * 80)
+print("TEST 1: same name after normalization is reused")
+print("─" * 80)
+
+check("'E.ON SE' reuses 'E.ON'", service.find_or_create_company("E.ON SE", "Energy", current_user=admin)["id"] == eon["id"])
+check("'e.on' reuses 'E.ON'", service.find_or_create_company("e.on", "Energy", current_user=admin)["id"] == eon["id"])
+person = service.find_or_create_person("Dr. Anna Schmidt", "Head of R&D", eon["id"], current_user=admin)
+check("'Dr. Anna Schmidt' reuses 'Anna Schmidt' (role updated)",
+      person["id"] == persons["Anna Schmidt"]["id"] and person["role"] == "Head of R&D", str(person))
+other_company = service.find_or_create_person("Anna Schmidt", "Engineer", siemens["id"], current_user=admin)
+check("same name at another company is another person", other_company["id"] != persons["Anna Schmidt"]["id"])
+
+# Test 2: near misses
+print("\n" + "─" * 80)
+print("TEST 2: similar but different names are not merged")
+print("─" * 80)
+
+for new_name, existing in [("Michaela Weber", "Michael Weber"), ("Daniela Fischer", "Daniel Fischer"),
+                           ("Thomas Kleine", "Thomas Klein"), ("Weber Michael", "Michael Weber")]:
+    person = service.find_or_create_person(new_name, "Engineer", eon["id"], current_user=admin)
+    check(f"'{new_name}' is not merged into '{existing}'",
+          person["id"] != persons[existing]["id"] and person["name"] == new_name, str(person))
+
+company = service.find_or_create_company("Siemens Energies", "Energy", current_user=admin)
+check("'Siemens Energies' is not merged into 'Siemens Energy'", company["id"] != siemens["id"], str(company))
+
+# Test 3: suggestions
+print("\n" + "─" * 80)
+print("TEST 3: resolve_entity suggestions")
+print("─" * 80)
+
+resolved = service.resolve_entity("person", "Michaele Weber", company_id=eon["id"], current_user=admin)
+names = [candidate["name"] for candidate in resolved["candidates"]]
+check("similar names are suggested as candidates", "Michael Weber" in names and "Michaela Weber" in names, str(names))
+resolved = service.resolve_entity("company", "E.ON SE", current_user=admin)
+check("same normalized name is the best match", (resolved["best_match"] or {}).get("id") == eon["id"],
+      str(resolved["best_match"]))
+
+print("\n" + "=" * 80)
+print("ENTITY MATCHING TESTS " + ("PASSED" if not failures else f"FAILED ({len(failures)})"))
+print("=" * 80)
+sys.exit(1 if failures else 0)
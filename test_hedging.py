@@ -0,0 +1,258 @@
+"""
+Tests of the circuit breaker and of hedged / fallback LLM calls (agent.hedging)
+
+Deterministic: short breaker windows, a fixed hedge deadline of 50 ms and fake send functions with fixed delays
+instead of the LLM.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# fixed hedge deadline (the percentile needs more samples than any test produces)
+os.environ.update({"AGENT_HEDGE_DELAY": "0.05", "AGENT_HEDGE_MIN_DELAY": "0.05", "AGENT_HEDGE_MIN_SAMPLES": "100000"})
+os.environ.setdefault("OPENROUTER_API_KEY", "hedging-test")  # the agent package creates its client at import
+
+import httpx  # noqa: E402
+import openai  # noqa: E402
+
+import agent.hedging as hedging  # noqa: E402
+from agent.hedging import CircuitBreaker, Hedger  # noqa: E402
+
+FALLBACKS = {"large": "small", "small": "large"}
+SLOW = 0.4
+
+failures = []
+
+
+def check(label, condition, detail=""):
+    print(f"   {'OK    ' if condition else 'FAILED'} {label}" + (f" ({detail})" if detail and not condition else ""))
+    if not condition:
+        failures.append(label)
+
+
+class FakeModel:
+    """send function for the hedger: per model a delay, a connection error or an HTTP error, records every request."""
+
+    def __init__(self, delays=None, failing=(), slow_once=False, status=None):
+        self.delays = delays or {}
+        self.failing = set(failing)
+        self.status = status or {}  # model -> HTTP status of an API error
+        self.slow_once = slow_once  # only the first request is slow (a hedge to the same model is fast)
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def _start(self, model):
+        with self._lock:
+            self.requests.append(model)
+            number = len(self.requests)
+        delay = self.delays.get(model, 0) if number == 1 or not self.slow_once else 0
+        return number, delay
+
+    def _response(self, model, number):
+        if model in self.failing:
+            raise ConnectionError(f"{model} unavailable")
+        if model in self.status:
+            response = httpx.Response(self.status[model], request=httpx.Request("POST", "https://llm.test/v1/chat"))
+            raise openai.APIStatusError(f"{model}: HTTP {self.status[model]}", response=response, body=None)
+        return f"response {number} from {model}"
+
+    def __call__(self, model):
+        number, delay = self._start(model)
+        time.sleep(delay)
+        return self._response(model, number)
+
+    async def send_async(self, model):
+        number, delay = self._start(model)
+        await asyncio.sleep(delay)
+        return self._response(model, number)
+
+
+print("=" * 80)
+print("CIRCUIT BREAKER / HEDGING TESTS")
+print("=" * 80)
+
+# Test 1: breaker state machine
+print("\n" + "─" * 80)
+print("TEST 1: circuit breaker open, half open, closed")
+print("─" * 80)
+
+breaker = CircuitBreaker(error_rate=0.5, window=5, min_calls=4, cooldown=0.2)
+for _ in range(3):
+    breaker.record("m", False)
+check("stays closed below the minimum number of calls", breaker.state("m") == "closed")
+breaker.record("m", False)
+check("opens at the error rate", breaker.state("m") == "open")
+check("open circuit skips calls", not breaker.allow("m") and breaker.stats()["skipped"] == 1)
+
+breaker.record("m", True)  # call that started before the circuit opened
+check("late result while open doesn't close it", breaker.state("m") == "open" and breaker.stats()["closed"] == 0)
+
+time.sleep(0.25)
+check("half open after the cooldown", breaker.state("m") == "half_open")
+check("half open: exactly one trial call", breaker.allow("m") and not breaker.allow("m"))
+breaker.record("m", False)
+check("failed trial reopens", breaker.state("m") == "open")
+
+time.sleep(0.25)
+check("trial slot after the next cooldown", breaker.allow("m"))
+breaker.record("m", True)
+check("successful trial closes", breaker.state("m") == "closed" and breaker.stats()["closed"] == 1)
+breaker.record("m", False)
+check("closed with a fresh window (old errors forgotten)", breaker.state("m") == "closed")
+
+window_breaker = CircuitBreaker(error_rate=0.5, window=0.2, min_calls=4, cooldown=10)
+for _ in range(3):
+    window_breaker.record("m", False)
+time.sleep(0.25)
+window_breaker.record("m", False)
+check("errors older than the window don't count", window_breaker.state("m") == "closed")
+
+# Test 2: hedged sync calls
+print("\n" + "─" * 80)
+print("TEST 2: hedging (sync)")
+print("─" * 80)
+
+hedger = Hedger(enabled=True, fallbacks=FALLBACKS, breaker=CircuitBreaker(min_calls=100))
+fake = FakeModel()
+response, model = hedger.call("large", fake)
+check("fast call: no hedge", model == "large" and fake.requests == ["large"] and hedger.stats()["hedged"] == 0)
+
+fake = FakeModel(delays={"large": SLOW}, slow_once=True)
+discarded = []
+started = time.perf_counter()
+response, model = hedger.call("large", fake, discard=discarded.append)
+elapsed = time.perf_counter() - started
+check("slow call hedged to the same model, hedge wins",
+      response == "response 2 from large" and fake.requests == ["large", "large"], f"{response}, {fake.requests}")
+check("answered after the deadline, not after the slow request", elapsed < SLOW / 2, f"{elapsed:.3f} s")
+time.sleep(SLOW)
+check("slower response discarded when it arrives", discarded == ["response 1 from large"], str(discarded))
+check("hedge counted", hedger.stats()["hedged"] == 1 and hedger.stats()["hedge_wins"] == 1, str(hedger.stats()))
+
+hedging.HEDGE_TO_FALLBACK = True
+try:
+    fake = FakeModel(delays={"large": SLOW})
+    response, model = hedger.call("large", fake)
+    check("hedge to the fallback model wins", model == "small" and fake.requests == ["large", "small"],
+          f"{model}, {fake.requests}")
+finally:
+    hedging.HEDGE_TO_FALLBACK = False
+
+fake = FakeModel(delays={"large": 0.1})
+response, model = Hedger(enabled=False, fallbacks=FALLBACKS).call("large", fake)
+check("hedging disabled: one request", fake.requests == ["large"] and model == "large")
+
+# Test 3: fallback chain and breaker
+print("\n" + "─" * 80)
+print("TEST 3: fallback chain and circuit breaker")
+print("─" * 80)
+
+breaker = CircuitBreaker(error_rate=0.5, window=5, min_calls=2, cooldown=10)
+hedger = Hedger(enabled=True, fallbacks=FALLBACKS, breaker=breaker)
+fake = FakeModel(failing={"large"})
+response, model = hedger.call("large", fake)
+check("failed call falls back", model == "small" and fake.requests == ["large", "small"] and hedger.stats()["fallbacks"] == 1)
+hedger.call("large", fake)
+check("breaker opened after repeated failures", breaker.state("large") == "open")
+
+fake = FakeModel(failing={"large"})
+response, model = hedger.call("large", fake)
+check("open circuit: straight to the fallback", fake.requests == ["small"] and model == "small", str(fake.requests))
+
+fake = FakeModel(failing={"large", "small"})
+try:
+    hedger.call("small", fake)
+    check("error raised when every model fails", False)
+except ConnectionError as e:
+    check("error raised when every model fails", "unavailable" in str(e))
+check("large not tried while open", fake.requests == ["small"], str(fake.requests))
+
+all_open = CircuitBreaker(min_calls=1, cooldown=10)
+all_open.record("large", False)
+all_open.record("small", False)
+fake = FakeModel()
+response, model = Hedger(enabled=True, fallbacks=FALLBACKS, breaker=all_open).call("large", fake)
+check("all circuits open: the last model of the chain is still tried", fake.requests == ["small"] and model == "small",
+      str(fake.requests))
+
+# Test 4: client errors
+print("\n" + "─" * 80)
+print("TEST 4: client errors are raised, not retried on the fallback")
+print("─" * 80)
+
+breaker = CircuitBreaker(error_rate=0.5, window=5, min_calls=2, cooldown=0.2)
+hedger = Hedger(enabled=True, fallbacks=FALLBACKS, breaker=breaker)
+for status in (400, 401, 422):
+    fake = FakeModel(status={"large": status})
+    try:
+        hedger.call("large", fake)
+        check(f"{status} raised", False)
+    except openai.APIStatusError as e:
+        check(f"{status} raised without fallback", e.status_code == status and fake.requests == ["large"],
+              str(fake.requests))
+check("client errors don't open the circuit", breaker.state("large") == "closed" and hedger.stats()["fallbacks"] == 0)
+check("client errors counted", hedger.stats()["client_errors"] == 3 and hedger.stats()["errors"] == 0,
+      str(hedger.stats()))
+
+for status in (429, 503):
+    fake = FakeModel(status={"large": status})
+    response, model = hedger.call("large", fake)
+    check(f"{status} falls back", model == "small" and fake.requests == ["large", "small"], str(fake.requests))
+check("429 / 5xx open the circuit", breaker.state("large") == "open")
+
+time.sleep(0.25)
+fake = FakeModel(status={"large": 400})
+try:
+    hedger.call("large", fake)
+except openai.APIStatusError:
+    pass
+check("client error of the half open trial call frees the trial slot",
+      breaker.state("large") == "half_open" and breaker.allow("large"))
+
+# Test 5: hedged async calls
+print("\n" + "─" * 80)
+print("TEST 5: hedging (async)")
+print("─" * 80)
+
+
+async def async_race():
+    hedger = Hedger(enabled=True, fallbacks=FALLBACKS, breaker=CircuitBreaker(min_calls=100))
+    fake = FakeModel(delays={"large": SLOW}, slow_once=True)
+    cancelled = []
+    original = fake.send_async
+
+    async def send(model):
+        try:
+            return await original(model)
+        except asyncio.CancelledError:
+            cancelled.append(model)
+            raise
+
+    started = time.perf_counter()
+    response, model = await hedger.call_async("large", send)
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.01)
+    check("hedge wins", response == "response 2 from large", response)
+    check("answered after the deadline", elapsed < SLOW / 2, f"{elapsed:.3f} s")
+    check("slower request cancelled", cancelled == ["large"], str(cancelled))
+
+    fake = FakeModel(failing={"large"})
+    response, model = await hedger.call_async("large", fake.send_async)
+    check("failed call falls back", model == "small" and fake.requests == ["large", "small"])
+
+    fake = FakeModel(status={"large": 400})
+    try:
+        await hedger.call_async("large", fake.send_async)
+        check("client error raised", False)
+    except openai.APIStatusError:
+        check("client error raised without fallback", fake.requests == ["large"], str(fake.requests))
+
+asyncio.run(async_race())
+
+print("\n" + "=" * 80)
+print("HEDGING TESTS " + ("PASSED" if not failures else f"FAILED ({len(failures)})"))
+print("=" * 80)
+sys.exit(1 if failures else 0)
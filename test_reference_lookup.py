@@ -0,0 +1,77 @@
+"""
+Check against the real model that a create needs no lookup round when the request carries the reference data map
+(agent.reference_data): the ids of "E.ON" and "Energy" are in the map, so the model should call create_use_case in
+its first round, without get_all_companies / get_all_industries / resolve_entity.
+
+The benchmark (benchmarks/agent_benchmark.py) only assumes this; this script measures it on recorded completions:
+
+    # record the real completions once (needs OPENROUTER_API_KEY and network)
+    LLM_BACKEND=record LLM_CASSETTE=cassettes/reference_lookup.json python test_reference_lookup.py
+    # replay them (no network)
+    LLM_BACKEND=replay LLM_CASSETTE=cassettes/reference_lookup.json python test_reference_lookup.py
+
+Runs on a tenant database in a temporary folder with fixed content, so the recorded requests match on replay.
+"""
+
+import os
+import sys
+import tempfile
+
+# temporary tenant folder before models.base reads it; settings that would change or duplicate the requests
+os.environ["USE_CASE_TENANT_DIR"] = tempfile.mkdtemp(prefix="reference_lookup_test_")
+os.environ.setdefault("LLM_CASSETTE", os.path.join("cassettes", "reference_lookup.json"))
+os.environ.update({"AGENT_TRACE_FILE": "", "AGENT_REFERENCE_DATA": "1", "AGENT_FAST_PATH": "0",
+                   "AGENT_RESPONSE_CACHE": "0", "AGENT_HEDGING": "0", "AGENT_PLAN_MODE": "0"})
+
+if os.getenv("LLM_BACKEND", "live") == "replay" and not os.path.exists(os.environ["LLM_CASSETTE"]):
+    print(f"SKIPPED: no cassette {os.environ['LLM_CASSETTE']} - record one first (see the docstring)")
+    sys.exit(0)
+os.environ.setdefault("OPENROUTER_API_KEY", "replay")  # the agent package creates its client at import
+
+from agent import run_agent  # noqa: E402
+from agent.tool_executor import user_context  # noqa: E402
+from agent.tracing import tracer  # noqa: E402
+from services import UseCaseService  # noqa: E402
+
+TENANT = "reference_lookup_test"
+admin = {"id": 1, "email": "admin@example.com", "role": "admin", "name": "Admin", "tenant": TENANT}
+LOOKUP_TOOLS = {"get_all_industries", "get_all_companies", "get_all_persons", "resolve_entity"}
+
+service = UseCaseService(single_writer=False)
+industry = service.create_industry("Energy", current_user=admin)
+company = service.create_company("E.ON", industry["id"], current_user=admin)
+
+failures = []
+
+
+def check(label, condition, detail=""):
+    print(f"   {'OK    ' if condition else 'FAILED'} {label}" + (f" ({detail})" if detail and not condition else ""))
+    if not condition:
+        failures.append(label)
+
+
+print("=" * 80)
+print("REFERENCE DATA: CREATE WITHOUT LOOKUP ROUND")
+print("=" * 80)
+
+with user_context(admin):
+    answer = run_agent("Create a use case 'Grid Load Forecasting' for E.ON: forecast the grid load from weather "
+                       "data to plan the power plant schedule.", plan=False)
+print(f"\n{answer}\n")
+
+trace = tracer.get(tracer.recent(1)[0]["trace_id"])
+rounds = [span for span in trace["spans"] if span["kind"] == "llm"]
+tools = [(span["name"], span["attrs"].get("arguments", {})) for span in trace["spans"] if span["kind"] == "tool"]
+print(f"   LLM rounds: {len(rounds)}, tool calls: {[name for name, _ in tools]}")
+
+check("no lookup tool called", not LOOKUP_TOOLS & {name for name, _ in tools})
+creates = [arguments for name, arguments in tools if name == "create_use_case"]
+check("create_use_case called with the ids from the reference data",
+      len(creates) == 1 and int(creates[0].get("company_id", 0)) == company["id"]
+      and int(creates[0].get("industry_id", 0)) == industry["id"], str(creates))
+check("two LLM rounds (create, answer)", len(rounds) == 2, f"{len(rounds)} rounds")
+
+print("\n" + "=" * 80)
+print("REFERENCE LOOKUP CHECK " + ("PASSED" if not failures else f"FAILED ({len(failures)})"))
+print("=" * 80)
+sys.exit(1 if failures else 0)
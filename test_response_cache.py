@@ -0,0 +1,186 @@
+"""
+Tests of the agent answer cache (agent.response_cache)
+
+1. the cache rules on ResponseCache directly: an answer is only stored if the data version didn't change during
+   the run, a later write makes it stale, concurrent identical requests run once (single-flight)
+2. end to end against the local stub LLM (utils.llm_stub_server): concurrent identical requests of the sync and
+   the async agent send one LLM request, a run during which data was written is not served from the cache
+
+Writes are real write statements on an in-memory SQLite database (every engine bumps the data version).
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from utils.llm_stub_server import start_stub_server
+
+QUESTION = "Which of our ideas would you recommend to start with?"
+WRITING_QUESTION = "Which idea would you recommend after the latest changes?"
+
+scratch = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+scratch_lock = threading.Lock()  # one shared connection: concurrent transactions would interleave
+with scratch.begin() as connection:
+    connection.execute(text("CREATE TABLE scratch (n INTEGER)"))
+
+
+def write():
+    """A real write statement and commit: bumps models.base.data_version."""
+    with scratch_lock, scratch.begin() as connection:
+        connection.execute(text("INSERT INTO scratch VALUES (1)"))
+
+
+llm_requests = {}
+llm_lock = threading.Lock()
+
+
+def counting_responder(body):
+    """Stub LLM: counts requests per question, writes data while answering WRITING_QUESTION."""
+    question = [m["content"] for m in body.get("messages", []) if m.get("role") == "user"][-1]
+    with llm_lock:
+        llm_requests[question] = llm_requests.get(question, 0) + 1
+    if question == WRITING_QUESTION:
+        write()
+    return {"content": f"Answer to: {question}"}
+
+
+# stub LLM before the agent is imported (the client reads the endpoint at import)
+server = start_stub_server(responder=counting_responder, latency=0.2)
+os.environ.update({"OPENROUTER_BASE_URL": server.base_url, "OPENROUTER_API_KEY": "cache-test", "LLM_BACKEND": "live",
+                   "AGENT_TRACE_FILE": "", "AGENT_REFERENCE_DATA": "0", "AGENT_FAST_PATH": "0",
+                   "AGENT_RESPONSE_CACHE": "1"})
+
+from agent import run_agent, run_agent_async  # noqa: E402
+from agent.response_cache import ResponseCache, response_cache  # noqa: E402
+
+failures = []
+
+
+def check(label, condition, detail=""):
+    print(f"   {'OK    ' if condition else 'FAILED'} {label}" + (f" ({detail})" if detail and not condition else ""))
+    if not condition:
+        failures.append(label)
+
+
+class CountingRun:
+    """run function for get_or_run: counts runs, optionally slow or writing."""
+
+    def __init__(self, seconds=0.0, writes=False):
+        self.seconds = seconds
+        self.writes = writes
+        self.runs = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.runs += 1
+            number = self.runs
+        time.sleep(self.seconds)
+        if self.writes:
+            write()
+        return f"answer {number}"
+
+
+def in_threads(count, target):
+    results = [None] * count
+
+    def worker(index):
+        results[index] = target()
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+print("=" * 80)
+print("RESPONSE CACHE TESTS")
+print("=" * 80)
+
+# Test 1: data version rules
+print("\n" + "─" * 80)
+print("TEST 1: answers are only stored if no data was written during the run")
+print("─" * 80)
+
+cache = ResponseCache(enabled=True)
+run = CountingRun()
+first, second = cache.get_or_run("key", run), cache.get_or_run("key", run)
+check("answer stored and served", run.runs == 1 and first == second == "answer 1" and cache.stats()["hits"] == 1)
+
+write()
+check("write after storing makes the answer stale",
+      cache.get_or_run("key", run) == "answer 2" and cache.stats()["stale"] == 1)
+
+run = CountingRun(writes=True)
+cache.get_or_run("writing", run)
+cache.get_or_run("writing", run)
+check("write during the run: not stored", run.runs == 2 and cache.stats()["not_cacheable"] == 2, str(cache.stats()))
+
+run = CountingRun(seconds=0.1)
+other_request = threading.Timer(0.03, write)  # another request writes meanwhile
+other_request.start()
+cache.get_or_run("concurrent write", run)
+other_request.join()
+cache.get_or_run("concurrent write", run)
+check("write by another request during the run: not stored", run.runs == 2, f"{run.runs} runs")
+
+# Test 2: single-flight
+print("\n" + "─" * 80)
+print("TEST 2: single-flight")
+print("─" * 80)
+
+cache = ResponseCache(enabled=True)
+run = CountingRun(seconds=0.2)
+answers = in_threads(8, lambda: cache.get_or_run("same", run))
+check("8 concurrent identical requests: one run", run.runs == 1 and set(answers) == {"answer 1"}, f"{run.runs} runs")
+check("7 coalesced", cache.stats()["coalesced"] == 7, str(cache.stats()))
+
+run = CountingRun(seconds=0.2, writes=True)
+answers = in_threads(4, lambda: cache.get_or_run("same writing", run))
+check("leader wrote data: the others run on their own", run.runs == 4, f"{run.runs} runs")
+
+run = CountingRun(seconds=0.1)
+in_threads(4, lambda: cache.get_or_run(f"key {threading.get_ident()}", run))
+check("different keys are not coalesced", run.runs == 4, f"{run.runs} runs")
+
+# Test 3: agent end to end
+print("\n" + "─" * 80)
+print("TEST 3: agent against the stub LLM")
+print("─" * 80)
+
+response_cache.clear()
+answers = in_threads(6, lambda: run_agent(QUESTION))
+check("6 concurrent sync requests: one LLM request", llm_requests.get(QUESTION) == 1 and len(set(answers)) == 1,
+      f"{llm_requests.get(QUESTION)} requests")
+run_agent(QUESTION)
+check("repeated request served from the cache", llm_requests.get(QUESTION) == 1)
+
+response_cache.clear()
+llm_requests.clear()
+
+
+async def concurrent_async(count):
+    return await asyncio.gather(*(run_agent_async(QUESTION) for _ in range(count)))
+
+answers = asyncio.run(concurrent_async(6))
+check("6 concurrent async requests: one LLM request", llm_requests.get(QUESTION) == 1 and len(set(answers)) == 1,
+      f"{llm_requests.get(QUESTION)} requests")
+
+run_agent(WRITING_QUESTION)
+run_agent(WRITING_QUESTION)
+check("data written during the run: the next request goes to the LLM again", llm_requests.get(WRITING_QUESTION) == 2,
+      f"{llm_requests.get(WRITING_QUESTION)} requests")
+
+server.shutdown()
+
+print("\n" + "=" * 80)
+print("RESPONSE CACHE TESTS " + ("PASSED" if not failures else f"FAILED ({len(failures)})"))
+print("=" * 80)
+sys.exit(1 if failures else 0)
@@ -0,0 +1,132 @@
+"""
+Tests of the argument checks and coercion of tool calls (agent.tool_validation)
+
+Validates calls against the real tool schemas; nothing touches the database or the LLM.
+"""
+
+import os
+import sys
+
+os.environ.setdefault("OPENROUTER_API_KEY", "validation-test")  # the agent package creates its client at import
+
+from agent.tool_validation import ToolArgumentError, ToolArgumentValidator  # noqa: E402
+
+validator = ToolArgumentValidator()
+failures = []
+
+
+def check(label, condition, detail=""):
+    print(f"   {'OK    ' if condition else 'FAILED'} {label}" + (f" ({detail})" if detail and not condition else ""))
+    if not condition:
+        failures.append(label)
+
+
+def valid(label, tool, arguments, expected, coerced=None, ignored=None):
+    """A call that passes, with the checked arguments (and coerced / dropped keys if given)."""
+    try:
+        checked, was_coerced, was_ignored = validator.validate(tool, arguments)
+    except ToolArgumentError as e:
+        check(label, False, f"rejected: {e}")
+        return
+    ok = checked == expected
+    ok = ok and (coerced is None or was_coerced == coerced) and (ignored is None or was_ignored == ignored)
+    check(label, ok, f"got {checked}, coerced {was_coerced}, ignored {was_ignored}")
+
+
+def invalid(label, tool, arguments, *parts):
+    """A call that is rejected with an error containing all parts."""
+    try:
+        checked, _, _ = validator.validate(tool, arguments)
+    except ToolArgumentError as e:
+        check(label, all(part in str(e) for part in parts), f"message: {e}")
+        return
+    check(label, False, f"accepted: {checked}")
+
+
+print("=" * 80)
+print("TOOL ARGUMENT VALIDATION TESTS")
+print("=" * 80)
+
+print("\n" + "─" * 80)
+print("TEST 1: integers (ids)")
+print("─" * 80)
+valid("int stays", "get_use_case_by_id", {"use_case_id": 5}, {"use_case_id": 5}, coerced=[])
+valid("numeric string", "get_use_case_by_id", {"use_case_id": " 5 "}, {"use_case_id": 5}, coerced=["use_case_id"])
+valid("integral float", "get_use_case_by_id", {"use_case_id": 5.0}, {"use_case_id": 5}, coerced=["use_case_id"])
+valid("string with .0", "get_use_case_by_id", {"use_case_id": "5.00"}, {"use_case_id": 5})
+valid("large numeric string stays exact", "get_use_case_by_id", {"use_case_id": "12345678901234567891"},
+      {"use_case_id": 12345678901234567891})
+invalid("fraction rejected", "get_use_case_by_id", {"use_case_id": 5.5}, "use_case_id: expected an integer")
+invalid("boolean rejected", "get_use_case_by_id", {"use_case_id": True}, "use_case_id: expected an integer")
+invalid("text rejected", "get_use_case_by_id", {"use_case_id": "five"}, "use_case_id: expected an integer")
+
+print("\n" + "─" * 80)
+print("TEST 2: enums and status words")
+print("─" * 80)
+valid("exact value", "update_use_case_status", {"use_case_id": 1, "status": "approved"},
+      {"use_case_id": 1, "status": "approved"}, coerced=[])
+valid("case and spaces normalized", "update_use_case_status", {"use_case_id": 1, "status": "In Progress"},
+      {"use_case_id": 1, "status": "in_progress"}, coerced=["status"])
+valid("hyphen normalized", "update_use_case_status", {"use_case_id": 1, "status": "in-review"},
+      {"use_case_id": 1, "status": "in_review"})
+valid("German status word", "update_use_case_status", {"use_case_id": 1, "status": "genehmigt"},
+      {"use_case_id": 1, "status": "approved"})
+valid("status word 'done'", "update_use_case_status", {"use_case_id": 1, "status": "Done"},
+      {"use_case_id": 1, "status": "completed"})
+invalid("unknown status lists accepted values", "update_use_case_status", {"use_case_id": 1, "status": "paused"},
+        "status: 'paused' is not one of", "in_progress", "archived")
+valid("enum items of an array", "get_all_use_cases", {"fields": ["id", "Title"]}, {"fields": ["id", "title"]})
+
+print("\n" + "─" * 80)
+print("TEST 3: arrays and strings")
+print("─" * 80)
+valid("single value becomes a list", "add_persons_to_use_case", {"use_case_id": 1, "person_ids": "7"},
+      {"use_case_id": 1, "person_ids": [7]}, coerced=["person_ids"])
+invalid("wrong item named by position", "add_persons_to_use_case", {"use_case_id": 1, "person_ids": [1, "x", 3]},
+        "person_ids[1]: expected an integer")
+valid("number becomes a string", "create_industry", {"name": 42}, {"name": "42"}, coerced=["name"])
+
+print("\n" + "─" * 80)
+print("TEST 4: booleans and nested objects (execute_batch)")
+print("─" * 80)
+operation = {"tool": "update_use_case_status", "arguments": {"use_case_id": 3, "status": "approved"}}
+valid("boolean stays", "execute_batch", {"operations": [operation], "atomic": True},
+      {"operations": [operation], "atomic": True}, coerced=[])
+valid("'true' becomes True", "execute_batch", {"operations": [operation], "atomic": "TRUE"},
+      {"operations": [operation], "atomic": True}, coerced=["atomic"])
+valid("0 becomes False", "execute_batch", {"operations": [operation], "atomic": 0},
+      {"operations": [operation], "atomic": False})
+invalid("other value rejected", "execute_batch", {"operations": [operation], "atomic": "maybe"},
+        "atomic: expected true or false")
+valid("unknown key of an object dropped", "execute_batch", {"operations": [dict(operation, note="x")]},
+      {"operations": [operation]}, coerced=["operations"])
+valid("object without properties passes unchanged", "execute_batch",
+      {"operations": [{"tool": "delete_use_case", "arguments": {"anything": [1, 2]}}]},
+      {"operations": [{"tool": "delete_use_case", "arguments": {"anything": [1, 2]}}]})
+invalid("nested problems named by path", "execute_batch",
+        {"operations": [operation, {"tool": "drop_table"}, "delete everything"]},
+        "operations[1].arguments: missing", "operations[1].tool: 'drop_table' is not one of",
+        "operations[2]: expected an object")
+
+print("\n" + "─" * 80)
+print("TEST 5: missing, null and unknown arguments")
+print("─" * 80)
+invalid("missing required argument", "update_use_case_status", {"use_case_id": 1}, "missing required argument 'status'")
+invalid("all problems at once", "create_company", {"industry_id": "x"},
+        "missing required argument 'name'", "industry_id: expected an integer")
+valid("null optional argument means not given", "create_use_case",
+      {"title": "T", "company_id": 1, "industry_id": 1, "description": None},
+      {"title": "T", "company_id": 1, "industry_id": 1})
+valid("unknown argument dropped", "get_use_case_by_id", {"use_case_id": 1, "verbose": True},
+      {"use_case_id": 1}, ignored=["verbose"])
+invalid("error names ignored arguments", "get_use_case_by_id", {"verbose": True},
+        "missing required argument 'use_case_id'", "unknown arguments ignored: verbose")
+valid("tool without schema passes", "no_such_tool", {"x": 1}, {"x": 1})
+
+stats = validator.stats()
+check("stats count calls and rejections", stats["calls"] > 0 and stats["rejected"] > 0 and stats["coerced"] > 0, str(stats))
+
+print("\n" + "=" * 80)
+print("TOOL VALIDATION TESTS " + ("PASSED" if not failures else f"FAILED ({len(failures)})"))
+print("=" * 80)
+sys.exit(1 if failures else 0)
@@ -3,6 +3,7 @@ from services import UseCaseService
 v1_testing = False # base
 v2_testing = False # get perons, get industry, get company -> for second iteration if needed
 v3_testing = True # create industry, create company, create person, find_or_create_company/person
+v4_testing = False # fuzzy entity resolution (resolve_entity, fuzzy find_or_create_*)
 
 if v1_testing:
     print("="*60)
@@ -229,4 +230,40 @@ if v3_testing:
     result = service.add_persons_to_use_case(uc['id'], [person['id']])
     print(f"   ✓ {result}")
 
-    print("\n✓ All tests passed!")
\ No newline at end of file
+    print("\n✓ All tests passed!")
+
+if v4_testing:
+    from services import UseCaseService
+    from services.user_service import UserService
+
+    service = UseCaseService()
+    admin = UserService().authenticate("admin@example.com", "admin123")
+
+    print("="*60)
+    print("TESTING FUZZY ENTITY RESOLUTION")
+    print("="*60)
+
+    # Test 1: legal form is ignored
+    print("\n1. Resolve 'E.ON SE':")
+    resolved = service.resolve_entity("company", "E.ON SE", current_user=admin)
+    print(f"   best match: {resolved['best_match']}")
+
+    # Test 2: title is ignored
+    print("\n2. Resolve 'Dr. Anna Schmidt':")
+    resolved = service.resolve_entity("person", "Dr. Anna Schmidt", current_user=admin)
+    print(f"   best match: {resolved['best_match']}")
+
+    # Test 3: partial name gives candidates but no confident match
+    print("\n3. Resolve 'Siemens':")
+    resolved = service.resolve_entity("company", "Siemens", current_user=admin)
+    print(f"   candidates: {resolved['candidates']}")
+    print(f"   best match: {resolved['best_match']}")
+
+    # Test 4: find_or_create reuses the fuzzy match instead of creating a duplicate
+    print("\n4. find_or_create_company('E.ON SE'):")
+    company = service.find_or_create_company("E.ON SE", "Energy", current_user=admin)
+    print(f"   {company} (expected existing E.ON)")
+
+    print("\n" + "="*60)
+    print("FUZZY TESTS COMPLETE")
+    print("="*60)
@@ -0,0 +1,168 @@
+"""
+Tests of the single-writer queue with group commit (services.write_queue)
+
+Runs on a tenant database in a temporary folder (created on first use), the real databases are not touched.
+Operations are held back behind a blocking operation, so each test knows exactly which operations form a group:
+
+1. group commit: all queued operations are committed as one group
+2. a failing operation only rolls back its own savepoint, the rest of the group is committed
+3. a failing group COMMIT fails every operation of the group, nothing is stored, the fuzzy name
+   index forgets the created entries and the writer keeps working
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# temporary tenant folder before models.base reads it
+os.environ["USE_CASE_TENANT_DIR"] = tempfile.mkdtemp(prefix="write_queue_test_")
+
+from sqlalchemy import event  # noqa: E402
+
+from models import Company, Industry  # noqa: E402
+from models.base import get_session  # noqa: E402
+from services import UseCaseService  # noqa: E402
+from services.write_queue import SingleWriter, get_writer  # noqa: E402
+
+TENANT = "write_queue_test"
+admin = {"id": 1, "email": "admin@example.com", "role": "admin", "name": "Admin", "tenant": TENANT}
+service = UseCaseService(single_writer=True)
+writer = get_writer(TENANT)
+
+failures = []
+
+
+def check(label, condition, detail=""):
+    print(f"   {'OK    ' if condition else 'FAILED'} {label}" + (f" ({detail})" if detail and not condition else ""))
+    if not condition:
+        failures.append(label)
+
+
+def stored(model, name):
+    """Whether a row with this name is committed (read through a separate session)."""
+    db = get_session(TENANT)
+    try:
+        return db.query(model).filter(model.name == name).first() is not None
+    finally:
+        db.close()
+
+
+def run_group(operations):
+    """
+    Queue operations so they form exactly one group: the writer is held by a blocking operation until all
+    of them are queued.
+
+    Returns:
+        list : (result, exception) per operation
+    """
+    release = threading.Event()
+    blocker = writer.submit(release.wait)
+    time.sleep(0.05)  # blocker group collected and running
+    futures = [writer.submit(operation) for operation in operations]
+    release.set()
+    blocker.result()
+
+    outcomes = []
+    for future in futures:
+        try:
+            outcomes.append((future.result(timeout=10), None))
+        except Exception as e:
+            outcomes.append((None, e))
+    return outcomes
+
+
+print("=" * 80)
+print("SINGLE WRITER / GROUP COMMIT TESTS")
+print("=" * 80)
+
+# Test 1: 20 queued operations, one group, one commit
+print("\n" + "─" * 80)
+print("TEST 1: group commit")
+print("─" * 80)
+
+before = writer.stats()
+outcomes = run_group([
+    (lambda n=n: service.create_industry(f"Group Industry {n}", current_user=admin)) for n in range(20)
+])
+after = writer.stats()
+check("all operations succeeded", all(error is None for _, error in outcomes),
+      str([str(error) for _, error in outcomes if error]))
+check("all rows committed", all(stored(Industry, f"Group Industry {n}") for n in range(20)))
+check("20 operations in one group (plus the blocker's group)",
+      after["groups"] - before["groups"] == 2 and after["operations"] - before["operations"] == 21,
+      f"groups +{after['groups'] - before['groups']}, operations +{after['operations'] - before['operations']}")
+
+# Test 2: the failing operation is rolled back alone
+print("\n" + "─" * 80)
+print("TEST 2: savepoint rollback of one failed operation")
+print("─" * 80)
+
+
+def half_done():
+    # writes an industry, then fails (unknown industry): both are undone, the operation's savepoint rolls back
+    service.create_industry("Half Done Industry", current_user=admin)
+    return service.create_company("Half Done Company", 999999, current_user=admin)
+
+
+before = writer.stats()
+outcomes = run_group([
+    lambda: service.create_industry("Savepoint Before", current_user=admin),
+    half_done,
+    lambda: service.create_industry("Savepoint After", current_user=admin)
+])
+after = writer.stats()
+check("failed operation raised its own error", isinstance(outcomes[1][1], ValueError), repr(outcomes[1][1]))
+check("other operations succeeded", outcomes[0][1] is None and outcomes[2][1] is None)
+check("rows of the other operations committed", stored(Industry, "Savepoint Before") and stored(Industry, "Savepoint After"))
+check("partial write of the failed operation rolled back", not stored(Industry, "Half Done Industry"))
+check("counted as failed operation, not as failed group",
+      after["failed_operations"] - before["failed_operations"] == 1 and after["failed_groups"] == before["failed_groups"])
+
+# Test 3: the group COMMIT fails
+print("\n" + "─" * 80)
+print("TEST 3: failed group commit")
+print("─" * 80)
+
+industry_id = service.create_industry("Commit Failure Industry", current_user=admin)["id"]
+service.resolve_entity("company", "anything", current_user=admin)  # builds the fuzzy index of the tenant
+
+
+def fail_commit(conn):
+    raise RuntimeError("simulated commit failure (e.g. disk full)")
+
+
+event.listen(writer._engine, "commit", fail_commit)
+try:
+    before = writer.stats()
+    outcomes = run_group([
+        lambda: service.create_company("Ghost Company", industry_id, current_user=admin),
+        lambda: service.create_industry("Ghost Industry", current_user=admin)
+    ])
+    after = writer.stats()
+finally:
+    event.remove(writer._engine, "commit", fail_commit)
+
+check("every operation of the group failed with the commit error",
+      all(error is not None and "simulated commit failure" in str(error) for _, error in outcomes))
+check("nothing stored", not stored(Company, "Ghost Company") and not stored(Industry, "Ghost Industry"))
+check("counted as failed group", after["failed_groups"] - before["failed_groups"] == 1)
+match = service.resolve_entity("company", "Ghost Company", current_user=admin)["best_match"]
+check("fuzzy index doesn't return the rolled back company", match is None, str(match))
+check("writer keeps working", service.create_industry("After Failure", current_user=admin)["name"] == "After Failure")
+
+# Test 4: a separate writer stops after finishing its queue
+print("\n" + "─" * 80)
+print("TEST 4: close() finishes queued operations")
+print("─" * 80)
+
+own_writer = SingleWriter(TENANT)
+futures = [own_writer.submit(lambda n=n: n) for n in range(10)]
+own_writer.close()
+check("queued operations finished before close", [future.result(timeout=1) for future in futures] == list(range(10)))
+
+print("\n" + "=" * 80)
+print("WRITE QUEUE TESTS " + ("PASSED" if not failures else f"FAILED ({len(failures)})"))
+print("=" * 80)
+sys.exit(1 if failures else 0)
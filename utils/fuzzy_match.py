@@ -0,0 +1,155 @@
+"""
+Trigram index for fuzzy name matching.
+Used to resolve company and person names ("E.ON SE" vs "E.ON", "Dr. Anna Schmidt" vs "Anna Schmidt")
+to existing database entries instead of creating duplicates.
+"""
+
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Any
+
+# tokens that carry no identity and are dropped before matching
+# legal forms for companies, academic/courtesy titles for persons
+IGNORED_TOKENS = {
+    "ag", "se", "gmbh", "mbh", "kg", "kgaa", "co", "ohg", "ug", "ev", "inc", "ltd", "llc", "corp", "plc", "sa",
+    "dr", "prof", "med", "ing", "dipl", "herr", "frau", "mr", "mrs", "ms",
+}
+
+GERMAN_TRANSLITERATION = {"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"}
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize a name for matching: lowercase, strip accents and punctuation,
+    drop legal forms and titles.
+
+    Args:
+        name (str) : raw name
+
+    Returns:
+        str : normalized name, words separated by single spaces
+    """
+    if not name:
+        return ""
+
+    # german umlauts -> transliteration ("Müller" == "Mueller"), other accents -> base letters
+    text = name.lower()
+    for umlaut, replacement in GERMAN_TRANSLITERATION.items():
+        text = text.replace(umlaut, replacement)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+
+    # punctuation -> space ("e.on" -> "e on")
+    words = re.sub(r"[^a-z0-9]+", " ", text).split()
+    kept = [w for w in words if w not in IGNORED_TOKENS]
+
+    # a name consisting only of ignored tokens is still a name
+    return " ".join(kept or words)
+
+
+def trigrams(name: str) -> Set[str]:
+    """
+    Build the trigram set of a name (pg_trgm style: each word padded with two leading and one trailing blank).
+
+    Args:
+        name (str) : raw name
+
+    Returns:
+        Set[str] : trigrams of the normalized name
+    """
+    grams = set()
+    for word in normalize_name(name).split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class TrigramIndex:
+    """
+    Inverted index trigram -> entry ids.
+
+    Lookups only touch the posting lists of the query's trigrams, so the cost depends on how many
+    entries share trigrams with the query, not on the total number of entries.
+    Thread safe, entries can be added while the app is running.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._grams: Dict[int, Set[str]] = {}
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, entry_id: int, name: str, **attributes) -> None:
+        """
+        Add or replace an entry.
+
+        Args:
+            entry_id (int) : database id of the entry
+            name (str) : name to index
+            **attributes : extra data returned with candidates (e.g. company_id)
+        """
+        grams = trigrams(name)
+        with self._lock:
+            self._remove_unlocked(entry_id)
+            self._grams[entry_id] = grams
+            self._entries[entry_id] = {"id": entry_id, "name": name, **attributes}
+            for gram in grams:
+                self._postings[gram].add(entry_id)
+
+    def remove(self, entry_id: int) -> None:
+        """Remove an entry if it is indexed."""
+        with self._lock:
+            self._remove_unlocked(entry_id)
+
+    def _remove_unlocked(self, entry_id: int) -> None:
+        for gram in self._grams.pop(entry_id, ()):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(entry_id)
+                if not posting:
+                    del self._postings[gram]
+        self._entries.pop(entry_id, None)
+
+    def search(self, name: str, limit: int = 5, min_score: float = 0.3, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Find the entries most similar to a name.
+
+        Args:
+            name (str) : name to look up
+            limit (int) : maximum number of candidates returned, default 5
+            min_score (float) : minimum similarity (0..1) for a candidate, default 0.3
+            where (Optional[dict]) : attribute filter, e.g. {"company_id": 3}
+
+        Returns:
+            List[Dict[str, Any]] : candidates sorted by score (best first), each entry dict plus "score"
+        """
+        query = trigrams(name)
+        if not query:
+            return []
+
+        with self._lock:
+            # count shared trigrams, only for entries that share at least one
+            shared: Dict[int, int] = defaultdict(int)
+            for gram in query:
+                for entry_id in self._postings.get(gram, ()):
+                    shared[entry_id] += 1
+
+            candidates = []
+            for entry_id, common in shared.items():
+                entry = self._entries[entry_id]
+                if where and any(entry.get(key) != value for key, value in where.items()):
+                    continue
+
+                # jaccard similarity of the trigram sets
+                score = common / (len(query) + len(self._grams[entry_id]) - common)
+                if score >= min_score:
+                    candidates.append({**entry, "score": round(score, 3)})
+
+        candidates.sort(key=lambda c: (-c["score"], c["id"]))
+        return candidates[:limit]
@@ -0,0 +1,227 @@
+"""
+Record/replay backend for the LLM calls (agent, async agent, history summary, transcript extraction).
+Sits below the OpenAI clients as an httpx transport (see agent.llm_client), so every caller is covered
+without changes:
+
+    LLM_BACKEND=live     default, calls OpenRouter
+    LLM_BACKEND=record   calls OpenRouter and stores every request/response pair in the cassette
+    LLM_BACKEND=replay   answers from the cassette only (no network, deterministic); unknown requests fail
+                         with a 404 API error
+
+LLM_CASSETTE is the cassette file (JSON). Requests are matched by method, endpoint and the canonical JSON body
+(model, messages, tools, ...); the same request recorded several times is replayed in recorded order.
+
+    LLM_BACKEND=record LLM_CASSETTE=cassettes/test_agent.json python test_agent.py
+    LLM_BACKEND=replay LLM_CASSETTE=cassettes/test_agent.json python test_agent.py
+"""
+
+import functools
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# live | record | replay
+LLM_BACKEND = os.getenv("LLM_BACKEND", "live")
+LLM_CASSETTE = os.getenv("LLM_CASSETTE", os.path.join("cassettes", "llm.json"))
+
+BACKENDS = ("live", "record", "replay")
+
+# response headers kept in the cassette (the body is stored decoded)
+_KEPT_HEADERS = ("content-type",)
+
+
+class CassetteMiss(RuntimeError):
+    """Raised in replay mode for a request that is not in the cassette."""
+    pass
+
+
+def request_key(method: str, path: str, body: bytes) -> str:
+    """
+    Match key of a request: method, endpoint (path after /v1/) and the canonical JSON body.
+
+    Args:
+        method (str) : HTTP method
+        path (str) : URL path (e.g. /api/v1/chat/completions)
+        body (bytes) : request body
+
+    Returns:
+        str : sha256 hex digest
+    """
+    endpoint = path.rsplit("/v1/", 1)[-1]
+    try:
+        canonical = json.dumps(json.loads(body or b"null"), sort_keys=True, ensure_ascii=False)
+    except ValueError:
+        canonical = body.decode("utf-8", errors="replace")
+    return hashlib.sha256(f"{method} {endpoint} {canonical}".encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    Recorded request/response pairs of one cassette file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._interactions: Dict[str, List[Dict[str, Any]]] = {}
+        self._positions: Dict[str, int] = {}  # key -> next response to replay
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for interaction in json.load(file).get("interactions", []):
+                    self._interactions.setdefault(interaction["key"], []).append(interaction)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(responses) for responses in self._interactions.values())
+
+    def replay(self, key: str) -> Dict[str, Any]:
+        """
+        Next recorded response for key (the last one again once all were replayed).
+
+        Raises:
+            CassetteMiss: If the request was never recorded
+        """
+        with self._lock:
+            recorded = self._interactions.get(key)
+            if not recorded:
+                raise CassetteMiss(
+                    f"Request not in cassette {self.path} - record it with LLM_BACKEND=record (key {key[:12]})"
+                )
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            return recorded[min(position, len(recorded) - 1)]["response"]
+
+    def record(self, key: str, request: Dict[str, Any], response: Dict[str, Any]) -> None:
+        """Add a request/response pair and write the cassette file."""
+        with self._lock:
+            self._interactions.setdefault(key, []).append({"key": key, "request": request, "response": response})
+            interactions = [interaction for recorded in self._interactions.values() for interaction in recorded]
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as file:
+                json.dump({"version": 1, "interactions": interactions}, file, indent=1, ensure_ascii=False)
+            os.replace(temporary, self.path)
+
+
+@functools.lru_cache(maxsize=None)
+def get_cassette(path: str = LLM_CASSETTE) -> Cassette:
+    """Cassette for path (one instance per file, shared by the sync and the async client)."""
+    return Cassette(path)
+
+
+def _request_summary(request: httpx.Request, body: bytes) -> Dict[str, Any]:
+    try:
+        payload = json.loads(body) if body else None
+    except ValueError:
+        payload = body.decode("utf-8", errors="replace")
+    return {"method": request.method, "path": request.url.path, "body": payload}
+
+
+def _response_entry(response: httpx.Response) -> Dict[str, Any]:
+    return {
+        "status": response.status_code,
+        "headers": {name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers},
+        "body": response.text
+    }
+
+
+def _replayed(entry: Dict[str, Any], request: httpx.Request) -> httpx.Response:
+    return httpx.Response(entry["status"], headers=entry["headers"], content=entry["body"].encode("utf-8"),
+                          request=request)
+
+
+def _replay(cassette: Cassette, key: str, request: httpx.Request) -> httpx.Response:
+    try:
+        return _replayed(cassette.replay(key), request)
+    except CassetteMiss as e:
+        # as an API error, so the caller sees the message instead of a generic connection error
+        return httpx.Response(404, json={"error": {"message": str(e), "type": "cassette_miss"}}, request=request)
+
+
+class RecordReplayTransport(httpx.BaseTransport):
+    """
+    Transport that records the responses of the wrapped transport, or replays them from the cassette.
+    Recorded streaming responses are read completely before they are returned.
+    """
+
+    def __init__(self, cassette: Cassette, mode: str, transport: Optional[httpx.BaseTransport] = None):
+        self.cassette = cassette
+        self.mode = mode
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        body = request.read()
+        key = request_key(request.method, request.url.path, body)
+        if self.mode == "replay":
+            return _replay(self.cassette, key, request)
+
+        response = self.transport.handle_request(request)
+        try:
+            response.read()
+        finally:
+            response.close()
+        entry = _response_entry(response)
+        self.cassette.record(key, _request_summary(request, body), entry)
+        return _replayed(entry, request)
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
+
+
+class AsyncRecordReplayTransport(httpx.AsyncBaseTransport):
+    """Async variant of RecordReplayTransport."""
+
+    def __init__(self, cassette: Cassette, mode: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.cassette = cassette
+        self.mode = mode
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        key = request_key(request.method, request.url.path, body)
+        if self.mode == "replay":
+            return _replay(self.cassette, key, request)
+
+        response = await self.transport.handle_async_request(request)
+        try:
+            await response.aread()
+        finally:
+            await response.aclose()
+        entry = _response_entry(response)
+        self.cassette.record(key, _request_summary(request, body), entry)
+        return _replayed(entry, request)
+
+    async def aclose(self) -> None:
+        if self.transport is not None:
+            await self.transport.aclose()
+
+
+def wrap_transport(transport: httpx.BaseTransport, backend: str = LLM_BACKEND,
+                   cassette_path: str = LLM_CASSETTE) -> httpx.BaseTransport:
+    """
+    Transport for the configured backend (live: transport itself).
+
+    Raises:
+        ValueError: If backend is unknown
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{backend}', expected one of {', '.join(BACKENDS)}")
+    if backend == "live":
+        return transport
+    return RecordReplayTransport(get_cassette(cassette_path), backend, transport if backend == "record" else None)
+
+
+def wrap_async_transport(transport: httpx.AsyncBaseTransport, backend: str = LLM_BACKEND,
+                         cassette_path: str = LLM_CASSETTE) -> httpx.AsyncBaseTransport:
+    """Async variant of wrap_transport."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{backend}', expected one of {', '.join(BACKENDS)}")
+    if backend == "live":
+        return transport
+    return AsyncRecordReplayTransport(get_cassette(cassette_path), backend,
+                                      transport if backend == "record" else None)
@@ -0,0 +1,241 @@
+"""
+Local OpenAI-compatible stub server for offline runs and benchmarks (no network, no API key, no cost).
+Answers POST .../v1/chat/completions, streamed (SSE) or not:
+
+1. from a cassette (see utils.llm_backend) if it contains the request,
+2. otherwise from a responder function (request body -> assistant message), by default a canned text answer.
+
+Point the clients at it with OPENROUTER_BASE_URL:
+
+    python -m utils.llm_stub_server --port 8765 --cassette cassettes/test_agent.json --latency 0.3
+    OPENROUTER_BASE_URL=http://127.0.0.1:8765/v1 python test_agent.py
+
+or start it in-process with start_stub_server() (e.g. from a benchmark).
+"""
+
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.llm_backend import Cassette, CassetteMiss, request_key
+
+# assistant message of a responder: {"content": str or None, "tool_calls": [{"name": str, "arguments": str}]}
+Responder = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+def canned_responder(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Default answer: plain text referring to the last user message, never a tool call."""
+    user_messages = [m.get("content") for m in body.get("messages", []) if m.get("role") == "user"]
+    last = user_messages[-1] if user_messages and isinstance(user_messages[-1], str) else ""
+    return {"content": f"Stub answer to: {last[:200]}"}
+
+
+def _estimate_tokens(value: Any) -> int:
+    return max(len(json.dumps(value, ensure_ascii=False)) // 4, 1)
+
+
+class StubServer(ThreadingHTTPServer):
+    """HTTP server holding the stub configuration and request counters."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], cassette: Optional[Cassette] = None,
+                 responder: Responder = canned_responder, latency: float = 0.0, token_latency: float = 0.0,
+                 model_latency: Optional[Dict[str, float]] = None):
+        super().__init__(address, StubHandler)
+        self.cassette = cassette
+        self.responder = responder
+        self.latency = latency
+        self.token_latency = token_latency
+        self.model_latency = model_latency or {}  # model -> seconds, overrides latency
+        self.stats = {"requests": 0, "replayed": 0, "generated": 0}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def count(self, kind: str) -> int:
+        """Count a request (kind: 'replayed' or 'generated'), returns a running id."""
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats[kind] += 1
+            return next(self._ids)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Chat completions endpoint of the stub server."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass  # no access log on stderr
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not self.path.endswith("/chat/completions"):
+            self._send(404, "application/json", json.dumps({"error": {"message": f"Unknown endpoint {self.path}"}}))
+            return
+
+        server: StubServer = self.server
+        latency = server.latency
+        if server.model_latency:
+            latency = server.model_latency.get(json.loads(raw or b"{}").get("model"), latency)
+        if latency:
+            time.sleep(latency)
+
+        if server.cassette is not None:
+            try:
+                recorded = server.cassette.replay(request_key("POST", self.path, raw))
+                server.count("replayed")
+                self._send(recorded["status"], recorded["headers"].get("content-type", "application/json"),
+                           recorded["body"])
+                return
+            except CassetteMiss:
+                pass  # not recorded - answer with the responder
+
+        body = json.loads(raw or b"{}")
+        message = server.responder(body)
+        completion_id = f"stub-{server.count('generated')}"
+        if body.get("stream"):
+            self._stream(completion_id, body, message)
+        else:
+            self._send(200, "application/json", json.dumps(self._completion(completion_id, body, message)))
+
+    # ---------- responses ----------
+
+    def _send(self, status: int, content_type: str, text: str) -> None:
+        data = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    @staticmethod
+    def _usage(body: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, int]:
+        prompt_tokens = _estimate_tokens(body.get("messages", [])) + _estimate_tokens(body.get("tools", []))
+        completion_tokens = _estimate_tokens(message)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    @staticmethod
+    def _tool_calls(body: Dict[str, Any], message: Dict[str, Any]) -> list:
+        # ids depend on the conversation only, so replayed conversations (and their token counts) are identical
+        turn = len(body.get("messages", []))
+        return [
+            {"id": f"call-{turn}-{index}", "type": "function",
+             "function": {"name": call["name"], "arguments": call.get("arguments", "{}")}}
+            for index, call in enumerate(message.get("tool_calls") or [])
+        ]
+
+    def _completion(self, completion_id: str, body: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, Any]:
+        tool_calls = self._tool_calls(body, message)
+        assistant = {"role": "assistant", "content": message.get("content")}
+        if tool_calls:
+            assistant["tool_calls"] = tool_calls
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": assistant, "finish_reason": "tool_calls" if tool_calls else "stop"}],
+            "usage": self._usage(body, message)
+        }
+
+    def _stream(self, completion_id: str, body: Dict[str, Any], message: Dict[str, Any]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(delta: Optional[dict], finish_reason: Optional[str] = None, usage: Optional[dict] = None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            if usage is not None:
+                payload["usage"] = usage
+            self._write_chunk(f"data: {json.dumps(payload)}\n\n")
+
+        chunk({"role": "assistant", "content": ""})
+        content = message.get("content") or ""
+        for token in (content[i:i + 16] for i in range(0, len(content), 16)):  # a few words per chunk
+            if self.server.token_latency:
+                time.sleep(self.server.token_latency)
+            chunk({"content": token})
+
+        tool_calls = self._tool_calls(body, message)
+        for index, call in enumerate(tool_calls):
+            chunk({"tool_calls": [{"index": index, "id": call["id"], "type": "function",
+                                   "function": {"name": call["function"]["name"], "arguments": ""}}]})
+            chunk({"tool_calls": [{"index": index, "function": {"arguments": call["function"]["arguments"]}}]})
+
+        chunk({}, finish_reason="tool_calls" if tool_calls else "stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            chunk(None, usage=self._usage(body, message))
+        self._write_chunk("data: [DONE]\n\n")
+        self._write_chunk("")  # end of chunked body
+
+    def _write_chunk(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_stub_server(port: int = 0, cassette_path: Optional[str] = None, responder: Responder = canned_responder,
+                      latency: float = 0.0, token_latency: float = 0.0, host: str = "127.0.0.1",
+                      model_latency: Optional[Dict[str, float]] = None) -> StubServer:
+    """
+    Start the stub server in a background thread.
+
+    Args:
+        port (int) : port (0: any free port)
+        cassette_path (Optional[str]) : cassette to replay from
+        responder (Responder) : answers requests that are not in the cassette
+        latency (float) : seconds before every response (simulated model latency)
+        token_latency (float) : seconds between streamed chunks
+        host (str) : interface to listen on
+        model_latency (Optional[Dict[str, float]]) : seconds before responses per requested model (overrides latency)
+
+    Returns:
+        StubServer : running server (base_url for OPENROUTER_BASE_URL, stats, shutdown())
+    """
+    cassette = Cassette(cassette_path) if cassette_path else None
+    server = StubServer((host, port), cassette, responder, latency, token_latency, model_latency)
+    threading.Thread(target=server.serve_forever, name="llm-stub-server", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server for offline agent runs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cassette", help="cassette file to replay (see utils.llm_backend)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before every response")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds between streamed chunks")
+    args = parser.parse_args()
+
+    cassette = Cassette(args.cassette) if args.cassette else None
+    server = StubServer((args.host, args.port), cassette, canned_responder, args.latency, args.token_latency)
+    print(f"LLM stub server on {server.base_url} ({len(cassette) if cassette else 0} recorded responses)")
+    print(f"Use: OPENROUTER_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
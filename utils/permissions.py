@@ -21,6 +21,8 @@ def check_permission(user: Optional[Dict[str, Any]], action: str) -> bool:
             - 'write'/'create'/'edit'/'update': Create/edit use cases
             - 'delete'/'archive': Delete or archive use cases (ADMIN ONLY)
             - 'manage_users': Create/edit/delete users (ADMIN ONLY)
+            - 'manage_tenants': Cross-tenant overview and queries (ADMIN ONLY)
+            - 'maintenance': Database maintenance status and runs (ADMIN ONLY)
             
     Returns:
         True if user has permission, False otherwise
@@ -53,6 +55,14 @@ def check_permission(user: Optional[Dict[str, Any]], action: str) -> bool:
     if action in ['manage_users', 'create_user', 'delete_user']:
         return role == 'admin'
     
+    # Tenant management / cross-tenant queries (ADMIN ONLY)
+    if action == 'manage_tenants':
+        return role == 'admin'
+    
+    # Database maintenance (ADMIN ONLY)
+    if action == 'maintenance':
+        return role == 'admin'
+    
     # Unknown action = deny
     return False
 
@@ -92,7 +102,7 @@ def _get_required_role(action: str) -> str:
         return "any logged-in user"
     elif action in ['write', 'create', 'edit', 'update']:
         return "maintainer or admin"
-    elif action in ['delete', 'archive', 'manage_users', 'create_user', 'delete_user']:
+    elif action in ['delete', 'archive', 'manage_users', 'create_user', 'delete_user', 'manage_tenants', 'maintenance']:
         return "admin only"
     else:
         return "unknown"